@@ -1,13 +1,21 @@
 import json
-from functools import partial
+from collections import ChainMap
+from functools import partial, lru_cache
 
 from django.core.exceptions import ValidationError as DjangoValidationError, ObjectDoesNotExist, ImproperlyConfigured
-from django.http import Http404, HttpResponse
+from django.db.models import QuerySet, Manager
+from django.http import Http404
+from django.http.response import HttpResponseBase
 from rest_framework import serializers
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from django_alt.managers import is_unique_together
+from django_alt.utils.inference import infer_query_plan, QueryPlan
+from django_alt.utils.queries import track_queries, PHASE_URL, PHASE_PERMISSIONS, PHASE_QUERY, PHASE_FILTERS, \
+    PHASE_HANDLER
+from django_alt.utils.tracing import phase, trace_view
 from django_alt.utils.shortcuts import invalid, try_cast, first_defined
 
 base_view_class = APIView
@@ -17,6 +25,45 @@ KW_CONFIG_FILTERS = 'filters'
 KW_CONFIG_QUERYSET = 'query'
 KW_CONFIG_URL_FIELDS = 'fields_from_url'
 KW_CONFIG_URL_DONT_NORMALIZE = 'no_url_param_casting'
+KW_CONFIG_COMPILED_READ = 'compiled_read'
+KW_CONFIG_NO_QUERY_INFERENCE = 'no_query_inference'
+KW_CONFIG_SPARSE_FIELDS = 'sparse_fields'
+KW_CONFIG_COUNT = 'count'
+KW_CONFIG_RESPONSE = 'response'
+KW_CONFIG_CHUNK_SIZE = 'chunk_size'
+KW_CONFIG_UPSERT = 'upsert'
+KW_CONFIG_STREAM = 'stream'
+KW_CONFIG_MAX_BODY_SIZE = 'max_body_size'
+KW_CONFIG_MAX_ITEMS = 'max_items'
+KW_CONFIG_EXPORT = 'export'
+KW_CONFIG_PERMISSION_FILTER = 'permission_filter'
+KW_CONFIG_QUERY_BUDGET = 'query_budget'
+
+RESPONSE_FULL = 'full'
+RESPONSE_IDS = 'ids'
+RESPONSE_COUNT = 'count'
+RESPONSE_NONE = 'none'
+RESPONSE_SUMMARY = 'summary'
+RESPONSE_CHANGED = 'changed'
+
+"""
+Response modes that can be set with the `response` config field for each method
+"""
+response_modes = {
+    'post': (RESPONSE_FULL, RESPONSE_IDS, RESPONSE_SUMMARY, RESPONSE_NONE),
+    'patch': (RESPONSE_FULL, RESPONSE_IDS, RESPONSE_CHANGED, RESPONSE_NONE),
+    'delete': (RESPONSE_FULL, RESPONSE_IDS, RESPONSE_COUNT, RESPONSE_NONE),
+}
+
+"""
+Response modes of a `stream` post (`count` by default)
+"""
+stream_response_modes = (RESPONSE_COUNT, RESPONSE_IDS, RESPONSE_NONE)
+
+QUERY_PARAM_FIELDS = 'fields'
+QUERY_PARAM_EXCLUDE = 'exclude'
+QUERY_PARAM_COUNT = 'count'
+QUERY_PARAM_EXPORT = 'export'
 
 
 def _apply_filters(qs, filters, query_params):
@@ -33,7 +80,107 @@ def _apply_filters(qs, filters, query_params):
         invalid(current_param, str(e))
 
 
-def _normalize_url(**url):
+@lru_cache(maxsize=128)
+def _readable_field_names(serializer_class):
+    return frozenset(name for name, field in serializer_class().fields.items() if not field.write_only)
+
+
+def _parse_field_names(query_params, param, allowed):
+    if param not in query_params:
+        return None
+    names = frozenset(name.strip() for name in query_params[param].split(',') if name.strip())
+    if not names and param == QUERY_PARAM_FIELDS:
+        invalid(param, 'At least one field is required')
+    disallowed = names.difference(allowed)
+    if len(disallowed):
+        invalid(param, 'Unknown or unsupported field(s): {0}'.format(', '.join(sorted(disallowed))))
+    return names
+
+
+def sparse_fieldset(config, query_params, serializer_class) -> (frozenset, frozenset):
+    """
+    Reads the `fields` and `exclude` query parameters of a request,
+    provided the endpoint method config allows sparse fieldsets.
+    :param config: endpoint config of the method
+    :param query_params: request query parameters
+    :param serializer_class: serializer of the endpoint, whose readable fields `'__all__'` allows
+    :return: {fields_to_keep (None keeps all), fields_to_exclude}
+    :raises: serializers.ValidationError if a requested field is not allowed or `fields` is empty
+    """
+    if KW_CONFIG_SPARSE_FIELDS not in config:
+        return None, frozenset()
+    allowed = config[KW_CONFIG_SPARSE_FIELDS]
+    if allowed == '__all__':
+        allowed = _readable_field_names(serializer_class)
+    return (_parse_field_names(query_params, QUERY_PARAM_FIELDS, allowed),
+            _parse_field_names(query_params, QUERY_PARAM_EXCLUDE, allowed) or frozenset())
+
+
+@lru_cache(maxsize=128)
+def _sparse_query_plan(serializer_class, fields, exclude, only_fields=False):
+    serializer = serializer_class()
+    serializer.restrict_fields(fields, exclude)
+    plan = infer_query_plan(serializer)
+    if only_fields:
+        # without query inference only the columns of the queried model are restricted
+        only = None if plan.only is None else [lookup for lookup in plan.only if '__' not in lookup]
+        return QueryPlan(only=only)
+    return plan
+
+
+def _get_query_plan(endpoint, config, query_params):
+    fields, exclude = sparse_fieldset(config, query_params, endpoint.serializer)
+    if fields is None and not exclude:
+        return endpoint.query_plan
+    return _sparse_query_plan(endpoint.serializer, fields, exclude, only_fields=endpoint.query_plan is None)
+
+
+class _PermittedModel:
+    """
+    Stands in for the endpoint model in the `query` of an endpoint with a `permission_filter`.
+    Its managers are restricted by the permission `Q`, so that rows the user cannot access
+    are filtered out by the query itself: a list is filtered in the database and a single
+    hidden row raises `DoesNotExist` (a 404), without loading it or checking it separately.
+    """
+    __slots__ = ('_model', '_q')
+
+    def __init__(self, model, q):
+        self._model = model
+        self._q = q
+
+    def __getattr__(self, item):
+        value = getattr(self._model, item)
+        return value.filter(self._q) if isinstance(value, Manager) else value
+
+    def __call__(self, *args, **kwargs):
+        return self._model(*args, **kwargs)
+
+
+def _check_permission_filter(qs, model, q):
+    """
+    Checks that a query result is allowed by a permission filter (used for `put`, where a missing
+    row means that it is created). A single instance is checked with one `EXISTS` query.
+    :param qs: query result (a queryset or an instance)
+    :param q: a `Q` object (or None for no restriction)
+    :return: the restricted query result
+    :raises PermissionError: if a single instance is not allowed
+    """
+    if q is None or qs is None:
+        return qs
+    if isinstance(qs, QuerySet):
+        return qs.filter(q)
+    if not model._default_manager.filter(q, pk=qs.pk).exists():
+        raise PermissionError()
+    return qs
+
+
+def normalize_url(**url):
+    """
+    Casts the url kwargs of a request to numbers where possible
+    (unless `no_url_param_casting` is set in the endpoint config).
+    :return: the normalized url kwargs
+    """
+
     def cast(value):
         return first_defined(
             try_cast(int, value),
@@ -44,19 +191,42 @@ def _normalize_url(**url):
     return {k: cast(v) for k, v in url.items()}
 
 
+def _query_budget(view_self, request):
+    method = request.method.lower()
+    config = view_self.endpoint_class.config.get('get' if method == 'head' else method, {})
+    return config.get(KW_CONFIG_QUERY_BUDGET)
+
+
+def _defining_class(cls, name):
+    return next(klass for klass in cls.__mro__ if name in vars(klass))
+
+
+def _handles_head(endpoint) -> bool:
+    """
+    HEAD goes to `on_head`, unless `on_get` is overridden after it
+    (then `on_get` is called and its body is dropped, so that both agree on statuses and errors)
+    """
+    return issubclass(_defining_class(endpoint, 'on_head'), _defining_class(endpoint, 'on_get'))
+
+
+@track_queries(budget=_query_budget)
 def _view_prototype(view_self, request, **url):
     method = request.method.lower()
-    if method == 'head':
+    is_head = method == 'head'
+    if is_head:
         method = 'get'
     endpoint = view_self.endpoint_class
+    on_head = is_head and _handles_head(endpoint)
 
     try:
         config = endpoint.config[method]
 
         if KW_CONFIG_URL_DONT_NORMALIZE not in config:
-            url = _normalize_url(**url)
+            with phase(PHASE_URL):
+                url = normalize_url(**url)
 
-        if KW_CONFIG_URL_FIELDS in config:
+        # streamed bodies are never loaded as a whole, the url fields are set per item by the handler
+        if KW_CONFIG_URL_FIELDS in config and not config.get(KW_CONFIG_STREAM):
             try:
                 # TODO find another way
                 # explicitly loads data to _full_data
@@ -71,6 +241,11 @@ def _view_prototype(view_self, request, **url):
                             '`request.data` dump: \n`{}`'
                         ).format(endpoint.__name__, request.method, request._full_data)
                         member.update(updated_fragment)
+                elif type(request._full_data) is dict:
+                    # overlays the url fields instead of copying the whole (parsed JSON) body
+                    # (a plain ChainMap: `getlist` lookups must fail for DRF not to treat it as form data).
+                    # Form data (`QueryDict`) is copied, so that multi-value fields keep all their values
+                    request._full_data = ChainMap(updated_fragment, request._full_data)
                 else:
                     request._full_data = request._full_data.copy()
                     request._full_data.update(updated_fragment)
@@ -84,24 +259,42 @@ def _view_prototype(view_self, request, **url):
 
         # pre_can/post_can meaning
         if pre_can is not None and pre_can is not True:
-            if pre_can is False or not pre_can(request, **url):
-                raise PermissionError()
+            with phase(PHASE_PERMISSIONS):
+                if pre_can is False or not pre_can(request, **url):
+                    raise PermissionError()
 
         try:
             if KW_CONFIG_QUERYSET in config:
-                qs = config[KW_CONFIG_QUERYSET](endpoint.model, **url)
+                model, permission_q = endpoint.model, None
+                if KW_CONFIG_PERMISSION_FILTER in config:
+                    with phase(PHASE_PERMISSIONS):
+                        permission_q = config[KW_CONFIG_PERMISSION_FILTER](request, **url)
+                    if permission_q is not None and method != 'put':
+                        model = _PermittedModel(model, permission_q)
+                with phase(PHASE_QUERY):
+                    qs = config[KW_CONFIG_QUERYSET](model, **url)
+                if permission_q is not None and method == 'put':
+                    with phase(PHASE_PERMISSIONS):
+                        qs = _check_permission_filter(qs, endpoint.model, permission_q)
+                if method == 'get' and not on_head:
+                    query_plan = _get_query_plan(endpoint, config, request.query_params)
+                    qs = query_plan.apply(qs) if query_plan else qs
                 if KW_CONFIG_FILTERS in config and len(request.query_params):
-                    qs = _apply_filters(qs, config[KW_CONFIG_FILTERS], request.query_params)
+                    with phase(PHASE_FILTERS):
+                        qs = _apply_filters(qs, config[KW_CONFIG_FILTERS], request.query_params)
         except endpoint.model.DoesNotExist:
             if method != 'put':
                 raise
 
         if post_can is not None and post_can is not True:
             post_can = partial(post_can, request, url, qs)
-        handler = getattr(endpoint, 'on_' + method)
-        result = handler(request, post_can, **url) if method == 'post' else handler(request, qs, post_can, **url)
-        if isinstance(result, HttpResponse):
+        handler = getattr(endpoint, 'on_head' if on_head else 'on_' + method)
+        with phase(PHASE_HANDLER):
+            result = handler(request, post_can, **url) if method == 'post' else handler(request, qs, post_can, **url)
+        if isinstance(result, HttpResponseBase):
             return result
+        if is_head:
+            return Response(status=result[1])
         return Response(*result)
 
     except serializers.ValidationError as e:
@@ -124,6 +317,7 @@ class MetaEndpoint(type):
     def __new__(mcs, name, bases, clsdict):
         if len(bases):
             mcs.transform_fields(name, clsdict)
+            clsdict['query_plan'] = mcs.make_query_plan(clsdict)
             if len(clsdict['config']):
                 clsdict['view'] = mcs.make_view_class(name + 'View', clsdict['config'])
         cls = super().__new__(mcs, name, bases, clsdict)
@@ -207,13 +401,118 @@ class MetaEndpoint(type):
                             '`{0}` config field must be an iterable in endpoint `{1}`'
                         ).format(KW_CONFIG_URL_FIELDS, name)
 
+                    if KW_CONFIG_COMPILED_READ in contents:
+                        assert method_name == 'get', (
+                            '`{0}` config field can only be used with `get` in endpoint `{1}`'
+                        ).format(KW_CONFIG_COMPILED_READ, name)
+
+                    if KW_CONFIG_RESPONSE in contents and not contents.get(KW_CONFIG_STREAM):
+                        assert contents[KW_CONFIG_RESPONSE] in response_modes.get(method_name, ()), (
+                            '`{0}` config field of `{1}` must be one of `{2}` in endpoint `{3}`'
+                        ).format(KW_CONFIG_RESPONSE, method_name, response_modes.get(method_name, ()), name)
+
+                    if KW_CONFIG_STREAM in contents:
+                        assert method_name == 'post', (
+                            '`{0}` config field can only be used with `post` in endpoint `{1}`'
+                        ).format(KW_CONFIG_STREAM, name)
+                        assert contents.get(KW_CONFIG_RESPONSE, RESPONSE_COUNT) in stream_response_modes, (
+                            '`{0}` config field can only be combined with `{1}` set to one of `{2}` '
+                            'in endpoint `{3}`'
+                        ).format(KW_CONFIG_STREAM, KW_CONFIG_RESPONSE, stream_response_modes, name)
+
+                    for field in (KW_CONFIG_MAX_BODY_SIZE, KW_CONFIG_MAX_ITEMS):
+                        if field in contents:
+                            assert contents.get(KW_CONFIG_STREAM), (
+                                '`{0}` config field requires `{1}` in endpoint `{2}`'
+                            ).format(field, KW_CONFIG_STREAM, name)
+                            assert isinstance(contents[field], int) and contents[field] > 0, (
+                                '`{0}` config field must be a positive integer in endpoint `{1}`'
+                            ).format(field, name)
+
+                    if KW_CONFIG_EXPORT in contents:
+                        assert method_name == 'get', (
+                            '`{0}` config field can only be used with `get` in endpoint `{1}`'
+                        ).format(KW_CONFIG_EXPORT, name)
+
+                    if KW_CONFIG_CHUNK_SIZE in contents:
+                        assert method_name == 'delete' or contents.get(KW_CONFIG_STREAM) \
+                            or contents.get(KW_CONFIG_EXPORT), (
+                            '`{0}` config field can only be used with `delete`, a streamed `post` '
+                            'or an exported `get` in endpoint `{1}`'
+                        ).format(KW_CONFIG_CHUNK_SIZE, name)
+                        assert isinstance(contents[KW_CONFIG_CHUNK_SIZE], int) and contents[KW_CONFIG_CHUNK_SIZE] > 0, (
+                            '`{0}` config field must be a positive integer in endpoint `{1}`'
+                        ).format(KW_CONFIG_CHUNK_SIZE, name)
+
+                    if KW_CONFIG_UPSERT in contents:
+                        assert method_name == 'put', (
+                            '`{0}` config field can only be used with `put` in endpoint `{1}`'
+                        ).format(KW_CONFIG_UPSERT, name)
+                        assert KW_CONFIG_QUERYSET in contents, (
+                            '`{0}` config field requires `{1}` in endpoint `{2}`'
+                        ).format(KW_CONFIG_UPSERT, KW_CONFIG_QUERYSET, name)
+                        assert hasattr(contents[KW_CONFIG_UPSERT], '__iter__') \
+                            and not isinstance(contents[KW_CONFIG_UPSERT], str) \
+                            and len(contents[KW_CONFIG_UPSERT]), (
+                            '`{0}` config field must be a non-empty iterable of conflict field names '
+                            'in endpoint `{1}`'
+                        ).format(KW_CONFIG_UPSERT, name)
+                        assert is_unique_together(clsdict['model'], contents[KW_CONFIG_UPSERT]), (
+                            '`{0}` config fields must be unique together on model `{1}` (a `unique` field, '
+                            '`unique_together` or a `UniqueConstraint`) in endpoint `{2}`'
+                        ).format(KW_CONFIG_UPSERT, clsdict['model'].__name__, name)
+
+                    if KW_CONFIG_PERMISSION_FILTER in contents:
+                        assert KW_CONFIG_QUERYSET in contents, (
+                            '`{0}` config field requires `{1}` in endpoint `{2}`'
+                        ).format(KW_CONFIG_PERMISSION_FILTER, KW_CONFIG_QUERYSET, name)
+                        assert callable(contents[KW_CONFIG_PERMISSION_FILTER]), (
+                            '`{0}` config field must be a callable accepting parameters `request` and `**url` '
+                            'and returning a `Q` object in endpoint `{1}`'
+                        ).format(KW_CONFIG_PERMISSION_FILTER, name)
+
+                    if KW_CONFIG_QUERY_BUDGET in contents:
+                        assert isinstance(contents[KW_CONFIG_QUERY_BUDGET], int) \
+                            and not isinstance(contents[KW_CONFIG_QUERY_BUDGET], bool) \
+                            and contents[KW_CONFIG_QUERY_BUDGET] >= 0, (
+                            '`{0}` config field must be a non-negative integer in endpoint `{1}`'
+                        ).format(KW_CONFIG_QUERY_BUDGET, name)
+
+                    if KW_CONFIG_COUNT in contents:
+                        assert method_name == 'get', (
+                            '`{0}` config field can only be used with `get` in endpoint `{1}`'
+                        ).format(KW_CONFIG_COUNT, name)
+
+                    if KW_CONFIG_SPARSE_FIELDS in contents:
+                        assert method_name == 'get', (
+                            '`{0}` config field can only be used with `get` in endpoint `{1}`'
+                        ).format(KW_CONFIG_SPARSE_FIELDS, name)
+                        assert contents[KW_CONFIG_SPARSE_FIELDS] == '__all__' or (
+                            hasattr(contents[KW_CONFIG_SPARSE_FIELDS], '__iter__')
+                            and not isinstance(contents[KW_CONFIG_SPARSE_FIELDS], str)), (
+                            '`{0}` config field must be an iterable of field names or `__all__` in endpoint `{1}`'
+                        ).format(KW_CONFIG_SPARSE_FIELDS, name)
+
                     if KW_CONFIG_URL_DONT_NORMALIZE in contents:
                         if KW_CONFIG_URL_DONT_NORMALIZE is not True:
                             del contents[KW_CONFIG_URL_DONT_NORMALIZE]
 
         clsdict['config'] = config
 
+    @staticmethod
+    def make_query_plan(clsdict):
+        """
+        Infers `select_related`, `prefetch_related` and `only` lookups for GET
+        from the endpoint serializer, unless `no_query_inference` is set.
+        :return: {QueryPlan} or None
+        """
+        config = clsdict['config'].get('get')
+        if config is None or KW_CONFIG_QUERYSET not in config or config.get(KW_CONFIG_NO_QUERY_INFERENCE):
+            return None
+        return infer_query_plan(clsdict['serializer']())
+
     @staticmethod
     def make_view_class(name, config: dict):
         body = {method: _view_prototype for method, _ in config.items()}
+        body['dispatch'] = trace_view(base_view_class.dispatch)
         return type(name, (base_view_class,), body)
@@ -1,18 +1,42 @@
+import copy
+import weakref
 from collections import OrderedDict
+from contextlib import nullcontext
 
 from django.core.exceptions import ObjectDoesNotExist
 
 from rest_framework import serializers
 from rest_framework.fields import empty
 
-from django_alt.abstract.validators import Validator
-from django_alt.utils.shortcuts import coal
+from django_alt.abstract.validators import Validator, run_validation_phases
+from django_alt.utils.queries import PHASE_VALIDATION, PHASE_PERMISSIONS, PHASE_SERIALIZATION
+from django_alt.utils.shortcuts import coal, collect_errors
+from django_alt.utils.tracing import SPAN_BASE_DB, phase, span
+
+
+def _clone_field(field):
+    """
+    Copies an unbound field prototype. Fields that bind child fields
+    (serializers, list and many-related fields) are copied deeply,
+    others only shallowly, as binding only sets their own attributes.
+    Their `validators` list and `error_messages` dict are copied as well,
+    so that changing them on one serializer does not change the prototype.
+    """
+    if isinstance(field, serializers.BaseSerializer) or hasattr(field, 'child') or hasattr(field, 'child_relation'):
+        return copy.deepcopy(field)
+    clone = copy.copy(field)
+    clone.validators = list(field.validators)
+    clone.error_messages = dict(field.error_messages)
+    return clone
 
 
 class BaseValidatedSerializer(serializers.Serializer):
     """
     Defines a relation between rest_framework serializer and validator
     """
+    # keyed by serializer class, without keeping dynamically created classes alive
+    _fields_prototypes = weakref.WeakKeyDictionary()
+    _validation_field_names = weakref.WeakKeyDictionary()
 
     def __init__(self, instance=None, data=empty, *,
                  validator_class=None, request=None, permission_test=None, **kwargs):
@@ -29,10 +53,59 @@ class BaseValidatedSerializer(serializers.Serializer):
 
         self.permission_test = permission_test
         self.did_check_permission = False
+        self.trimmed_fields = frozenset()
 
         self.Meta.validator_instance = self._instantiate_validator(request=request, **kwargs)
         super().__init__(instance, data, **kwargs)
 
+    @classmethod
+    def reuses_fields(cls) -> bool:
+        """
+        Field prototypes are reused unless `reuse_fields = False` is set on the serializer Meta
+        :return: {bool}
+        """
+        return getattr(getattr(cls, 'Meta', None), 'reuse_fields', True)
+
+    @classmethod
+    def warm_up(cls, **kwargs):
+        """
+        Builds the field prototype and the validator hook plan ahead of the first request.
+        :param kwargs: serializer constructor kwargs
+        :return: None
+        """
+        serializer = cls(**kwargs)
+        serializer.fields
+        serializer.validator.validation_plan()
+
+    def get_fields(self):
+        """
+        Builds the fields once per serializer class (the prototype) and
+        returns a copy of them for each serializer instance, saving the
+        field introspection of every request.
+        :return: a dict of unbound fields
+        """
+        cls = type(self)
+        if not cls.reuses_fields():
+            return super().get_fields()
+        prototype = self._fields_prototypes.get(cls)
+        if prototype is None:
+            prototype = self._fields_prototypes[cls] = super().get_fields()
+        return OrderedDict((name, _clone_field(field)) for name, field in prototype.items())
+
+    def get_validation_field_names(self) -> list:
+        """
+        Names of the model attributes that serializer fields write to.
+        Computed once per serializer class if fields are reused.
+        :return: {list}
+        """
+        cls = type(self)
+        if cls.reuses_fields() and cls in self._validation_field_names:
+            return self._validation_field_names[cls]
+        names = [v.source if v.source else k for k, v in self.get_fields().items()]
+        if cls.reuses_fields():
+            self._validation_field_names[cls] = names
+        return names
+
     @staticmethod
     def _check_permissions(permission_test, attrs):
         try:
@@ -70,6 +143,34 @@ class BaseValidatedSerializer(serializers.Serializer):
         """
         self.permission_test is not None and self._check_permissions(self.permission_test, attrs)
 
+    def restrict_fields(self, fields=None, exclude=()):
+        """
+        Removes fields from the serializer, so that they are
+        neither computed nor rendered (used for sparse fieldsets).
+        If the validator needs the full representation (see `Validator.allows_partial_representation`),
+        the fields are still computed and only removed from the representation it returns.
+        :param fields: names of fields to keep (None keeps all fields)
+        :param exclude: names of fields to remove
+        :return: None
+        """
+        if fields is None and not exclude:
+            return
+        removed = [name for name in self.fields if (fields is not None and name not in fields) or name in exclude]
+        if self.validator.needs_full_representation():
+            self.trimmed_fields = frozenset(removed)
+            return
+        for name in removed:
+            del self.fields[name]
+
+    def trim_representation(self, representation: OrderedDict) -> OrderedDict:
+        """
+        Removes the fields left out by `restrict_fields` after the validator has run
+        :return: the representation
+        """
+        for name in self.trimmed_fields:
+            representation.pop(name, None)
+        return representation
+
     def validate(self, attrs: dict) -> dict:
         """
         Performs attribute validation before passing them to
@@ -77,32 +178,34 @@ class BaseValidatedSerializer(serializers.Serializer):
         :param attrs: a dictionary containing input attributes to validate
         :return: transformed (if necessary) attributes from input
         """
-        fields = [v.source if v.source else k for k, v in self.get_fields().items()]
+        fields = self.get_validation_field_names()
 
-        self.validator.clean_fields(attrs, fields)
+        with phase(PHASE_VALIDATION):
+            with collect_errors() if self.validator.collects_errors else nullcontext():
+                attrs = run_validation_phases(self.validator, attrs, fields)
 
-        attrs = coal(self.validator.clean(attrs), attrs)
-        attrs = coal(self.validator.base(attrs), attrs)
+            if not self.is_update:
+                attrs = coal(self.validator.will_create(attrs), attrs)
+            else:
+                attrs = coal(self.validator.will_update(self.instance, attrs), attrs)
 
-        self.validator.validate_fields(attrs, fields)
-        self.validator.validate_checks(attrs)
+            with span(SPAN_BASE_DB):
+                attrs = coal(self.validator.base_db(attrs), attrs)
 
-        if not self.is_update:
-            attrs = coal(self.validator.will_create(attrs), attrs)
-        else:
-            attrs = coal(self.validator.will_update(self.instance, attrs), attrs)
-
-        attrs = coal(self.validator.base_db(attrs), attrs)
-
-        self.check_permissions(attrs)
+        with phase(PHASE_PERMISSIONS):
+            self.check_permissions(attrs)
 
         return attrs
 
     def to_representation(self, instance) -> OrderedDict:
+        with phase(PHASE_SERIALIZATION):
+            return self._to_representation(instance)
+
+    def _to_representation(self, instance) -> OrderedDict:
         representation = super().to_representation(instance)
         result = self.validator.to_representation(representation,
                                                   self.validated_data if hasattr(self, '_validated_data') else None)
-        return result if result else representation
+        return self.trim_representation(result if result else representation)
 
     def _instantiate_validator(self, **kwargs):
         """
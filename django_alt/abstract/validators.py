@@ -1,7 +1,13 @@
 import inspect
+import weakref
 from abc import abstractmethod
 from collections import OrderedDict
 
+from django_alt.utils.queries import PHASE_BASE, PHASE_CLEAN, PHASE_CLEAN_FIELDS, PHASE_VALIDATE_CHECKS, \
+    PHASE_VALIDATE_FIELDS
+from django_alt.utils.shortcuts import coal
+from django_alt.utils.tracing import phase
+
 
 class Validator:
     """
@@ -13,6 +19,29 @@ class Validator:
     FIELD_CLEAN_PREFIX = 'clean_'
     FIELD_VALIDATOR_PREFIX = 'field_'
 
+    _validation_plans = weakref.WeakKeyDictionary()
+
+    """
+    Set to True if the validator has no per-instance update logic,
+    allowing `ValidatedManager.update_queryset` to update rows
+    with a single SQL `UPDATE` without loading them.
+    """
+    allows_queryset_update = False
+
+    """
+    Set to True to run the validation hooks (from `clean_fields` to `validate_checks`)
+    in a `collect_errors` block, reporting every error of an item at once
+    instead of stopping at the first one.
+    """
+    collects_errors = False
+
+    """
+    Set to True if `to_representation` works with a sparse fieldset (`?fields=`), i.e. does not
+    read fields that may have been left out. Otherwise, a validator that overrides
+    `to_representation` receives every field, and the left out ones are removed afterwards.
+    """
+    allows_partial_representation = False
+
     def __init__(self, *, model=None, serializer=None, **context):
         """
         :param [model]: model class of the serialized object (if serialized by a ModelSerializer)
@@ -22,6 +51,40 @@ class Validator:
         self.serializer = serializer
         self.context = context
 
+    @classmethod
+    def needs_full_representation(cls) -> bool:
+        """
+        :return: whether `to_representation` must receive every serializer field
+        """
+        return cls.to_representation is not Validator.to_representation and not cls.allows_partial_representation
+
+    @classmethod
+    def validation_plan(cls) -> dict:
+        """
+        Collects the wildcard functions (check_, clean_ and field_) defined
+        on the validator class. Computed once per class, so that validation
+        does not have to introspect the validator for every item.
+        :return: {'checks': [check function names in alphabetical order],
+                  'clean': {field_name: function_name},
+                  'field': {field_name: (function_name, accepts_attrs)}}
+        """
+        plan = cls._validation_plans.get(cls)
+        if plan is None:
+            plan = {'checks': [], 'clean': {}, 'field': {}}
+            for name in dir(cls):
+                if not callable(getattr(cls, name)):
+                    continue
+                if name.startswith(cls.ATTR_CHECKS_PREFIX):
+                    plan['checks'].append(name)
+                if name.startswith(cls.FIELD_CLEAN_PREFIX):
+                    plan['clean'][name[len(cls.FIELD_CLEAN_PREFIX):]] = name
+                if name.startswith(cls.FIELD_VALIDATOR_PREFIX):
+                    # field_<>(self, value, attrs) or field_<>(self, value)
+                    accepts_attrs = len(inspect.getfullargspec(getattr(cls, name)).args) == 3
+                    plan['field'][name[len(cls.FIELD_VALIDATOR_PREFIX):]] = name, accepts_attrs
+            cls._validation_plans[cls] = plan
+        return plan
+
     def validate_checks(self, attrs):
         """
         If subclass defines functions with names starting with check_,
@@ -29,9 +92,7 @@ class Validator:
         All functions are called in alphabetical order.
         :param attrs: attrs dict to pass as parameter
         """
-        def is_attr_action(name):
-            return name.startswith(self.ATTR_CHECKS_PREFIX) and callable(getattr(self, name))
-        for name in [name for name in dir(self) if is_attr_action(name)]:
+        for name in self.validation_plan()['checks']:
             getattr(self, name)(attrs)
 
     def validate_fields(self, attrs, field_names):
@@ -44,15 +105,13 @@ class Validator:
         :param field_names: an iterable of fields defined by name
         :return: None
         """
+        validators = self.validation_plan()['field']
         for field in sorted(field_names):
-            name = ''.join((self.FIELD_VALIDATOR_PREFIX, field))
-            if hasattr(self, name) and callable(getattr(self, name)) and field in attrs:
-                func = getattr(self, name)
-                if len(inspect.getfullargspec(func).args) == 3:
-                    # field_<>(self, value, attrs)
+            if field in validators and field in attrs:
+                name, accepts_attrs = validators[field]
+                if accepts_attrs:
                     getattr(self, name)(attrs[field], attrs)
                 else:
-                    # field_<>(self, value)
                     getattr(self, name)(attrs[field])
 
     def clean_fields(self, attrs, field_names):
@@ -65,10 +124,10 @@ class Validator:
         :param field_names: an iterable of fields defined by name
         :return: cleaned value
         """
+        cleaners = self.validation_plan()['clean']
         for field in sorted(field_names):
-            name = ''.join((self.FIELD_CLEAN_PREFIX, field))
-            if hasattr(self, name) and callable(getattr(self, name)) and field in attrs:
-                attrs[field] = getattr(self, name)(attrs[field])
+            if field in cleaners and field in attrs:
+                attrs[field] = getattr(self, cleaners[field])(attrs[field])
 
     @abstractmethod
     def clean(self, attrs: dict) -> dict:
@@ -129,6 +188,19 @@ class Validator:
         """
         return attrs
 
+    @abstractmethod
+    def will_update_queryset(self, queryset, attrs: dict) -> dict:
+        """
+        Called before every row of a queryset is updated with the same attrs
+        in a single statement (see `allows_queryset_update`).
+        Use this for
+        - placing set-level validation logic of mass updates
+        :param queryset: rows to be updated
+        :param attrs: attrs to update the rows with
+        :return: modified attrs
+        """
+        return attrs
+
     @abstractmethod
     def will_delete(self, queryset):
         """
@@ -137,6 +209,15 @@ class Validator:
         """
         pass
 
+    def will_delete_many(self, queryset, pks: list):
+        """
+        Called before a batch of rows is deleted in chunked deletion.
+        Calls `will_delete` with the queryset of the batch by default.
+        :param queryset: queryset of the rows to be deleted
+        :param pks: primary keys of the rows to be deleted
+        """
+        self.will_delete(queryset)
+
     @abstractmethod
     def did_create(self, instance, validated_attrs: dict) -> None:
         """
@@ -147,6 +228,17 @@ class Validator:
         """
         pass
 
+    def did_create_many(self, instances: list, list_of_validated_attrs: list) -> None:
+        """
+        Called after a chunk of model instances is created in bulk.
+        Calls `did_create` for each instance by default.
+        :param instances: the created model instances
+        :param list_of_validated_attrs: validated attrs used to create each instance
+        :return: None
+        """
+        for instance, attrs in zip(instances, list_of_validated_attrs):
+            self.did_create(instance, attrs)
+
     @abstractmethod
     def did_update(self, instance, validated_attrs: dict) -> None:
         """
@@ -157,6 +249,28 @@ class Validator:
         """
         pass
 
+    def did_update_many(self, instances: list, list_of_validated_attrs: list) -> None:
+        """
+        Called after a chunk of model instances is updated in bulk.
+        Calls `did_update` for each instance by default.
+        :param instances: the updated model instances
+        :param list_of_validated_attrs: validated attrs used to update each instance
+        :return: None
+        """
+        for instance, attrs in zip(instances, list_of_validated_attrs):
+            self.did_update(instance, attrs)
+
+    @abstractmethod
+    def did_update_queryset(self, queryset, validated_attrs: dict, count: int) -> None:
+        """
+        Called after the rows of a queryset are updated in a single statement
+        :param queryset: the updated queryset
+        :param validated_attrs: validated attrs used to update the rows
+        :param count: number of updated rows
+        :return: None
+        """
+        pass
+
     @abstractmethod
     def did_delete(self) -> None:
         """
@@ -165,6 +279,15 @@ class Validator:
         """
         pass
 
+    def did_delete_many(self, pks: list) -> None:
+        """
+        Called after a batch of rows is deleted in chunked deletion.
+        Calls `did_delete` by default.
+        :param pks: primary keys of the deleted rows
+        :return: None
+        """
+        self.did_delete()
+
     @abstractmethod
     def to_representation(self, repr_attrs: OrderedDict, validated_attrs: dict = None) -> OrderedDict:
         """
@@ -176,3 +299,25 @@ class Validator:
         :return: modified repr_attrs OrderedDict
         """
         return repr_attrs
+
+
+def run_validation_phases(validator: Validator, attrs: dict, field_names=None) -> dict:
+    """
+    Runs the validation hooks of a validator, from `clean_fields` to `validate_checks`,
+    each in its own phase (nested in the `validation` phase of the caller).
+    :param validator: validator to run
+    :param attrs: attrs to validate
+    :param field_names: fields to clean and validate (the keys of attrs if None)
+    :return: validated attrs
+    """
+    with phase(PHASE_CLEAN_FIELDS):
+        validator.clean_fields(attrs, attrs.keys() if field_names is None else field_names)
+    with phase(PHASE_CLEAN):
+        attrs = coal(validator.clean(attrs), attrs)
+    with phase(PHASE_BASE):
+        attrs = coal(validator.base(attrs), attrs)
+    with phase(PHASE_VALIDATE_FIELDS):
+        validator.validate_fields(attrs, attrs.keys() if field_names is None else field_names)
+    with phase(PHASE_VALIDATE_CHECKS):
+        validator.validate_checks(attrs)
+    return attrs
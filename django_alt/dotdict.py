@@ -1,4 +1,5 @@
-from itertools import chain
+from collections import ChainMap
+from collections.abc import Mapping, Sequence
 
 
 class _undefined_meta(type):
@@ -22,31 +23,250 @@ class undefined(metaclass=_undefined_meta):
 
 
 class ddict(dict):
+    """
+    A dict that also exposes its items as attributes.
+    Missing items are returned as `undefined` (no KeyError is raised internally).
+    """
+    __slots__ = ()
+
     def __init__(self, iterable=None, **kwargs):
-        if iterable is not None:
-            if isinstance(iterable, dict):
-                iterable.update(kwargs)
-            else:
-                iterable = chain(iterable, kwargs.items())
-            super().__init__(iterable)
-        else:
+        """
+        Copies the items of a mapping or an iterable of pairs (and kwargs).
+        The passed in mapping is never modified.
+        """
+        if iterable is None:
             super().__init__(**kwargs)
+        else:
+            super().__init__(iterable, **kwargs)
 
     def __iter__(self):
-        return self.items().__iter__()
+        return iter(self.items())
 
     def __getattr__(self, item):
-        try:
-            return self.__getitem__(item)
-        except KeyError:
-            return undefined
+        return self.get(item, undefined)
 
     __setattr__ = dict.__setitem__
     __delattr__ = dict.__delitem__
 
     def __add__(self, other):
+        """
+        :return: a new ddict with the items of `other` over the items of this one
+                 (see `overlay` for a view that copies nothing)
+        """
         if isinstance(other, dict):
-            result = self.copy()
-            result.update(other)
+            result = ddict(self)
+            dict.update(result, other)
             return result
         raise TypeError('You can only add two ddict or one ddict one dict instances')
+
+    def overlay(self, other):
+        """
+        :return: a lazy `dchain` overlay of `other` over this ddict (no items are copied)
+        """
+        if isinstance(other, Mapping):
+            return dchain(other, self)
+        raise TypeError('You can only overlay a dict on a ddict instance')
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError('`{0}` instances are immutable'.format(self.__class__.__name__))
+
+
+class frozenddict(ddict):
+    """
+    An immutable, hashable ddict, usable as a cache or set key.
+    Its values must be hashable as well.
+    """
+    __slots__ = ('_hash',)
+
+    def __init__(self, iterable=None, **kwargs):
+        super().__init__(iterable, **kwargs)
+        object.__setattr__(self, '_hash', None)
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash(frozenset(dict.items(self))))
+        return self._hash
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
+
+    __setitem__ = __delitem__ = __setattr__ = __delattr__ = _immutable
+    clear = pop = popitem = setdefault = update = __ior__ = _immutable
+
+
+class dchain(ChainMap):
+    """
+    A lazy overlay of mappings with ddict-like attribute access, produced by `ddict.overlay`.
+    Unlike a ddict it is not a dict: it iterates over its keys and must be converted
+    (`materialize()` or `dict(...)`) before being serialized.
+    Lookups go through the layers (the first one wins), nothing is copied until the overlay
+    is written to or `materialize` is called. The layers themselves are never modified.
+    """
+
+    def __init__(self, *maps):
+        super().__init__(*maps)
+        object.__setattr__(self, '_owned', False)
+
+    def __getattr__(self, item):
+        return self.get(item, undefined)
+
+    def __setattr__(self, key, value):
+        if key in ('maps', '_owned'):
+            object.__setattr__(self, key, value)
+        else:
+            self[key] = value
+
+    def __delattr__(self, item):
+        del self[item]
+
+    # ddict layers iterate over their items, so keys are taken explicitly
+    def __iter__(self):
+        keys = {}
+        for mapping in reversed(self.maps):
+            keys.update(dict.fromkeys(mapping.keys()))
+        return iter(keys)
+
+    def __len__(self):
+        return len(set().union(*(mapping.keys() for mapping in self.maps)))
+
+    def overlay(self, other):
+        if isinstance(other, Mapping):
+            return dchain(other, *self.maps)
+        raise TypeError('You can only overlay a dict on a dchain instance')
+
+    def materialize(self) -> ddict:
+        """
+        Merges the layers into a single ddict, which the overlay uses from then on.
+        :return: the merged ddict
+        """
+        if not self._owned:
+            self.maps = [ddict(self)]
+            self._owned = True
+        return self.maps[0]
+
+    def __setitem__(self, key, value):
+        self.materialize()[key] = value
+
+    def __delitem__(self, key):
+        del self.materialize()[key]
+
+    def pop(self, key, *args):
+        return self.materialize().pop(key, *args)
+
+    def popitem(self):
+        return self.materialize().popitem()
+
+    def clear(self):
+        self.materialize().clear()
+
+    def copy(self):
+        return ddict(self)
+
+    __copy__ = copy
+
+
+def _wrap(value):
+    if isinstance(value, Mapping) and not isinstance(value, dview):
+        return dview(value)
+    if isinstance(value, Sequence) and not isinstance(value, (str, bytes, _sequence_view)):
+        return _sequence_view(value)
+    return value
+
+
+class dview(Mapping):
+    """
+    A read-only view over a (nested) mapping, e.g. parsed JSON, with ddict-like attribute access.
+    Nested mappings and lists are wrapped when they are accessed, nothing is copied.
+    A missing attribute resolves to `undefined` one level deep, like on a ddict: `view.address.zip is undefined`.
+    Attribute access past a missing item raises `AttributeError` and a missing item raises `KeyError`;
+    use `path_get(view, 'address.zip.code')` to resolve a path that may be missing at any depth.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        object.__setattr__(self, '_data', data)
+
+    def __getattr__(self, item):
+        return _wrap(self._data.get(item, undefined))
+
+    def __getitem__(self, key):
+        return _wrap(self._data[key])
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return 'dview({0!r})'.format(self._data)
+
+    def __setattr__(self, key, value):
+        raise TypeError('`dview` instances are read-only')
+
+    __delattr__ = __setattr__
+
+    def unwrap(self):
+        """
+        :return: the underlying mapping
+        """
+        return self._data
+
+
+class _sequence_view(Sequence):
+    """
+    A read-only view over a list that wraps its nested mappings and lists on access
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return _sequence_view(self._data[index])
+        return _wrap(self._data[index])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, _sequence_view):
+            other = other._data
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    def __repr__(self):
+        return 'dview({0!r})'.format(self._data)
+
+    def unwrap(self):
+        return self._data
+
+
+def path_get(data, path, default=undefined):
+    """
+    Resolves a dotted path (e.g. `'address.lines.0'`) in nested mappings and lists in one call.
+    :param data: a mapping or a sequence (views are accepted too)
+    :param path: a dotted string or a sequence of keys and indexes
+    :param default: value returned when any part of the path is missing
+    :return: the (unwrapped) value at the path or `default`
+    """
+    keys = path.split('.') if isinstance(path, str) else path
+    for key in keys:
+        if isinstance(data, (dview, _sequence_view)):
+            data = data.unwrap()
+        if isinstance(data, Mapping):
+            if key not in data:
+                return default
+            data = data[key]
+        elif isinstance(data, Sequence) and not isinstance(data, (str, bytes)):
+            try:
+                data = data[int(key)]
+            except (ValueError, IndexError):
+                return default
+        else:
+            return default
+    return data
@@ -1,8 +1,28 @@
 from django.core.exceptions import ImproperlyConfigured
-from django.http import Http404
+from django.db import transaction, connections, router
+from django.db.models import Manager, QuerySet
+from django.http import Http404, StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.response import Response
 
-from django_alt.abstract.endpoints import MetaEndpoint
-from django_alt.utils.shortcuts import queryset_has_many
+from django_alt.abstract.endpoints import MetaEndpoint, KW_CONFIG_COMPILED_READ, KW_CONFIG_COUNT, \
+    KW_CONFIG_RESPONSE, KW_CONFIG_CHUNK_SIZE, KW_CONFIG_UPSERT, KW_CONFIG_STREAM, KW_CONFIG_MAX_BODY_SIZE, \
+    KW_CONFIG_MAX_ITEMS, KW_CONFIG_URL_FIELDS, KW_CONFIG_EXPORT, QUERY_PARAM_COUNT, QUERY_PARAM_EXPORT, RESPONSE_FULL, RESPONSE_IDS, RESPONSE_COUNT, \
+    RESPONSE_NONE, RESPONSE_SUMMARY, RESPONSE_CHANGED, sparse_fieldset
+from django_alt.exporters import FORMAT_NDJSON, content_types, iter_export
+from django_alt.managers import ValidatedManager, BulkSummary, upsert
+from django_alt.readers import CompiledReader
+from django_alt.utils.functional import chunked
+from django_alt.utils.shortcuts import queryset_has_many, invalid
+from django_alt.utils.streaming import iter_request_items
+
+
+def _diffed_value(instance, name):
+    value = getattr(instance, name, None)
+    if isinstance(value, Manager):
+        # related managers never compare equal, their primary keys do
+        return set(value.values_list('pk', flat=True))
+    return value
 
 
 class Endpoint(metaclass=MetaEndpoint):
@@ -10,6 +30,7 @@ class Endpoint(metaclass=MetaEndpoint):
     model = None
     serializer = None
     view = None
+    query_plan = None
 
     @classmethod
     def as_view(cls, **kwargs):
@@ -56,7 +77,62 @@ class Endpoint(metaclass=MetaEndpoint):
         """
         if permission_test:
             cls.serializer._check_permissions(permission_test, request.data)
-        return cls.serializer(queryset, many=queryset_has_many(queryset)).data, 200
+        config = cls.config.get('get', {})
+        if config.get(KW_CONFIG_COUNT) and QUERY_PARAM_COUNT in request.query_params \
+                and isinstance(queryset, QuerySet):
+            return {'count': queryset.count()}, 200
+        fields, exclude = sparse_fieldset(config, request.query_params, cls.serializer)
+        if config.get(KW_CONFIG_EXPORT) and QUERY_PARAM_EXPORT in request.query_params:
+            return cls.export(queryset, request.query_params[QUERY_PARAM_EXPORT] or FORMAT_NDJSON, fields, exclude)
+        if config.get(KW_CONFIG_COMPILED_READ):
+            serializer = cls.serializer()
+            serializer.restrict_fields(fields, exclude)
+            return CompiledReader(serializer).represent(queryset), 200
+        many = queryset_has_many(queryset)
+        serializer = cls.serializer(queryset, many=many)
+        (serializer.child if many else serializer).restrict_fields(fields, exclude)
+        return serializer.data, 200
+
+    @classmethod
+    def export(cls, queryset, fmt, fields=None, exclude=()) -> StreamingHttpResponse:
+        """
+        GET handler used for `?export=<format>` when the `export` config field is set.
+        Streams the queryset as NDJSON or CSV, fetching `chunk_size` rows at a time.
+        :param queryset: queryset from the endpoint config
+        :param fmt: `ndjson` or `csv`
+        :param fields: (optional) names of fields to keep
+        :param exclude: (optional) names of fields to leave out
+        :return: a streaming response
+        """
+        if fmt not in content_types:
+            invalid(QUERY_PARAM_EXPORT, 'Unsupported export format, use one of: {0}'.format(
+                ', '.join(content_types)))
+        serializer = cls.serializer()
+        serializer.restrict_fields(fields, exclude)
+        lines = iter_export(serializer, queryset if queryset_has_many(queryset) else [queryset], fmt,
+                            cls.config['get'].get(KW_CONFIG_CHUNK_SIZE, 1000))
+        return StreamingHttpResponse(lines, content_type=content_types[fmt])
+
+    @classmethod
+    def on_head(cls, request, queryset, permission_test=None, **url) -> Response:
+        """
+        Default HEAD handler implementation.
+        Runs the same permission checks and query as GET, but skips serialization.
+        Not used if `on_get` is overridden (unless `on_head` is as well): HEAD then calls
+        `on_get` and drops the body. If `count` is set in the `get` config, the number of queried items is
+        returned in the `X-Total-Count` header.
+        :param request: view request object
+        :param queryset: queryset from the endpoint `get` config
+        :param permission_test: (optional) permission test to execute after full validation
+        :param url: (optional) view url kwargs
+        :return: an empty response
+        """
+        if permission_test:
+            cls.serializer._check_permissions(permission_test, request.data)
+        headers = None
+        if cls.config.get('get', {}).get(KW_CONFIG_COUNT) and isinstance(queryset, QuerySet):
+            headers = {'X-Total-Count': str(queryset.count())}
+        return Response(status=200, headers=headers)
 
     @classmethod
     def on_post(cls, request, permission_test=None, **url) -> (dict, int):
@@ -65,20 +141,100 @@ class Endpoint(metaclass=MetaEndpoint):
         Used to create a new resource.
         Must return a tuple containing the response that is fed to the serializer and a status code.
         Safe to raise Validation, Permission and HTTP errors
+        The `response` config field selects what is returned: the serialized created items (`full`, default),
+        their ids (`ids`), an empty 204 response (`none`) or a `summary` of the number of created items
+        and the validation errors of the rejected ones by their index (valid items are created regardless).
         :param request: view request object
         :param permission_test: (optional) permission test to execute after full validation
         :param url: (optional) view url kwargs
         :return: {response_to_serialize, status_code}
         """
+        config = cls.config.get('post', {})
+        if config.get(KW_CONFIG_STREAM):
+            return cls.create_stream(request, permission_test, **url)
+        response = config.get(KW_CONFIG_RESPONSE, RESPONSE_FULL)
         is_many = isinstance(request.data, list)
+        if response == RESPONSE_SUMMARY:
+            return cls.create_summary(request, request.data if is_many else [request.data], permission_test)
+
         serializer = cls.serializer(data=request.data,
                                     permission_test=permission_test,
                                     many=is_many,
                                     request=request)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        created = serializer.save()
+
+        if response == RESPONSE_IDS:
+            return {'ids': [instance.pk for instance in created] if is_many else [created.pk]}, 201
+        if response == RESPONSE_NONE:
+            return None, 204
         return serializer.data, 201
 
+    @classmethod
+    def create_summary(cls, request, items, permission_test=None) -> (dict, int):
+        """
+        Validates every item on its own, then creates the valid ones in a single transaction.
+        :param request: view request object
+        :param items: list of items to create
+        :param permission_test: (optional) permission test to execute after full validation
+        :return: ({'count': number_of_created_items, 'errors': {index: errors}}, status_code)
+        """
+        item_serializers = [cls.serializer(data=item, permission_test=permission_test, request=request)
+                            for item in items]
+        valid = [serializer for serializer in item_serializers if serializer.is_valid()]
+        with transaction.atomic():
+            for serializer in valid:
+                serializer.save()
+        errors = {i: serializer.errors for i, serializer in enumerate(item_serializers) if serializer.errors}
+        return {'count': len(valid), 'errors': errors}, 201 if len(valid) or not len(errors) else 400
+
+    @classmethod
+    def create_stream(cls, request, permission_test=None, **url) -> (dict, int):
+        """
+        POST handler used when the `stream` config field is set.
+        Parses a JSON array (or NDJSON) body incrementally and validates and inserts it
+        in chunks of `chunk_size` items with `bulk_create`, in a single transaction.
+        `max_body_size` and `max_items` are enforced while reading (413 response).
+        Many to many fields are not supported. With `response` set to `ids` on a database backend
+        that cannot return rows from a bulk insert (e.g. SQLite), the rows are inserted one by one.
+        :param request: view request object
+        :param permission_test: (optional) permission test to execute after full validation
+        :param url: (optional) view url kwargs
+        :return: ({'count': number_of_created_items} or ids, status_code)
+        """
+        config = cls.config['post']
+        url_fields = {k: url[k] for k in config.get(KW_CONFIG_URL_FIELDS, ())}
+        items = iter_request_items(request, config.get(KW_CONFIG_MAX_BODY_SIZE), config.get(KW_CONFIG_MAX_ITEMS))
+        summary = BulkSummary()
+        response = config.get(KW_CONFIG_RESPONSE, RESPONSE_COUNT)
+        # without `INSERT ... RETURNING` support `bulk_create` leaves the primary keys unset
+        insert_one_by_one = response == RESPONSE_IDS and not connections[
+            router.db_for_write(cls.model)].features.can_return_rows_from_bulk_insert
+
+        with transaction.atomic():
+            for chunk in chunked(items, config.get(KW_CONFIG_CHUNK_SIZE, 1000)):
+                for item in chunk:
+                    if url_fields and isinstance(item, dict):
+                        item.update(url_fields)
+                serializer = cls.serializer(data=chunk, many=True, permission_test=permission_test, request=request)
+                if not serializer.is_valid():
+                    raise serializers.ValidationError({summary.count + i: errors
+                                                       for i, errors in enumerate(serializer.errors) if errors})
+                instances = [cls.model(**attrs) for attrs in serializer.validated_data]
+                if insert_one_by_one:
+                    for instance in instances:
+                        instance.save(force_insert=True)
+                else:
+                    cls.model.objects.bulk_create(instances)
+                serializer.child.validator.did_create_many(instances, serializer.validated_data)
+                summary.add_chunk(instances)
+
+        if response == RESPONSE_NONE:
+            return None, 204
+        if response == RESPONSE_IDS:
+            return {'ids': summary.pks}, 201
+        return {'count': summary.count}, 201
+
     @classmethod
     def on_patch(cls, request, queryset, permission_test=None, **url) -> (dict, int):
         """
@@ -86,6 +242,9 @@ class Endpoint(metaclass=MetaEndpoint):
         Used to update an existing resource partially or fully.
         Must return a tuple containing the response that is fed to the serializer and a status code.
         Safe to raise Validation, Permission and HTTP errors
+        The `response` config field selects what is returned: the serialized item (`full`, default),
+        its id (`ids`), only the fields whose values were modified (`changed`) or an empty 204 response (`none`).
+        Many to many fields count as modified when their set of related primary keys changed.
         :param request: view request object
         :param queryset: queryset from the endpoint config
         :param permission_test: permission test to execute after full validation
@@ -96,6 +255,7 @@ class Endpoint(metaclass=MetaEndpoint):
             raise Http404
         if queryset_has_many(queryset):
             raise NotImplementedError()
+        response = cls.config.get('patch', {}).get(KW_CONFIG_RESPONSE, RESPONSE_FULL)
         serializer = cls.serializer(queryset,
                                     data=request.data,
                                     many=queryset_has_many(queryset),
@@ -103,7 +263,17 @@ class Endpoint(metaclass=MetaEndpoint):
                                     permission_test=permission_test,
                                     request=request)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        before = {k: _diffed_value(queryset, k) for k in serializer.validated_data}
+        instance = serializer.save()
+
+        if response == RESPONSE_IDS:
+            return {'ids': [instance.pk]}, 200
+        if response == RESPONSE_NONE:
+            return None, 204
+        if response == RESPONSE_CHANGED:
+            changed = {k for k, v in before.items() if _diffed_value(instance, k) != v}
+            serializer.restrict_fields([f.field_name for f in serializer.fields.values()
+                                        if f.source_attrs and f.source_attrs[0] in changed])
         return serializer.data, 200
 
     @classmethod
@@ -113,12 +283,18 @@ class Endpoint(metaclass=MetaEndpoint):
         Used to update an existing resource if it is defined and create a new one otherwise.
         Must return a tuple containing the response that is fed to the serializer and a status code.
         Safe to raise Validation, Permission and HTTP errors
+        If the `upsert` config field is set, the row is inserted or updated on its conflict fields
+        by `upsert` (see `on_upsert`).
         :param request: view request object
         :param queryset: queryset from the endpoint config
         :param permission_test: permission test to execute after full validation
         :param url: view url kwargs
         :return: {response_to_serialize, status_code}
         """
+        unique_fields = cls.config.get('put', {}).get(KW_CONFIG_UPSERT)
+        if unique_fields is not None:
+            return cls.on_upsert(request, queryset, unique_fields, permission_test)
+
         if queryset is None:
             serializer = cls.serializer(data=request.data,
                                         many=queryset_has_many(queryset),
@@ -140,6 +316,37 @@ class Endpoint(metaclass=MetaEndpoint):
         serializer.save()
         return serializer.data, 200
 
+    @classmethod
+    def on_upsert(cls, request, instance, unique_fields, permission_test=None) -> (dict, int):
+        """
+        PUT handler used when the `upsert` config field is set.
+        The `query` result decides which validation hooks run (`will_create` or `will_update`),
+        after which the row is written with `upsert`, so that concurrent requests for the same key
+        do not fail with an integrity error. The status code and `did_create`/`did_update`
+        follow whether the write created the row.
+        :param request: view request object
+        :param instance: the existing instance or None
+        :param unique_fields: names of the conflict fields
+        :param permission_test: permission test to execute after full validation
+        :return: {response_to_serialize, status_code}
+        """
+        if queryset_has_many(instance):
+            raise NotImplementedError()
+        serializer = cls.serializer(instance,
+                                    data=request.data,
+                                    partial=instance is not None,
+                                    permission_test=permission_test,
+                                    request=request)
+        serializer.is_valid(raise_exception=True)
+        attrs = serializer.validated_data
+
+        serializer.instance, created = upsert(instance if instance is not None else cls.model(), attrs, unique_fields)
+        if created:
+            serializer.validator.did_create(serializer.instance, attrs)
+            return serializer.data, 201
+        serializer.validator.did_update(serializer.instance, attrs)
+        return serializer.data, 200
+
     @classmethod
     def on_delete(cls, request, queryset, permission_test=None, **url) -> (dict, int):
         """
@@ -147,6 +354,9 @@ class Endpoint(metaclass=MetaEndpoint):
         Used to delete an existing resource.
         Must return a tuple containing the response that is fed to the serializer and a status code.
         Safe to raise Validation, Permission and HTTP errors
+        The `response` config field selects what is returned: the serialized deleted items (`full`, default),
+        their ids (`ids`), their number (`count`) or an empty 204 response (`none`).
+        If `chunk_size` is set, rows are deleted in batches of that size.
         :param request: view request object
         :param queryset: queryset from the endpoint config
         :param permission_test: (optional) permission test to execute after full validation
@@ -155,12 +365,31 @@ class Endpoint(metaclass=MetaEndpoint):
         """
         if queryset is None:
             raise Http404
-        validator = cls.serializer.Meta.validator_class(model=cls.model)
-        validator.will_delete(queryset)
-        cls.serializer._check_permissions(permission_test, request.data)
-        data = cls.serializer(queryset, many=queryset_has_many(queryset)).data
-        queryset.delete()
-        validator.did_delete()
+        config = cls.config.get('delete', {})
+        response = config.get(KW_CONFIG_RESPONSE, RESPONSE_FULL)
+        chunk_size = config.get(KW_CONFIG_CHUNK_SIZE)
+        many = queryset_has_many(queryset)
+
+        data, pks = None, None
+
+        def before_delete():
+            nonlocal data, pks
+            cls.serializer._check_permissions(permission_test, request.data)
+            if response == RESPONSE_FULL:
+                data = cls.serializer(queryset, many=many).data
+            if response == RESPONSE_IDS and chunk_size is None:
+                pks = list(queryset.values_list('pk', flat=True)) if many else [queryset.pk]
+
+        # `will_delete` runs before the permission check and serialization
+        summary = ValidatedManager(cls.model, cls.serializer.Meta.validator_class).delete(
+            queryset, chunk_size, before_delete=before_delete)
+
+        if response == RESPONSE_IDS:
+            return {'ids': pks if pks is not None else summary.pks}, 200
+        if response == RESPONSE_COUNT:
+            return {'count': summary.count}, 200
+        if response == RESPONSE_NONE:
+            return None, 204
         return data, 200
 
     """
@@ -0,0 +1,263 @@
+import csv
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from itertools import count
+
+import django
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Max, Min, Q, QuerySet
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+from django_alt.abstract.endpoints import KW_CONFIG_QUERYSET, KW_CONFIG_URL_DONT_NORMALIZE, normalize_url
+from django_alt.utils.functional import chunked
+
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+
+"""
+Content types of the export formats
+"""
+content_types = {
+    FORMAT_NDJSON: 'application/x-ndjson',
+    FORMAT_CSV: 'text/csv',
+}
+
+
+def _keyset_ordering(queryset):
+    """
+    Resolves the ordering of a queryset to (field, descending) pairs that end with the primary key,
+    provided every term is a non-nullable, non-relation field of the model itself.
+    :return: a list of pairs or None if the ordering cannot be paginated by keys
+    """
+    query = queryset.query
+    terms = query.order_by or (query.default_ordering and queryset.model._meta.ordering) or ()
+    meta = queryset.model._meta
+    ordering = []
+    for term in terms:
+        if not isinstance(term, str) or term == '?':
+            return None
+        descending = term.startswith('-')
+        name = term.lstrip('-')
+        try:
+            field = meta.pk if name == 'pk' else meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.null or field.is_relation:
+            return None
+        ordering.append((field, descending))
+        if field.primary_key:
+            return ordering
+    return ordering + [(meta.pk, False)]
+
+
+def _after(ordering, instance) -> Q:
+    """
+    :return: a filter of the rows that follow the instance in the key set ordering
+    """
+    result, equal = Q(), Q()
+    for field, descending in ordering:
+        value = getattr(instance, field.attname)
+        result |= equal & Q(**{field.attname + ('__lt' if descending else '__gt'): value})
+        equal &= Q(**{field.attname: value})
+    return result
+
+
+def iter_chunks(queryset, chunk_size=1000):
+    """
+    Fetches the rows of a queryset in chunks of `chunk_size`, so that memory use does not grow
+    with the table size. Each chunk is a regular queryset evaluation, so the `select_related`
+    and `prefetch_related` lookups of the queryset (e.g. its inferred query plan) apply per chunk.
+    Rows are walked by key set: each chunk is filtered to the rows after the last row of the
+    previous one in the queryset ordering (or `Meta.ordering`), with the primary key as a tie-breaker
+    (pk order for unordered querysets). This keeps every chunk query equally cheap and does not
+    skip or repeat rows when rows are inserted or deleted during the export.
+    Orderings that cannot be paginated by keys (expressions, related or nullable fields) fall back
+    to slicing by offset, which gets slower with every chunk and is not stable under concurrent writes.
+    Sliced querysets are fetched with a single query.
+    :return: a generator of lists of instances
+    """
+    if queryset.query.is_sliced:
+        yield from chunked(queryset, chunk_size)
+        return
+
+    ordering = _keyset_ordering(queryset)
+    if ordering is None:
+        for offset in count(0, chunk_size):
+            chunk = list(queryset[offset:offset + chunk_size])
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+
+    queryset = queryset.order_by(*(('-' if descending else '') + field.attname for field, descending in ordering))
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        chunk = list(queryset.filter(_after(ordering, chunk[-1]))[:chunk_size])
+
+
+def iter_representations(serializer, queryset, chunk_size=1000):
+    """
+    Represents the items of a queryset one by one, fetching them from the database
+    in chunks (see `iter_chunks`).
+    :param serializer: a (non-list) serializer instance to represent the items with
+    :param queryset: a queryset or any iterable of instances
+    :param chunk_size: number of rows fetched at a time
+    :return: a generator of representations
+    """
+    if isinstance(queryset, QuerySet):
+        items = (instance for chunk in iter_chunks(queryset, chunk_size) for instance in chunk)
+    else:
+        items = queryset
+    for instance in items:
+        yield serializer.to_representation(instance)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def ndjson_lines(representations):
+    """
+    :return: a generator of NDJSON lines
+    """
+    for representation in representations:
+        yield _dumps(representation) + '\n'
+
+
+def csv_lines(representations):
+    """
+    Renders representations as CSV rows, starting with a header row. Columns are
+    taken from the first representation, nested values are written as JSON.
+    :return: a generator of CSV lines
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    columns = None
+    for representation in representations:
+        if columns is None:
+            columns = list(representation)
+            writer.writerow(columns)
+        writer.writerow([_dumps(v) if isinstance(v, (dict, list)) else v
+                         for v in (representation.get(c) for c in columns)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def iter_export(serializer, queryset, fmt, chunk_size=1000):
+    """
+    :param fmt: `FORMAT_NDJSON` or `FORMAT_CSV`
+    :return: a generator of text lines of the export
+    """
+    representations = iter_representations(serializer, queryset, chunk_size)
+    return csv_lines(representations) if fmt == FORMAT_CSV else ndjson_lines(representations)
+
+
+def pk_ranges(queryset, shards) -> list:
+    """
+    Splits the primary key range of a queryset with integer keys
+    into (at most) `shards` contiguous, inclusive ranges.
+    :return: a list of (low, high) pairs
+    """
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    low, high = bounds['low'], bounds['high']
+    if low is None:
+        return []
+    size = -(-(high - low + 1) // shards)
+    return [(start, min(start + size - 1, high)) for start in range(low, high + 1, size)]
+
+
+def endpoint_queryset(endpoint, **url):
+    """
+    Evaluates the `query` of the `get` config of an endpoint (as the view would, without filters)
+    :return: the query result with the inferred query plan applied
+    """
+    config = endpoint.config.get('get', {})
+    assert KW_CONFIG_QUERYSET in config, (
+        'Endpoint `{0}` must define a `{1}` for `get` to be exported'
+    ).format(endpoint.__name__, KW_CONFIG_QUERYSET)
+    if KW_CONFIG_URL_DONT_NORMALIZE not in config:
+        url = normalize_url(**url)
+    queryset = config[KW_CONFIG_QUERYSET](endpoint.model, **url)
+    return endpoint.query_plan.apply(queryset) if endpoint.query_plan else queryset
+
+
+def write_export(path, serializer, queryset, fmt, chunk_size=1000) -> int:
+    """
+    Writes an export of a queryset to a file.
+    :return: number of exported items
+    """
+    count = 0
+
+    def counted(representations):
+        nonlocal count
+        for representation in representations:
+            count += 1
+            yield representation
+
+    representations = counted(iter_representations(serializer, queryset, chunk_size))
+    lines = csv_lines(representations) if fmt == FORMAT_CSV else ndjson_lines(representations)
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        file.writelines(lines)
+    return count
+
+
+def _init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _export_shard(endpoint_path, url, pk_range, path, fmt, chunk_size):
+    endpoint = import_string(endpoint_path)
+    queryset = endpoint_queryset(endpoint, **url).filter(pk__range=pk_range).order_by()
+    return write_export(path, endpoint.serializer(), queryset, fmt, chunk_size)
+
+
+def export_to_file(endpoint_path, path, fmt=FORMAT_NDJSON, chunk_size=1000, parallel=None, **url) -> int:
+    """
+    Writes every item of the endpoint `get` query to a file using the endpoint serializer
+    (and thus `Validator.to_representation`).
+    With `parallel` set, the primary key range is split into shards that are written
+    by a pool of worker processes and concatenated in pk order.
+    :param endpoint_path: dotted path to the endpoint class
+    :param path: output file path
+    :param fmt: `FORMAT_NDJSON` or `FORMAT_CSV`
+    :param chunk_size: number of rows fetched at a time
+    :param parallel: (optional) number of worker processes
+    :param url: url kwargs passed to the `query`
+    :return: number of exported items
+    """
+    endpoint = import_string(endpoint_path)
+    queryset = endpoint_queryset(endpoint, **url)
+    if not parallel:
+        return write_export(path, endpoint.serializer(), queryset, fmt, chunk_size)
+
+    ranges = pk_ranges(queryset, parallel)
+    parts = ['{0}.part{1}'.format(path, i) for i in range(len(ranges))]
+    # worker processes must open their own database connections
+    connections.close_all()
+    with ProcessPoolExecutor(parallel, initializer=_init_worker) as executor:
+        futures = [executor.submit(_export_shard, endpoint_path, url, pk_range, part, fmt, chunk_size)
+                   for pk_range, part in zip(ranges, parts)]
+        counts = [future.result() for future in futures]
+
+    skip_header = False
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        for part, part_count in zip(parts, counts):
+            with open(part, newline='', encoding='utf-8') as shard:
+                # every non-empty CSV shard starts with the same header row
+                if fmt == FORMAT_CSV and skip_header:
+                    shard.readline()
+                shutil.copyfileobj(shard, file)
+            skip_header = skip_header or part_count > 0
+            os.remove(part)
+    return sum(counts)
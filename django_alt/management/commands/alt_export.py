@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_alt.exporters import FORMAT_CSV, FORMAT_NDJSON, export_to_file
+
+"""
+File extensions by which the output format is inferred
+"""
+format_extensions = {
+    '.csv': FORMAT_CSV,
+    '.jsonl': FORMAT_NDJSON,
+    '.ndjson': FORMAT_NDJSON,
+}
+
+
+class Command(BaseCommand):
+    help = ('Exports every item of an endpoint `get` query to an NDJSON or CSV file, '
+            'using the endpoint serializer and validator representation.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoint', help='dotted path to the endpoint class')
+        parser.add_argument('file', help='path to the output file')
+        parser.add_argument('--format', choices=(FORMAT_NDJSON, FORMAT_CSV),
+                            help='output format (inferred from the file extension by default)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='number of rows fetched at a time')
+        parser.add_argument('--parallel', type=int, default=None,
+                            help='number of worker processes writing primary key range shards')
+        parser.add_argument('--url', action='append', default=[], metavar='NAME=VALUE',
+                            help='url kwarg passed to the endpoint query (can be repeated)')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        fmt = options['format'] or format_extensions.get(os.path.splitext(path)[1].lower())
+        if fmt is None:
+            raise CommandError('Cannot infer the format of `{0}`, use --format.'.format(path))
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be a positive integer.')
+        try:
+            url = dict(pair.split('=', 1) for pair in options['url'])
+        except ValueError:
+            raise CommandError('--url values must be formatted as NAME=VALUE.')
+
+        started = time.monotonic()
+        try:
+            count = export_to_file(options['endpoint'], path, fmt, options['chunk_size'], options['parallel'], **url)
+        except ImportError as e:
+            raise CommandError(str(e))
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS('Exported {0} items in {1:.1f}s.'.format(
+                count, time.monotonic() - started)))
@@ -0,0 +1,178 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+
+from django_alt.managers import ValidatedManager, BulkSummary
+from django_alt.utils.functional import chunked
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+
+"""
+File extensions by which the input format is inferred
+"""
+format_extensions = {
+    '.csv': FORMAT_CSV,
+    '.jsonl': FORMAT_JSONL,
+    '.ndjson': FORMAT_JSONL,
+}
+
+
+def read_rows(file, fmt):
+    """
+    Streams attribute dicts from an open CSV (with a header row) or JSONL file.
+    Blank JSONL lines are yielded as None, so that row numbers stay aligned with lines.
+    :param file: an open text file
+    :param fmt: `FORMAT_CSV` or `FORMAT_JSONL`
+    :return: a generator of dicts
+    """
+    if fmt == FORMAT_CSV:
+        yield from csv.DictReader(file)
+        return
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            yield None
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise CommandError('Malformed JSON on line {0}: {1}'.format(line_number, e))
+
+
+class Command(BaseCommand):
+    help = ('Validates and imports rows from a CSV or JSONL file with `ValidatedManager.create_many`. '
+            'Invalid rows are skipped and can be reported to an error file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='model to import into as `app_label.ModelName`')
+        parser.add_argument('validator', help='dotted path to the validator class')
+        parser.add_argument('file', help='path to the input file')
+        parser.add_argument('--format', choices=(FORMAT_CSV, FORMAT_JSONL),
+                            help='input format (inferred from the file extension by default)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='number of rows validated and inserted at a time')
+        parser.add_argument('--checkpoint',
+                            help='file recording the committed progress; an existing one resumes the import '
+                                 '(rows committed after the last checkpoint, e.g. before a crash, are imported again)')
+        parser.add_argument('--errors', help='file to write invalid rows to (JSONL with 1-based row numbers)')
+        parser.add_argument('--dry-run', action='store_true', help='only validate, write nothing')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        try:
+            validator_class = import_string(options['validator'])
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        path = options['file']
+        fmt = options['format'] or format_extensions.get(os.path.splitext(path)[1].lower())
+        if fmt is None:
+            raise CommandError('Cannot infer the format of `{0}`, use --format.'.format(path))
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be a positive integer.')
+        dry_run = options['dry_run']
+        checkpoint = None if dry_run else options['checkpoint']
+
+        state = {'rows': 0, 'created': 0, 'failed': 0}
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                state.update(json.load(file))
+            self.log('Resuming after row {0}.'.format(state['rows']))
+
+        manager = ValidatedManager(model, validator_class, no_save=dry_run)
+        errors_file = open(options['errors'], 'a' if state['rows'] else 'w') if options['errors'] else None
+        started, start_rows = time.monotonic(), state['rows']
+
+        try:
+            with open(path, newline='' if fmt == FORMAT_CSV else None, encoding='utf-8') as file:
+                rows = islice(read_rows(file, fmt), state['rows'], None)
+                # a single `create_many` call per chunk, so that a checkpoint can follow each commit
+                for chunk in chunked(rows, chunk_size):
+                    summary = self.import_chunk(manager, chunk, state['rows'], errors_file)
+                    state['rows'] += len(chunk)
+                    state['created'] += summary.count
+                    state['failed'] += summary.failed
+                    if checkpoint:
+                        if errors_file is not None:
+                            errors_file.flush()
+                        self.write_checkpoint(checkpoint, state)
+                    rate = (state['rows'] - start_rows) / max(time.monotonic() - started, 1e-6)
+                    self.log('{rows} rows, {created} {verb}, {failed} failed ({rate:.0f} rows/s)'.format(
+                        verb='valid' if dry_run else 'created', rate=rate, **state))
+        finally:
+            if errors_file is not None:
+                errors_file.close()
+
+        self.log('Done: {created} {verb}, {failed} failed.'.format(
+            verb='valid' if dry_run else 'created', **state), self.style.SUCCESS)
+
+    @classmethod
+    def import_chunk(cls, manager, chunk, offset, errors_file) -> BulkSummary:
+        """
+        Validates and creates one chunk of rows in a transaction, reporting the invalid ones.
+        The transaction also covers the `did_create_many` hooks. If writing the chunk or running
+        its hooks fails (e.g. a value the database rejects or a malformed CSV row), the chunk is
+        rolled back and its rows are imported one by one, each in its own transaction,
+        so that only the failing rows are reported.
+        :param offset: number of rows before the chunk
+        :return: {BulkSummary}
+        """
+        positions = [i for i, row in enumerate(chunk) if row is not None]
+        reported = []
+
+        def on_error(index, detail):
+            reported.append((offset + positions[index] + 1, detail))
+
+        try:
+            with transaction.atomic():
+                summary = manager.create_many([chunk[i] for i in positions], chunk_size=len(chunk),
+                                              on_error=on_error)
+        except (ValueError, TypeError, DatabaseError):
+            summary = BulkSummary()
+            reported.clear()
+            for position in positions:
+                cls.import_row(manager, chunk[position], offset + position + 1, summary, reported)
+        if errors_file is not None:
+            for row, detail in reported:
+                errors_file.write(json.dumps({'row': row, 'errors': detail}) + '\n')
+        return summary
+
+    @staticmethod
+    def import_row(manager, attrs, row, summary, reported):
+        def on_error(index, detail):
+            reported.append((row, detail))
+
+        try:
+            with transaction.atomic():
+                result = manager.create_many([attrs], chunk_size=1, on_error=on_error)
+        except (ValueError, TypeError, DatabaseError) as e:
+            reported.append((row, {api_settings.NON_FIELD_ERRORS_KEY: [str(e)]}))
+            summary.failed += 1
+            return
+        summary.count += result.count
+        summary.failed += result.failed
+        summary.pks.extend(result.pks)
+
+    @staticmethod
+    def write_checkpoint(path, state):
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+        os.replace(temporary, path)
+
+    def log(self, message, style=None):
+        if self.verbosity:
+            self.stdout.write(style(message) if style else message)
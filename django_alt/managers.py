@@ -1,5 +1,201 @@
-from django_alt.abstract.validators import Validator
-from django_alt.utils.shortcuts import coal
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+
+import django
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction, connections, router, IntegrityError
+from django.db.models import QuerySet, UniqueConstraint
+from rest_framework import serializers
+
+from django_alt.abstract.validators import Validator, run_validation_phases
+from django_alt.dotdict import undefined
+from django_alt.utils.functional import chunked
+from django_alt.utils.queries import PHASE_VALIDATION, PHASE_WRITE, PHASE_HOOKS
+from django_alt.utils.shortcuts import coal, collect_errors, make_error, validation_error_class
+from django_alt.utils.tracing import phase
+
+ATOMIC_CHUNK = 'chunk'
+ATOMIC_ALL = 'all'
+
+
+class BulkSummary:
+    """
+    Lightweight result of a chunked bulk operation.
+    Holds counts and primary keys instead of model instances.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.chunks = 0
+        self.failed = 0
+        self.pks = []
+
+    def __repr__(self):
+        return '<{0} count={1} chunks={2} failed={3}>'.format(self.__class__.__name__, self.count, self.chunks,
+                                                              self.failed)
+
+    def add_chunk(self, instances_or_attrs):
+        self.chunks += 1
+        self.count += len(instances_or_attrs)
+        self.pks.extend(i.pk for i in instances_or_attrs if getattr(i, 'pk', None) is not None)
+
+    def add_pks(self, pks):
+        self.chunks += 1
+        self.count += len(pks)
+        self.pks.extend(pks)
+
+
+def is_unique_together(model, field_names) -> bool:
+    """
+    Checks that a model declares the fields unique together, i.e. a `unique` field,
+    a `unique_together` entry or an unconditional `UniqueConstraint` on exactly these fields.
+    :param model: model class
+    :param field_names: names of the fields
+    :return: {bool}
+    """
+    names = frozenset(field_names)
+    meta = model._meta
+    if len(names) == 1:
+        name, = names
+        try:
+            if meta.get_field(name).unique:
+                return True
+        except FieldDoesNotExist:
+            return False
+    if any(frozenset(fields) == names for fields in meta.unique_together):
+        return True
+    return any(isinstance(c, UniqueConstraint) and c.condition is None and frozenset(c.fields) == names
+               for c in meta.constraints)
+
+
+def upsert(instance, attrs: dict, unique_fields) -> tuple:
+    """
+    Writes validated attrs onto an existing or a new (unsaved) instance, inserting the row
+    or updating the one with the same `unique_fields` key, so that concurrent writes to the
+    same key update the row instead of failing. Whether the row was created is decided by the
+    write itself, not by an earlier read: on PostgreSQL with a single
+    `INSERT ... ON CONFLICT DO UPDATE ... RETURNING (xmax = 0)` statement, on other databases
+    with an `INSERT` (in a savepoint) followed by an `UPDATE` of the key if it conflicts.
+    An existing instance is saved as is; changing its key to one of another row is a validation error.
+    A new instance that ends up updating a row reloads the columns that were not written.
+    Many to many attrs are set after the row is written.
+    :param instance: model instance to write
+    :param attrs: attributes to set on the instance
+    :param unique_fields: names of the fields that identify the row (must be unique together, see
+                          `is_unique_together`)
+    :return: (the saved instance, whether the row was created)
+    :raises: serializers.ValidationError if the key of an existing instance is taken
+    """
+    model = type(instance)
+    attrs = dict(attrs)
+    many_to_many = {f.name: attrs.pop(f.name) for f in model._meta.many_to_many if f.name in attrs}
+    for k, v in attrs.items():
+        setattr(instance, k, v)
+
+    unique_fields = list(unique_fields)
+    update_fields = [k for k in attrs if k not in unique_fields]
+    using = router.db_for_write(model, instance=instance)
+    connection = connections[using]
+
+    adding = instance._state.adding
+    if not adding:
+        created = _update_existing(instance, unique_fields, using)
+    elif update_fields and connection.vendor == 'postgresql':
+        created = _upsert_statement(connection, instance, unique_fields, update_fields)
+    else:
+        created = _insert_or_update(instance, unique_fields, update_fields, using)
+    instance._state.adding = False
+    instance._state.db = using
+    unwritten = [f.attname for f in model._meta.concrete_fields
+                 if f.name not in attrs and f is not model._meta.pk]
+    if adding and not created and unwritten:
+        # the row existed, so the columns that were not written hold their stored values
+        instance.refresh_from_db(using=using, fields=unwritten)
+
+    for name, value in many_to_many.items():
+        getattr(instance, name).set(value)
+    return instance, created
+
+
+def _upsert_statement(connection, instance, unique_fields, update_fields) -> bool:
+    meta = instance._meta
+    quote = connection.ops.quote_name
+    fields = [f for f in meta.concrete_fields if f is not meta.auto_field]
+    sql = 'INSERT INTO {0} ({1}) VALUES ({2}) ON CONFLICT ({3}) DO UPDATE SET {4} RETURNING {5}, (xmax = 0)'.format(
+        quote(meta.db_table),
+        ', '.join(quote(f.column) for f in fields),
+        ', '.join(['%s'] * len(fields)),
+        ', '.join(quote(meta.get_field(name).column) for name in unique_fields),
+        ', '.join('{0} = EXCLUDED.{0}'.format(quote(meta.get_field(name).column)) for name in update_fields),
+        quote(meta.pk.column))
+    params = [f.get_db_prep_save(f.pre_save(instance, True), connection) for f in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        pk, created = cursor.fetchone()
+    instance.pk = pk
+    return created
+
+
+def _update_existing(instance, unique_fields, using) -> bool:
+    model = type(instance)
+    try:
+        with transaction.atomic(using=using):
+            instance.save(using=using)
+    except IntegrityError:
+        key = {f: getattr(instance, f) for f in unique_fields}
+        if model._base_manager.using(using).filter(**key).exclude(pk=instance.pk).exists():
+            raise validation_error_class(make_error(unique_fields, 'An item with this value already exists'))
+        raise
+    return False
+
+
+def _insert_or_update(instance, unique_fields, update_fields, using) -> bool:
+    model = type(instance)
+    try:
+        with transaction.atomic(using=using):
+            instance.save(force_insert=True, using=using)
+        return True
+    except IntegrityError:
+        rows = model._base_manager.using(using).filter(**{f: getattr(instance, f) for f in unique_fields})
+        if update_fields:
+            fields = [model._meta.get_field(name) for name in update_fields]
+            updated = rows.update(**{f.attname: getattr(instance, f.attname) for f in fields})
+        else:
+            updated = rows.count()
+        if not updated:
+            # the insert failed for another reason than a conflict on the key
+            raise
+    instance.pk = rows.values_list('pk', flat=True).get()
+    return False
+
+
+def _init_validation_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _validation_results(manager, items, stop_at_error):
+    """
+    Runs the pure validation phases for each item.
+    :return: a generator of (validated_attrs, None) or (None, error_detail) pairs
+    """
+    for attrs in items:
+        try:
+            yield manager.validation_sequence(attrs), None
+        except serializers.ValidationError as e:
+            yield None, e.detail
+            if stop_at_error:
+                return
+
+
+def _validate_shard(model, validator_class, context, shard, stop_at_error):
+    """
+    Validates a shard of items in a worker process.
+    """
+    manager = ValidatedManager(model, validator_class, no_save=True, **context)
+    return list(_validation_results(manager, shard, stop_at_error))
 
 
 class ValidatedManager:
@@ -14,13 +210,9 @@ class ValidatedManager:
         self.validator = validator_class(model=model, serializer=None, **context)
 
     def validation_sequence(self, attrs: dict):
-        self.validator.clean_fields(attrs, attrs.keys())
-
-        attrs = coal(self.validator.clean(attrs), attrs)
-        attrs = coal(self.validator.base(attrs), attrs)
-
-        self.validator.validate_fields(attrs, attrs.keys())
-        self.validator.validate_checks(attrs)
+        with phase(PHASE_VALIDATION), collect_errors() if self.validator.collects_errors else nullcontext():
+            attrs = run_validation_phases(self.validator, attrs)
+        return attrs
 
     def create(self, **attrs):
         """
@@ -34,8 +226,10 @@ class ValidatedManager:
         attrs = coal(self.validator.base_db(attrs), attrs)
 
         if not self.no_save:
-            instance = self.model.objects.create(**attrs)
-            self.validator.did_create(instance, attrs)
+            with phase(PHASE_WRITE):
+                instance = self.model.objects.create(**attrs)
+            with phase(PHASE_HOOKS):
+                self.validator.did_create(instance, attrs)
             return instance
 
         return attrs
@@ -54,31 +248,257 @@ class ValidatedManager:
         if not self.no_save:
             for k, v in attrs.items():
                 setattr(instance, k, v)
-            instance.save()
-            self.validator.did_update(instance, attrs)
+            with phase(PHASE_WRITE):
+                instance.save()
+            with phase(PHASE_HOOKS):
+                self.validator.did_update(instance, attrs)
             return instance
 
         return attrs
 
-    def delete(self, queryset):
-        self.validator.will_delete(queryset)
-        queryset.delete()
-        self.validator.did_delete()
+    def update_many(self, pairs_or_queryset, attrs_or_list=None, chunk_size=1000,
+                    atomic=ATOMIC_CHUNK) -> BulkSummary:
+        """
+        Validates and updates model instances in chunks using `bulk_update`.
+        Only columns whose values actually change are written: `update_fields`
+        is the union of changed keys within a chunk. `did_update_many` is called
+        on the validator after each chunk is written; with `ATOMIC_ALL` the calls are deferred
+        until the whole operation is committed (`transaction.on_commit`), so that they never
+        run for updates that are rolled back.
+        Can be called as:
+            update_many([(instance, attrs), ...])
+            update_many(queryset_or_instances, attrs)  # same attrs for every instance
+            update_many(queryset_or_instances, [attrs, ...])  # attrs for each instance
+        :param pairs_or_queryset: an iterable of (instance, attrs) pairs or an iterable of instances
+        :param attrs_or_list: attrs for every instance or a list of attrs for each instance
+        :param chunk_size: number of instances to validate and write at a time
+        :param atomic: `ATOMIC_CHUNK`, `ATOMIC_ALL` or None (see `create_many`)
+        :return: {BulkSummary} of the instances that were changed
+        """
+        summary = BulkSummary()
+        with transaction.atomic() if atomic == ATOMIC_ALL else nullcontext():
+            for chunk in chunked(self._update_pairs(pairs_or_queryset, attrs_or_list, chunk_size), chunk_size):
+                chunk = [(instance, self._validate_for_update(instance, attrs)) for instance, attrs in chunk]
+                if self.no_save:
+                    summary.add_chunk([attrs for _, attrs in chunk])
+                    continue
+                changed, update_fields = [], []
+                for instance, attrs in chunk:
+                    changed_keys = [k for k, v in attrs.items() if getattr(instance, k, undefined) != v]
+                    for k in changed_keys:
+                        setattr(instance, k, attrs[k])
+                        k in update_fields or update_fields.append(k)
+                    if len(changed_keys):
+                        changed.append((instance, attrs))
+                if not len(changed):
+                    continue
+                instances = [instance for instance, _ in changed]
+                with transaction.atomic() if atomic == ATOMIC_CHUNK else nullcontext():
+                    self.model.objects.bulk_update(instances, update_fields, batch_size=chunk_size)
+                did_update = partial(self.validator.did_update_many, instances, [attrs for _, attrs in changed])
+                if atomic == ATOMIC_ALL:
+                    transaction.on_commit(did_update)
+                else:
+                    did_update()
+                summary.add_chunk(instances)
+        return summary
+
+    def update_queryset(self, queryset, **attrs):
+        """
+        Validates constant attrs once and updates every row of the queryset
+        with a single SQL `UPDATE`, without loading the rows.
+        Requires the validator to declare `allows_queryset_update = True`, i.e. that it
+        has no per-instance update logic (`will_update`, `did_update`) that must run.
+        :param queryset: rows to update
+        :param attrs: attributes to set on every row
+        :return: number of updated rows (validated attrs if `no_save` is set)
+        """
+        assert self.validator.allows_queryset_update, (
+            'Validator `{0}` must declare `allows_queryset_update = True` to be used '
+            'with `update_queryset`, as per-instance update logic is not executed.'
+        ).format(self.validator.__class__.__name__)
 
-    def create_many(self, list_of_attrs):
+        attrs = self.validation_sequence(attrs)
+        attrs = coal(self.validator.will_update_queryset(queryset, attrs), attrs)
+        attrs = coal(self.validator.base_db(attrs), attrs)
+
+        if not self.no_save:
+            count = queryset.update(**attrs)
+            self.validator.did_update_queryset(queryset, attrs, count)
+            return count
+
+        return attrs
+
+    def upsert(self, unique_fields, **attrs):
         """
-        TBA
-        :param list_of_attrs:
-        :return:
+        Validates attrs and creates or updates the instance identified by `unique_fields`
+        (see `upsert`), looked up by their cleaned values. Whether the row exists when validating
+        decides if `will_create` or `will_update` is called, while `did_create` or `did_update` (and `created`)
+        follow what the write actually did, which can differ under concurrent writes.
+        :param unique_fields: names of the fields that identify the row (must be unique together)
+        :param attrs: attributes to create or update the instance with
+        :return: (instance, created) (validated attrs instead of the instance if `no_save` is set)
+        :raises: serializers.ValidationError if attrs lack one of `unique_fields`
         """
-        instances = []
-        list_of_attrs = list(list_of_attrs)
-        for attrs in list_of_attrs:
-            self.validation_sequence(attrs)
-            instances.append(self.model(**attrs))
-
-        self.model.objects.bulk_create(instances)
-        for instance, attrs in zip(instances, list_of_attrs):
+        assert is_unique_together(self.model, unique_fields), (
+            'Upsert fields `{0}` must be unique together on model `{1}` '
+            '(a `unique` field, `unique_together` or a `UniqueConstraint`).'
+        ).format(', '.join(unique_fields), self.model.__name__)
+        attrs = self.validation_sequence(attrs)
+        missing = [f for f in unique_fields if f not in attrs]
+        if missing:
+            raise validation_error_class(make_error(missing, 'This field is required'))
+        existing = self.model.objects.filter(**{f: attrs[f] for f in unique_fields}).first()
+        if existing is None:
+            attrs = self._prepare_for_create(attrs)
+        else:
+            attrs = self._prepare_for_update(existing, attrs)
+
+        if self.no_save:
+            return attrs, existing is None
+
+        instance, created = upsert(existing if existing is not None else self.model(), attrs, unique_fields)
+        if created:
             self.validator.did_create(instance, attrs)
+        else:
+            self.validator.did_update(instance, attrs)
+        return instance, created
+
+    @staticmethod
+    def _update_pairs(pairs_or_queryset, attrs_or_list, chunk_size):
+        if isinstance(pairs_or_queryset, QuerySet):
+            pairs_or_queryset = pairs_or_queryset.iterator(chunk_size=chunk_size)
+        if attrs_or_list is None:
+            return pairs_or_queryset
+        if isinstance(attrs_or_list, dict):
+            return ((instance, dict(attrs_or_list)) for instance in pairs_or_queryset)
+        return zip(pairs_or_queryset, attrs_or_list)
+
+    def _validate_for_update(self, instance, attrs):
+        return self._prepare_for_update(instance, self.validation_sequence(attrs))
+
+    def _prepare_for_update(self, instance, attrs):
+        attrs = coal(self.validator.will_update(instance, attrs), attrs)
+        return coal(self.validator.base_db(attrs), attrs)
+
+    def delete(self, queryset, chunk_size=None, before_delete=None) -> BulkSummary:
+        """
+        Deletes a queryset or a model instance.
+        If `chunk_size` is given, rows are deleted in batches of primary keys (in pk order),
+        each batch in its own transaction, which keeps memory and lock time bounded.
+        `will_delete_many` and `did_delete_many` are then called for each batch.
+        Sliced and combined (e.g. `union`) querysets have their primary keys fetched at once.
+        :param queryset: a queryset or a model instance to delete
+        :param chunk_size: (optional) number of rows to delete at a time
+        :param before_delete: (optional) callable run before any row is deleted (e.g. a permission check):
+                              after `will_delete`, or after `will_delete_many` of the first batch when
+                              deleting in chunks
+        :return: {BulkSummary} (pks are only collected when deleting in chunks)
+        """
+        summary = BulkSummary()
+        if chunk_size is None or not isinstance(queryset, QuerySet):
+            self.validator.will_delete(queryset)
+            before_delete is None or before_delete()
+            _, deleted = queryset.delete()
+            self.validator.did_delete()
+            summary.chunks = 1
+            summary.count = deleted.get(self.model._meta.label, 0)
+            return summary
 
-        return instances
+        if queryset.query.is_sliced or queryset.query.combinator:
+            batches = chunked(queryset.values_list('pk', flat=True), chunk_size)
+        else:
+            batches = self._pk_batches(queryset.order_by('pk').values_list('pk', flat=True), chunk_size)
+        for pks in batches:
+            batch = self.model.objects.filter(pk__in=pks)
+            self.validator.will_delete_many(batch, pks)
+            if before_delete is not None and not summary.chunks:
+                before_delete()
+            with transaction.atomic():
+                batch.delete()
+            self.validator.did_delete_many(pks)
+            summary.add_pks(pks)
+        if before_delete is not None and not summary.chunks:
+            before_delete()
+        return summary
+
+    @staticmethod
+    def _pk_batches(pk_queryset, chunk_size):
+        pks = list(pk_queryset[:chunk_size])
+        while len(pks):
+            yield pks
+            pks = list(pk_queryset.filter(pk__gt=pks[-1])[:chunk_size])
+
+    def create_many(self, iterable_of_attrs, chunk_size=1000, atomic=ATOMIC_CHUNK, parallel=None,
+                    on_error=None) -> BulkSummary:
+        """
+        Validates and creates model instances in chunks, so that only
+        one chunk of items is held in memory and inserted at a time.
+        Each chunk is validated fully before it is written. `did_create_many`
+        is called on the validator after each chunk is inserted.
+        With `parallel` set, the pure validation phases (`clean_fields`, `clean`, `base`,
+        `validate_fields`, `validate_checks`) of each chunk are sharded across a pool of
+        worker processes. `will_create`, `base_db` and writes stay in the calling process.
+        The validator class (and the context) must then be picklable, i.e. defined at module level,
+        and its pure hooks must not rely on state changed by the calling process.
+        :param iterable_of_attrs: any iterable (or generator) of attribute dicts
+        :param chunk_size: number of items to validate and insert at a time
+        :param atomic: `ATOMIC_CHUNK` wraps each chunk in a transaction,
+                       `ATOMIC_ALL` wraps the whole operation in one and
+                       None uses no explicit transaction
+        :param parallel: (optional) number of worker processes to validate with
+        :param on_error: (optional) callable `on_error(index, error_detail)`. If given, invalid items
+                         are reported to it (by their position in the input) and skipped instead of raising
+        :return: {BulkSummary} (with no pks if the database backend cannot return them)
+        """
+        summary = BulkSummary()
+        executor = ProcessPoolExecutor(parallel, initializer=_init_validation_worker) if parallel else None
+        offset = 0
+        with executor or nullcontext(), transaction.atomic() if atomic == ATOMIC_ALL else nullcontext():
+            for chunk in chunked(iterable_of_attrs, chunk_size):
+                if executor is None:
+                    results = _validation_results(self, chunk, on_error is None)
+                else:
+                    results = self._validate_in_parallel(executor, chunk, parallel, on_error is None)
+                start, offset = offset, offset + len(chunk)
+                chunk = list(self._prepare_results(results, start, on_error, summary))
+                if not chunk:
+                    continue
+                if self.no_save:
+                    summary.add_chunk(chunk)
+                    continue
+                instances = [self.model(**attrs) for attrs in chunk]
+                with phase(PHASE_WRITE, items=len(instances)), \
+                        transaction.atomic() if atomic == ATOMIC_CHUNK else nullcontext():
+                    self.model.objects.bulk_create(instances, batch_size=chunk_size)
+                with phase(PHASE_HOOKS):
+                    self.validator.did_create_many(instances, chunk)
+                summary.add_chunk(instances)
+        return summary
+
+    def _validate_in_parallel(self, executor, chunk, shards, stop_at_error):
+        size = -(-len(chunk) // shards)
+        futures = [executor.submit(_validate_shard, self.model, type(self.validator), self.validator.context,
+                                   chunk[i:i + size], stop_at_error) for i in range(0, len(chunk), size)]
+        for future in futures:
+            yield from future.result()
+
+    def _prepare_results(self, results, offset, on_error, summary):
+        for index, (attrs, error) in enumerate(results, offset):
+            if error is None:
+                try:
+                    yield self._prepare_for_create(attrs)
+                    continue
+                except serializers.ValidationError as e:
+                    error = e.detail
+            if on_error is None:
+                raise serializers.ValidationError(error)
+            on_error(index, error)
+            summary.failed += 1
+
+    def _validate_for_create(self, attrs):
+        return self._prepare_for_create(self.validation_sequence(attrs))
+
+    def _prepare_for_create(self, attrs):
+        attrs = coal(self.validator.will_create(attrs), attrs)
+        return coal(self.validator.base_db(attrs), attrs)
@@ -0,0 +1,167 @@
+import weakref
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import QuerySet
+from rest_framework import fields as drf_fields
+from rest_framework import relations
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+
+from django_alt.abstract.serializers import BaseValidatedSerializer
+
+READ_PASSTHROUGH = 'passthrough'
+READ_CONVERTED = 'converted'
+READ_CUSTOM = 'custom'
+
+"""
+Serializer field representations that return the database value unchanged,
+provided the underlying model field produces a value of the matching type.
+"""
+_passthrough_representations = {
+    drf_fields.CharField.to_representation: (models.CharField, models.TextField),
+    drf_fields.IntegerField.to_representation: (models.IntegerField, models.AutoField),
+    drf_fields.BooleanField.to_representation: (models.BooleanField,),
+    drf_fields.FloatField.to_representation: (models.FloatField,),
+}
+
+
+def _model_field(model, source):
+    try:
+        return model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+
+
+def compile_field(model, field) -> tuple:
+    """
+    Determines how a serializer field can be read.
+    :param model: model class the serializer operates on (can be None)
+    :param field: a bound serializer field
+    :return: (read_kind, attname) where attname is None for custom fields
+    """
+    custom = READ_CUSTOM, None
+    if model is None or len(field.source_attrs) != 1:
+        return custom
+    model_field = _model_field(model, field.source)
+    if model_field is None or not model_field.concrete:
+        return custom
+
+    if model_field.is_relation:
+        if (type(field) is relations.PrimaryKeyRelatedField and field.pk_field is None
+                and (model_field.many_to_one or model_field.one_to_one)):
+            return READ_PASSTHROUGH, model_field.attname
+        return custom
+
+    if type(field).get_attribute is not drf_fields.Field.get_attribute or isinstance(field, relations.RelatedField):
+        return custom
+    model_types = _passthrough_representations.get(type(field).to_representation, ())
+    if isinstance(model_field, model_types):
+        return READ_PASSTHROUGH, model_field.attname
+    return READ_CONVERTED, model_field.attname
+
+
+class CompiledReader:
+    """
+    Produces the same representation as `serializer.data` while skipping
+    DRF field-by-field `to_representation` for simple model fields.
+    If every readable field is simple, rows are fetched with a
+    `values_list` projection and no model instances are built.
+    Serializers that override `to_representation` are read through it,
+    item by item, as the compiled plan cannot reproduce the override.
+    """
+    _plans = weakref.WeakKeyDictionary()
+
+    def __init__(self, serializer):
+        """
+        :param serializer: a (non-list) serializer instance to read with
+        """
+        self.serializer = serializer
+        self.plan = self.compile(serializer)
+        self.projection = tuple(OrderedDict.fromkeys(attname for _, kind, attname in self.plan
+                                                     if kind != READ_CUSTOM))
+        self.projectable = all(kind != READ_CUSTOM for _, kind, _ in self.plan)
+        self.compilable = self.is_compilable(serializer)
+
+    @staticmethod
+    def is_compilable(serializer) -> bool:
+        """
+        Whether the serializer represents instances with the default
+        (DRF or `BaseValidatedSerializer`) `to_representation`
+        :return: {bool}
+        """
+        cls = type(serializer)
+        if isinstance(serializer, BaseValidatedSerializer):
+            return (cls.to_representation is BaseValidatedSerializer.to_representation
+                    and cls._to_representation is BaseValidatedSerializer._to_representation)
+        return cls.to_representation is serializers.Serializer.to_representation
+
+    @classmethod
+    def compile(cls, serializer) -> tuple:
+        """
+        Builds (or fetches a cached) read plan for the serializer.
+        :return: a tuple of (field_name, read_kind, attname) triples
+        """
+        readable = tuple(serializer._readable_fields)
+        plans = cls._plans.setdefault(type(serializer), {})
+        key = tuple(f.field_name for f in readable)
+        if key not in plans:
+            model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+            plans[key] = tuple((f.field_name,) + compile_field(model, f) for f in readable)
+        return plans[key]
+
+    def represent(self, data):
+        """
+        Represents a queryset, an iterable of instances or a single instance.
+        :return: a list of representations or a single representation
+        """
+        if not self.compilable:
+            if isinstance(data, models.Model):
+                return self.serializer.to_representation(data)
+            return [self.serializer.to_representation(instance) for instance in data]
+        if isinstance(data, models.Model):
+            return self.from_instance(data)
+        if isinstance(data, QuerySet) and self.projectable:
+            indexes = {attname: i for i, attname in enumerate(self.projection)}
+            plan = [(name, kind, indexes[attname]) for name, kind, attname in self.plan]
+            return [self.from_row(plan, row) for row in data.values_list(*self.projection)]
+        return [self.from_instance(instance) for instance in data]
+
+    def from_row(self, plan, row) -> OrderedDict:
+        fields = self.serializer.fields
+        ret = OrderedDict()
+        for name, kind, index in plan:
+            value = row[index]
+            ret[name] = value if value is None or kind == READ_PASSTHROUGH else fields[name].to_representation(value)
+        return self.finalize(ret)
+
+    def from_instance(self, instance) -> OrderedDict:
+        fields = self.serializer.fields
+        ret = OrderedDict()
+        for name, kind, attname in self.plan:
+            if kind == READ_CUSTOM:
+                field = fields[name]
+                try:
+                    attribute = field.get_attribute(instance)
+                except SkipField:
+                    continue
+                check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+                ret[name] = None if check_for_none is None else field.to_representation(attribute)
+            else:
+                value = getattr(instance, attname)
+                ret[name] = value if value is None or kind == READ_PASSTHROUGH else fields[name].to_representation(value)
+        return self.finalize(ret)
+
+    def finalize(self, representation: OrderedDict) -> OrderedDict:
+        """
+        Runs the validator `to_representation` hook, as `BaseValidatedSerializer` would
+        """
+        serializer = self.serializer
+        if not isinstance(serializer, BaseValidatedSerializer):
+            return representation
+        result = serializer.validator.to_representation(representation,
+                                                        serializer.validated_data
+                                                        if hasattr(serializer, '_validated_data') else None)
+        return serializer.trim_representation(result if result else representation)
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 
 from .abstract.serializers import BaseValidatedSerializer
+from .utils.queries import PHASE_WRITE, PHASE_HOOKS
+from .utils.tracing import phase
 
 
 class ValidatedModelSerializer(BaseValidatedSerializer, serializers.ModelSerializer):
@@ -11,13 +13,17 @@ class ValidatedModelSerializer(BaseValidatedSerializer, serializers.ModelSeriali
         return self.Meta.validator_class(model=self.Meta.model, serializer=self, **kwargs)
 
     def create(self, validated_data: dict):
-        instance = super().create(validated_data)
-        self.validator.did_create(instance, validated_data)
+        with phase(PHASE_WRITE):
+            instance = super().create(validated_data)
+        with phase(PHASE_HOOKS):
+            self.validator.did_create(instance, validated_data)
         return instance
 
     def update(self, instance, validated_data: dict):
-        instance = super().update(instance, validated_data)
-        self.validator.did_update(instance, validated_data)
+        with phase(PHASE_WRITE):
+            instance = super().update(instance, validated_data)
+        with phase(PHASE_HOOKS):
+            self.validator.did_update(instance, validated_data)
         return instance
 
 
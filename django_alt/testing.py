@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.urls import get_resolver, URLPattern, URLResolver, reverse, NoReverseMatch
+
+from django_alt.utils.queries import capture_request_queries
+
+
+def registered_endpoints(urlconf=None):
+    """
+    Finds the endpoints registered in the url configuration.
+    :param urlconf: (optional) url configuration module (the root one by default)
+    :return: a generator of (url name, endpoint class) pairs of the named url patterns
+    """
+
+    def walk(patterns, namespace):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns, pattern.namespace or namespace)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                view_class = getattr(pattern.callback, 'cls', None)
+                endpoint = getattr(view_class, 'endpoint_class', None)
+                if endpoint is not None:
+                    yield (namespace + ':' + pattern.name if namespace else pattern.name), endpoint
+
+    yield from walk(get_resolver(urlconf).url_patterns, None)
+
+
+def query_counts(client, path, fixture, sizes=(1, 10), method='get', **request_kwargs) -> list:
+    """
+    Requests an endpoint once per fixture size and counts the queries of each request.
+    The fixture data of each size is rolled back after the request.
+    :param client: a test client
+    :param path: url of the endpoint
+    :param fixture: callable `fixture(size)` creating `size` rows of data
+    :param sizes: fixture sizes to request the endpoint with
+    :param method: HTTP method of the request
+    :param request_kwargs: passed to the client method (e.g. `data`, `format`)
+    :return: number of queries of the request for each size
+    """
+    counts = []
+    for size in sizes:
+        with transaction.atomic():
+            fixture(size)
+            with capture_request_queries() as logs:
+                getattr(client, method)(path, **request_kwargs)
+            counts.append(sum(log.count for log in logs))
+            transaction.set_rollback(True)
+    return counts
+
+
+def assert_queries_do_not_scale(client, fixture, sizes=(1, 10), url_names=None, method='get', urlconf=None) -> dict:
+    """
+    Requests endpoints with fixture data of growing sizes and checks that their
+    query counts do not grow with the number of rows (i.e. that there are no N+1 queries).
+    :param client: a test client
+    :param fixture: callable `fixture(size)` creating `size` rows of data
+    :param sizes: fixture sizes to request the endpoints with
+    :param url_names: (optional) names of the urls to request; by default every registered
+                      endpoint url that can be reversed without arguments
+    :param method: HTTP method of the requests
+    :param urlconf: (optional) url configuration module
+    :return: {url name: query counts}
+    :raises AssertionError: listing every endpoint whose query count grows
+    """
+    if url_names is None:
+        url_names = [name for name, _ in registered_endpoints(urlconf)]
+    results = {}
+    for name in url_names:
+        try:
+            path = reverse(name, urlconf=urlconf)
+        except NoReverseMatch:
+            continue
+        results[name] = query_counts(client, path, fixture, sizes, method)
+
+    scaling = {name: counts for name, counts in results.items() if counts[-1] > counts[0]}
+    assert not scaling, 'Query counts grow with the number of rows (sizes {0}):\n{1}'.format(
+        list(sizes), '\n'.join('`{0}`: {1}'.format(name, counts) for name, counts in scaling.items()))
+    return results
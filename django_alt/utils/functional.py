@@ -1,3 +1,6 @@
+from itertools import islice
+
+
 def compose_and(*functions):
     """
     Composes an iterable of callables with identical signatures
@@ -8,3 +11,20 @@ def compose_and(*functions):
     def func_prototype(*args, **kwargs):
         return all(f(*args, **kwargs) for f in functions)
     return func_prototype
+
+
+def chunked(iterable, size):
+    """
+    Splits an iterable (or a generator) into lists of at most `size` items
+    without materializing the whole iterable.
+    :param iterable: an iterable to split
+    :param size: maximum length of a chunk
+    :return: a generator of lists
+    """
+    assert size > 0, 'Chunk size must be a positive integer.'
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
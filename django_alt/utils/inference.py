@@ -0,0 +1,148 @@
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from rest_framework import relations
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+class QueryPlan:
+    """
+    A set of `select_related`, `prefetch_related` and `only` arguments
+    that a serializer needs to represent a queryset without lazy queries.
+    """
+
+    def __init__(self, select_related=(), prefetch_related=(), only=None):
+        """
+        :param select_related: lookups to join
+        :param prefetch_related: lookups to prefetch
+        :param only: fields to load, None if every field must be loaded
+        """
+        self.select_related = tuple(OrderedDict.fromkeys(select_related))
+        self.prefetch_related = tuple(OrderedDict.fromkeys(prefetch_related))
+        self.only = tuple(OrderedDict.fromkeys(only)) if only is not None else None
+
+    def __bool__(self):
+        return bool(self.select_related or self.prefetch_related or self.only)
+
+    def __repr__(self):
+        return '<QueryPlan select_related={0} prefetch_related={1} only={2}>'.format(
+            self.select_related, self.prefetch_related, self.only)
+
+    def describe(self) -> dict:
+        """
+        Debug view of what was inferred
+        :return: {dict}
+        """
+        return {
+            'select_related': list(self.select_related),
+            'prefetch_related': list(self.prefetch_related),
+            'only': list(self.only) if self.only is not None else None
+        }
+
+    def apply(self, queryset):
+        """
+        Applies the plan to a queryset. Anything that is not a model instance
+        QuerySet (e.g. a single instance or a `.values()` QuerySet) is returned untouched,
+        as are combined (`union`, `intersection`, `difference`) and sliced querysets,
+        which cannot be altered any further. `only` is skipped if the queryset already defines its own joins or deferred fields.
+        :param queryset: query product of the endpoint config
+        :return: the optimized queryset
+        """
+        if not isinstance(queryset, QuerySet) or queryset._fields is not None:
+            return queryset
+        if queryset.query.combinator or queryset.query.is_sliced:
+            return queryset
+        has_own_loading = queryset.query.select_related is not False or queryset.query.deferred_loading[0]
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only is not None and not has_own_loading:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+class _Inference:
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = []
+
+    def walk(self, serializer, model, prefix='', prefetched=False) -> bool:
+        """
+        Collects lookups required by the readable fields of a serializer.
+        :return: whether every accessed model field could be resolved
+        """
+        exact = True
+        for field in serializer._readable_fields:
+            if field.source == '*':
+                if isinstance(field, BaseSerializer):
+                    exact = self.walk(field, model, prefix, prefetched) and exact
+                else:
+                    exact = False
+                continue
+            exact = self.walk_source(field, model, prefix, prefetched) and exact
+        return exact
+
+    def walk_source(self, field, model, prefix, prefetched) -> bool:
+        attrs = field.source_attrs
+        for i, attr in enumerate(attrs):
+            last = i == len(attrs) - 1
+            model_field = _model_field(model, attr)
+            if model_field is None or (model_field.is_relation and model_field.related_model is None):
+                return False
+            lookup = prefix + attr
+
+            if not model_field.is_relation:
+                prefetched or self.only.append(lookup)
+                return last
+
+            if model_field.many_to_many or model_field.one_to_many:
+                self.prefetch_related.append(lookup)
+                if not last:
+                    return False
+                if isinstance(field, ListSerializer):
+                    self.walk(field.child, model_field.related_model, lookup + '__', prefetched=True)
+                return True
+
+            if last and isinstance(field, relations.RelatedField) and field.use_pk_only_optimization() \
+                    and model_field.concrete:
+                prefetched or self.only.append(lookup)
+                return True
+
+            (self.prefetch_related if prefetched else self.select_related).append(lookup)
+            if model_field.concrete:
+                prefetched or self.only.append(lookup)
+            model, prefix = model_field.related_model, lookup + '__'
+
+            if last:
+                if isinstance(field, BaseSerializer) and not isinstance(field, ListSerializer):
+                    return self.walk(field, model, prefix, prefetched)
+                return False
+        return True
+
+
+def infer_query_plan(serializer) -> QueryPlan:
+    """
+    Inspects the field tree of a serializer (nested serializers, `source='a.b'`
+    paths and related fields) and derives the lookups needed to represent it.
+    :param serializer: a (non-list) serializer instance
+    :return: {QueryPlan}
+    """
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return QueryPlan()
+    inference = _Inference()
+    exact = inference.walk(serializer, model)
+    # prefetched reverse relations reuse the root instances, so their
+    # fields cannot be deferred without the nested serializer noticing
+    exact = exact and not inference.prefetch_related
+    return QueryPlan(inference.select_related, inference.prefetch_related, inference.only if exact else None)
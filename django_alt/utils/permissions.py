@@ -1,2 +1,191 @@
+import time
+from collections import namedtuple
+
+"""
+Evaluation record of a permission check, see `permission_trace`
+"""
+TraceEntry = namedtuple('TraceEntry', ('name', 'result', 'duration', 'cached'))
+
+
+class PermissionTrace:
+    """
+    Evaluations of the permission checks of a request, in evaluation order.
+    `denied_by` is the name of the check that denied the last permission test (None if it was granted).
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.denied_by = None
+
+    def __repr__(self):
+        return '<{0} entries={1} denied_by={2}>'.format(self.__class__.__name__, len(self.entries), self.denied_by)
+
+
+def permission_trace(request) -> PermissionTrace:
+    """
+    :return: the trace of the `Check` evaluations of a request
+    """
+    trace = getattr(request, '_permission_trace', None)
+    if trace is None:
+        trace = PermissionTrace()
+        request._permission_trace = trace
+    return trace
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    hash(value)
+    return value
+
+
+class Check:
+    """
+    A permission check that can be combined with `&`, `|` and `~` (or `all_of`, `any_of`, `not_`).
+    Checks accept the arguments of the permission function they wrap, the first one being the request:
+    `(request, **url)` for pre-validation and `(request, url, queryset, attrs)` for post-validation checks.
+    Combined checks run their members from the cheapest to the most expensive (by declared `cost`)
+    and stop as soon as the result is known. The result of a check is memoized on the request
+    for the request user and the (hashable) arguments, so a check shared by several combinations
+    (or by the pre and post checks) runs once per request. Every evaluation is recorded
+    in the `permission_trace` of the request.
+    """
+
+    def __init__(self, func=None, cost=1, name=None, memoize=True):
+        """
+        :param func: permission function returning a truthy value if access is granted
+        :param cost: relative cost of the check, e.g. 0 for attribute checks, 10 for database queries
+        :param name: name of the check in the trace (defaults to the function name)
+        :param memoize: whether the result can be reused within a request
+        """
+        self.func = func
+        self.cost = cost
+        self.name = name or getattr(func, '__name__', self.__class__.__name__)
+        self.memoize = memoize
+
+    def __repr__(self):
+        return '<{0} {1} cost={2}>'.format(self.__class__.__name__, self.name, self.cost)
+
+    def __and__(self, other):
+        return all_of(self, other)
+
+    def __or__(self, other):
+        return any_of(self, other)
+
+    def __invert__(self):
+        return not_(self)
+
+    def evaluate(self, *args, **kwargs) -> (bool, str):
+        """
+        :return: (result, name of the check that denied access or None)
+        """
+        result = bool(self.func(*args, **kwargs))
+        return result, None if result else self.name
+
+    def run(self, request, *args, **kwargs) -> (bool, str):
+        """
+        Evaluates the check (or reuses its memoized result) and records it in the trace.
+        :return: (result, name of the check that denied access or None)
+        """
+        cache = getattr(request, '_permission_cache', None)
+        if cache is None:
+            cache = request._permission_cache = {}
+        trace = permission_trace(request)
+
+        key = None
+        if self.memoize:
+            try:
+                key = (self, getattr(request.user, 'pk', None), _freeze(args), _freeze(kwargs))
+            except TypeError:
+                key = None
+        if key is not None and key in cache:
+            trace.entries.append(TraceEntry(self.name, cache[key][0], 0.0, True))
+            return cache[key]
+
+        started = time.perf_counter()
+        outcome = self.evaluate(request, *args, **kwargs)
+        trace.entries.append(TraceEntry(self.name, outcome[0], time.perf_counter() - started, False))
+        if key is not None:
+            cache[key] = outcome
+        return outcome
+
+    def __call__(self, request, *args, **kwargs) -> bool:
+        result, denied_by = self.run(request, *args, **kwargs)
+        permission_trace(request).denied_by = denied_by
+        return result
+
+
+def check(func=None, *, cost=1, name=None, memoize=True):
+    """
+    Wraps a permission function into a `Check`. Can be used as a decorator, with or without arguments.
+    """
+    if func is None:
+        return lambda f: Check(f, cost, name, memoize)
+    return Check(func, cost, name, memoize)
+
+
+def _as_check(func) -> Check:
+    return func if isinstance(func, Check) else Check(func)
+
+
+class _Combined(Check):
+    operator = None
+
+    def __init__(self, *checks):
+        # `a & b & c` is flattened, so that all three are ordered by cost
+        self.members = []
+        for c in map(_as_check, checks):
+            self.members.extend(c.members if type(c) is type(self) else [c])
+        checks = self.members
+        # stable sort: checks of equal cost keep their declaration order
+        self.checks = sorted(checks, key=lambda c: c.cost)
+        super().__init__(cost=sum(c.cost for c in checks),
+                         name='({0})'.format(' {0} '.format(self.operator).join(c.name for c in checks)),
+                         memoize=all(c.memoize for c in checks))
+
+
+class all_of(_Combined):
+    """
+    Grants access if every check does, stopping at the first denial.
+    """
+    operator = '&'
+
+    def evaluate(self, *args, **kwargs):
+        for c in self.checks:
+            result, denied_by = c.run(*args, **kwargs)
+            if not result:
+                return False, denied_by
+        return True, None
+
+
+class any_of(_Combined):
+    """
+    Grants access if any check does, stopping at the first grant.
+    """
+    operator = '|'
+
+    def evaluate(self, *args, **kwargs):
+        for c in self.checks:
+            if c.run(*args, **kwargs)[0]:
+                return True, None
+        return False, self.name
+
+
+class not_(Check):
+    """
+    Grants access if the check denies it.
+    """
+
+    def __init__(self, func):
+        self.check = _as_check(func)
+        super().__init__(cost=self.check.cost, name='~' + self.check.name, memoize=self.check.memoize)
+
+    def evaluate(self, *args, **kwargs):
+        result = not self.check.run(*args, **kwargs)[0]
+        return result, None if result else self.name
+
+
 def pre_logged_in(request, **_):
-    return not request.user.is_anonymous()
\ No newline at end of file
+    return not request.user.is_anonymous
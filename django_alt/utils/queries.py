@@ -0,0 +1,238 @@
+import re
+import time
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager, nullcontext, ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+PHASE_URL = 'url'
+PHASE_PERMISSIONS = 'permissions'
+PHASE_QUERY = 'query'
+PHASE_FILTERS = 'filters'
+PHASE_HANDLER = 'handler'
+PHASE_VALIDATION = 'validation'
+PHASE_CLEAN_FIELDS = 'clean_fields'
+PHASE_CLEAN = 'clean'
+PHASE_BASE = 'base'
+PHASE_VALIDATE_FIELDS = 'validate_fields'
+PHASE_VALIDATE_CHECKS = 'validate_checks'
+PHASE_WRITE = 'write'
+PHASE_HOOKS = 'hooks'
+PHASE_SERIALIZATION = 'serialization'
+
+"""
+Number of executions of the same query (up to parameters) that is reported as N+1
+"""
+N_PLUS_ONE_THRESHOLD = 3
+
+HEADER_COUNT = 'X-Query-Count'
+HEADER_TIME = 'X-Query-Time'
+HEADER_PHASES = 'X-Query-Phases'
+HEADER_N_PLUS_ONE = 'X-Query-N-Plus-One'
+
+QueryRecord = namedtuple('QueryRecord', ('phase', 'sql', 'duration'))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when an endpoint request runs more queries than its `query_budget`
+    """
+
+
+_active_log = ContextVar('django_alt_query_log', default=None)
+_captured_logs = ContextVar('django_alt_captured_query_logs', default=None)
+
+_in_list = re.compile(r'IN \((?:%s, )*%s\)')
+_literal = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _normalize_sql(sql) -> str:
+    return _in_list.sub('IN (...)', _literal.sub('?', sql))
+
+
+class QueryLog:
+    """
+    Queries executed during an endpoint request, attributed to the request phase that ran them
+    (see `query_phase`). Querysets are lazy, so the main query of a `get` runs in the `handler`
+    phase, while queries made per item by the serializer fields run in the `serialization` phase.
+    """
+
+    def __init__(self, endpoint=None, method=None):
+        self.endpoint = endpoint
+        self.method = method
+        self.phase = PHASE_URL
+        self.queries = []
+
+    def __repr__(self):
+        return '<{0} {1} {2} count={3}>'.format(self.__class__.__name__, self.endpoint, self.method, self.count)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(QueryRecord(self.phase, sql, time.perf_counter() - started))
+
+    @contextmanager
+    def capture(self):
+        """
+        Records the queries of every database connection within the block.
+        """
+        token = _active_log.set(self)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self))
+                yield self
+        finally:
+            _active_log.reset(token)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def time(self) -> float:
+        """
+        :return: total query time in seconds
+        """
+        return sum(q.duration for q in self.queries)
+
+    def phases(self) -> OrderedDict:
+        """
+        :return: {phase: (query count, time in seconds)} in order of first execution
+        """
+        result = OrderedDict()
+        for q in self.queries:
+            count, duration = result.get(q.phase, (0, 0.0))
+            result[q.phase] = count + 1, duration + q.duration
+        return result
+
+    def n_plus_one(self, threshold=N_PLUS_ONE_THRESHOLD) -> list:
+        """
+        Finds queries that only differ by their parameters and ran at least `threshold` times,
+        which usually means that a relation is fetched per row instead of being joined or prefetched.
+        :return: a list of (phase, normalized sql, count)
+        """
+        counts = OrderedDict()
+        for q in self.queries:
+            key = q.phase, _normalize_sql(q.sql)
+            counts[key] = counts.get(key, 0) + 1
+        return [(phase, sql, count) for (phase, sql), count in counts.items() if count >= threshold]
+
+    def headers(self) -> dict:
+        """
+        :return: response headers summarizing the log
+        """
+        return {
+            HEADER_COUNT: str(self.count),
+            HEADER_TIME: '{0:.2f}'.format(self.time * 1000),
+            HEADER_PHASES: ', '.join('{0}={1}'.format(phase, count) for phase, (count, _) in self.phases().items()),
+            HEADER_N_PLUS_ONE: str(len(self.n_plus_one())),
+        }
+
+
+class _QueryPhase:
+    __slots__ = ('log', 'name', 'previous')
+
+    def __init__(self, log, name):
+        self.log = log
+        self.name = name
+
+    def __enter__(self):
+        self.previous, self.log.phase = self.log.phase, self.name
+
+    def __exit__(self, *exc_info):
+        self.log.phase = self.previous
+
+
+_no_phase = nullcontext()
+
+
+def tracking_queries() -> bool:
+    """
+    :return: whether the queries of the current request are being recorded
+    """
+    return _active_log.get() is not None
+
+
+def query_phase(name):
+    """
+    Attributes the queries executed within the block to a phase of the current request
+    (does nothing if queries are not being tracked).
+    Phases are set per request section, not per item, so that untracked requests pay nothing.
+    :return: a context manager
+    """
+    log = _active_log.get()
+    return _no_phase if log is None else _QueryPhase(log, name)
+
+
+@contextmanager
+def capture_request_queries():
+    """
+    Tracks the queries of the endpoint requests made within the block (regardless of
+    the `DJANGO_ALT_QUERY_LOG` setting), for use in tests:
+
+        with capture_request_queries() as logs:
+            client.get('/items')
+        assert logs[0].count == 1 and not logs[0].n_plus_one()
+
+    :return: a list that receives a `QueryLog` for each request
+    """
+    logs = []
+    token = _captured_logs.set(logs)
+    try:
+        yield logs
+    finally:
+        _captured_logs.reset(token)
+
+
+def enforces_query_budgets() -> bool:
+    """
+    Query budgets are enforced if the `DJANGO_ALT_ENFORCE_QUERY_BUDGETS` setting is on
+    (`DEBUG` by default). The test runner turns `DEBUG` off, so test settings should turn it on.
+    """
+    return getattr(settings, 'DJANGO_ALT_ENFORCE_QUERY_BUDGETS', settings.DEBUG)
+
+
+def track_queries(view=None, *, budget=None):
+    """
+    Decorates an endpoint view function to record its queries in a `QueryLog`
+    if the `DJANGO_ALT_QUERY_LOG` setting is on, within `capture_request_queries`
+    or if the request has a query budget to enforce.
+    With `DEBUG` on, the totals are added to the response headers.
+    :param budget: (optional) callable `(view_self, request)` returning the maximum number of queries
+                   of the request (or None)
+    :raises QueryBudgetExceeded: if the request ran more queries than its budget allows
+    """
+    if view is None:
+        return lambda v: track_queries(v, budget=budget)
+
+    @wraps(view)
+    def wrapper(view_self, request, **url):
+        captured = _captured_logs.get()
+        limit = budget(view_self, request) if budget is not None else None
+        if limit is not None and not enforces_query_budgets():
+            limit = None
+        if captured is None and limit is None and not getattr(settings, 'DJANGO_ALT_QUERY_LOG', False):
+            return view(view_self, request, **url)
+
+        log = QueryLog(view_self.endpoint_class.__name__, request.method)
+        with log.capture():
+            response = view(view_self, request, **url)
+        if captured is not None:
+            captured.append(log)
+        if limit is not None and log.count > limit:
+            raise QueryBudgetExceeded((
+                '`{0}` {1} ran {2} queries, over its `query_budget` of {3}.\n'
+                'Queries by phase: {4}\nRepeated queries (N+1): {5}'
+            ).format(log.endpoint, log.method, log.count, limit, log.headers()[HEADER_PHASES], log.n_plus_one()))
+        if settings.DEBUG:
+            for header, value in log.headers().items():
+                response[header] = value
+        return response
+
+    return wrapper
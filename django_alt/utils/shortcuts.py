@@ -1,10 +1,71 @@
-import collections
+from collections.abc import Iterable
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 from django.db.models import QuerySet
 from rest_framework import serializers
 
 validation_error_class = serializers.ValidationError
 
+_collector = ContextVar('django_alt_error_collector', default=None)
+
+
+class ErrorCollector:
+    """
+    Accumulates `make_error` shaped errors, see `collect_errors`.
+    """
+
+    def __init__(self):
+        self.errors = {}
+
+    def __bool__(self):
+        return bool(self.errors)
+
+    def add(self, error):
+        """
+        Merges an error into the collected ones.
+        :param error: a `make_error` shaped dict (or a list of non field errors)
+        """
+        if not isinstance(error, dict):
+            error = {'non_field_errors': error if isinstance(error, list) else [error]}
+        for key, messages in error.items():
+            self.errors.setdefault(key, []).extend(messages if isinstance(messages, list) else [messages])
+
+    def raise_if_invalid(self):
+        """
+        :raises: serializers.ValidationError with every collected error
+        """
+        if self.errors:
+            raise validation_error_class(self.errors)
+
+
+@contextmanager
+def collect_errors():
+    """
+    Within the block, `invalid` (and every shortcut built on it) records its error
+    and returns None instead of raising, so that code after the call still runs
+    and the first error does not hide the others.
+    All errors are raised at the end of the block in a single validation error,
+    together with the detail of a validation error raised in the block (if any).
+    Note that `required` returns None for a missing key while collecting: once an error
+    has been collected, any other exception raised in the block (e.g. by code using that None)
+    is dropped in favour of the collected errors.
+    :return: {ErrorCollector}
+    :raises: serializers.ValidationError
+    """
+    collector = ErrorCollector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    except validation_error_class as e:
+        collector.add(e.detail)
+    except Exception:
+        if not collector:
+            raise
+    finally:
+        _collector.reset(token)
+    collector.raise_if_invalid()
+
 
 def invalid_if(condition, key_or_list, error_or_list):
     """
@@ -17,9 +78,13 @@ def invalid_if(condition, key_or_list, error_or_list):
 
 def invalid(key_or_list, error_or_list):
     """
-    Shortcut for raising a validation error.
+    Shortcut for raising a validation error (recorded instead within `collect_errors`).
     :raises: serializers.ValidationError
     """
+    collector = _collector.get()
+    if collector is not None:
+        collector.add(make_error(key_or_list, error_or_list))
+        return
     raise validation_error_class(make_error(key_or_list, error_or_list))
 
 
@@ -30,7 +95,7 @@ def is_iterable(obj):
     :param obj: object to check
     :return: whether the object is an iterable or not
     """
-    return not isinstance(obj, str) and isinstance(obj, collections.Iterable)
+    return not isinstance(obj, str) and isinstance(obj, Iterable)
 
 
 def make_error(key_or_list, error_or_list) -> dict:
@@ -186,6 +251,77 @@ def required_all(keys: list, container: dict = None):
             invalid(difference, 'This field is required.')
 
 
+class KeySetCheck:
+    """
+    A `required_all` or `prohibited_any` check compiled for a fixed set of keys,
+    so that checking many containers does not build a key set for each of them.
+    Created with `required_all.compile(keys)` or `prohibited_any.compile(keys)`.
+    """
+
+    def __init__(self, keys, present: bool, message: str):
+        """
+        :param keys: keys to check
+        :param present: True if the keys are prohibited, False if they are required
+        :param message: error message of each offending key
+        """
+        self.keys = tuple(dict.fromkeys(keys))
+        self.present = present
+        self.message = message
+
+    def offending(self, container) -> list:
+        """
+        :return: the keys that are missing from (or prohibited in) the container, in key order
+        """
+        if not container:
+            return []
+        return [key for key in self.keys if (key in container) is self.present]
+
+    def __call__(self, container: dict = None):
+        """
+        Checks a single container like the uncompiled shortcut does.
+        :raises: serializers.ValidationError
+        """
+        offending = self.offending(container)
+        if offending:
+            invalid(offending, self.message)
+
+    def many(self, containers) -> dict:
+        """
+        Checks a list of containers in one pass.
+        :return: {index: make_error shaped error} of the offending containers
+        """
+        errors = {}
+        for index, container in enumerate(containers):
+            offending = self.offending(container)
+            if offending:
+                errors[index] = make_error(offending, self.message)
+        return errors
+
+
+required_all.compile = lambda keys: KeySetCheck(keys, False, 'This field is required.')
+prohibited_any.compile = lambda keys: KeySetCheck(keys, True, 'This field cannot be present.')
+
+
+def required_all_many(keys, containers) -> dict:
+    """
+    Batch form of `required_all`.
+    :param keys: keys that are required in every container
+    :param containers: a list of containers to search
+    :return: {index: make_error shaped error} of the containers with missing keys
+    """
+    return required_all.compile(keys).many(containers)
+
+
+def prohibited_any_many(keys, containers) -> dict:
+    """
+    Batch form of `prohibited_any`.
+    :param keys: keys that cannot be present in any container
+    :param containers: a list of containers to search
+    :return: {index: make_error shaped error} of the containers with prohibited keys
+    """
+    return prohibited_any.compile(keys).many(containers)
+
+
 def try_cast(typ, value):
     """
     Attempts to cast value to a given type.
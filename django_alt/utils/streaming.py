@@ -0,0 +1,163 @@
+import codecs
+import json
+import re
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+
+CONTENT_TYPE_NDJSON = ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+READ_SIZE = 64 * 1024
+
+_whitespace = ' \t\n\r'
+_scalar_end = re.compile(r'[\s,\]]')
+
+
+class PayloadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Request body is too large.'
+    default_code = 'payload_too_large'
+
+
+class LimitedStream:
+    """
+    Wraps a readable binary stream and raises `PayloadTooLarge`
+    as soon as more than `max_size` bytes have been read from it.
+    """
+
+    def __init__(self, stream, max_size=None):
+        self.stream = stream
+        self.max_size = max_size
+        self.size = 0
+
+    def read(self, size=READ_SIZE) -> bytes:
+        data = self.stream.read(size) if self.stream is not None else b''
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise PayloadTooLarge('Request body exceeds {0} bytes.'.format(self.max_size))
+        return data
+
+
+def _read_text(stream, read_size):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = stream.read(read_size)
+        if not data:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(data)
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    """
+    Incrementally parses a JSON array from a binary stream,
+    holding only the unparsed part of the body in memory.
+    :param stream: an object with a `read(size)` method returning bytes
+    :param read_size: number of bytes to read at a time
+    :return: a generator of array members
+    :raises ParseError: if the body is not a JSON array
+    """
+    decoder = json.JSONDecoder()
+    chunks = _read_text(stream, read_size)
+    buffer, index, eof = '', 0, False
+    state = 'start'
+
+    def more():
+        nonlocal buffer, index, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            return False
+        buffer = buffer[index:] + chunk
+        index = 0
+        return True
+
+    while True:
+        while index < len(buffer) and buffer[index] in _whitespace:
+            index += 1
+        if index == len(buffer):
+            if not more():
+                raise ParseError('Unexpected end of JSON array.')
+            continue
+
+        char = buffer[index]
+        if state == 'start':
+            if char != '[':
+                raise ParseError('Expected a JSON array.')
+            state, index = 'first', index + 1
+            continue
+        if char == ']' and state in ('first', 'separator'):
+            return
+        if state == 'separator':
+            if char != ',':
+                raise ParseError('Expected `,` or `]` in JSON array.')
+            state, index = 'member', index + 1
+            continue
+
+        # scalars (numbers, literals) are not self delimiting and might continue in the next chunk
+        if char not in '{["' and not eof and _scalar_end.search(buffer, index) is None:
+            more()
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, index)
+        except ValueError:
+            if not more():
+                raise ParseError('Malformed JSON array member.')
+            continue
+        state, index = 'separator', end
+        yield item
+
+
+def iter_ndjson(stream, read_size=READ_SIZE):
+    """
+    Parses newline delimited JSON (one document per line) from a binary stream.
+    Blank lines are skipped.
+    :param stream: an object with a `read(size)` method returning bytes
+    :param read_size: number of bytes to read at a time
+    :return: a generator of documents
+    :raises ParseError: if a line is not valid JSON
+    """
+    buffer, line_number = '', 0
+    for chunk in _read_text(stream, read_size):
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _parse_line(line, line_number)
+    if buffer.strip():
+        yield _parse_line(buffer, line_number + 1)
+
+
+def _parse_line(line, line_number):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise ParseError('Malformed JSON on line {0}: {1}'.format(line_number, e))
+
+
+def iter_request_items(request, max_body_size=None, max_items=None, read_size=READ_SIZE):
+    """
+    Streams the items of a JSON array or an NDJSON (`application/x-ndjson`) request body
+    without loading the whole body. Limits are enforced while reading: a `Content-Length`
+    over `max_body_size` is rejected before anything is read.
+    :param request: a DRF request whose `data` was not accessed
+    :param max_body_size: (optional) maximum body size in bytes
+    :param max_items: (optional) maximum number of items
+    :param read_size: number of bytes to read at a time
+    :return: a generator of items
+    :raises PayloadTooLarge, ParseError
+    """
+    content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if max_body_size is not None and content_length > max_body_size:
+        raise PayloadTooLarge('Request body exceeds {0} bytes.'.format(max_body_size))
+
+    stream = LimitedStream(request.stream, max_body_size)
+    content_type = request.content_type.split(';')[0].strip().lower()
+    items = iter_ndjson(stream, read_size) if content_type in CONTENT_TYPE_NDJSON else iter_json_array(stream, read_size)
+    for count, item in enumerate(items, 1):
+        if max_items is not None and count > max_items:
+            raise PayloadTooLarge('Request contains more than {0} items.'.format(max_items))
+        yield item
@@ -0,0 +1,201 @@
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+from django_alt.utils.queries import query_phase, tracking_queries
+
+SPAN_REQUEST = 'request'
+SPAN_RENDER = 'render'
+SPAN_BASE_DB = 'base_db'
+
+HEADER_SERVER_TIMING = 'Server-Timing'
+
+_current_span = ContextVar('django_alt_current_span', default=None)
+_request_timings = ContextVar('django_alt_request_timings', default=None)
+
+
+class Span:
+    """
+    A timed, named section of a request. Spans nest: `parent` is the span
+    that was open when the span started (None for the request span).
+    """
+    __slots__ = ('name', 'attributes', 'parent', 'start', 'end', 'error', 'handle')
+
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+        # free for tracers to store their own span object
+        self.handle = None
+
+    def __repr__(self):
+        return '<{0} {1} {2}>'.format(self.__class__.__name__, self.name, self.attributes)
+
+    @property
+    def duration(self) -> float:
+        """
+        :return: duration in seconds (None while the span is open)
+        """
+        return None if self.end is None else self.end - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class Tracer:
+    """
+    Receives the spans of django-alt. The base tracer does nothing; subclass it
+    to export spans to a tracing system (e.g. start an OpenTelemetry span in `on_start`,
+    keep it in `span.handle` and end it in `on_end`) and install it with `set_tracer`.
+    """
+    enabled = False
+
+    def on_start(self, span: Span):
+        pass
+
+    def on_end(self, span: Span):
+        pass
+
+
+class InMemoryTracer(Tracer):
+    """
+    Keeps finished spans in memory, for tests and local inspection.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.spans = []
+
+    def on_end(self, span: Span):
+        self.spans.append(span)
+
+    def names(self) -> list:
+        """
+        :return: names of the finished spans in order of their start
+        """
+        return [s.name for s in sorted(self.spans, key=lambda s: s.start)]
+
+    def children(self, span: Span) -> list:
+        return sorted((s for s in self.spans if s.parent is span), key=lambda s: s.start)
+
+    def clear(self):
+        self.spans.clear()
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_tracer(tracer: Tracer = None) -> Tracer:
+    """
+    Installs a tracer (the no-op one if None).
+    :return: the previously installed tracer
+    """
+    global _tracer
+    previous, _tracer = _tracer, tracer or Tracer()
+    return previous
+
+
+def span(name, **attributes):
+    """
+    Opens a span for the block if a tracer is installed or the request is being timed.
+    :return: a context manager yielding the `Span` (or None if nothing is traced)
+    """
+    if not _tracer.enabled and _request_timings.get() is None:
+        return nullcontext()
+    return _open_span(name, attributes)
+
+
+@contextmanager
+def _open_span(name, attributes):
+    s = Span(name, attributes, _current_span.get())
+    token = _current_span.set(s)
+    tracer = _tracer
+    tracer.on_start(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = e
+        raise
+    finally:
+        s.end = time.perf_counter()
+        _current_span.reset(token)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + s.end - s.start
+        tracer.on_end(s)
+
+
+def instrumented() -> bool:
+    """
+    :return: whether spans or queries of the current request are recorded
+    """
+    return _tracer.enabled or _request_timings.get() is not None or tracking_queries()
+
+
+_no_phase = nullcontext()
+
+
+def phase(name, **attributes):
+    """
+    A span that also attributes the queries run within the block to the phase (see `query_phase`).
+    :return: a context manager yielding the `Span` (or None if nothing is traced)
+    """
+    if not instrumented():
+        return _no_phase
+    return _phase(name, attributes)
+
+
+@contextmanager
+def _phase(name, attributes):
+    with query_phase(name), span(name, **attributes) as s:
+        yield s
+
+
+def server_timing(timings: dict) -> str:
+    """
+    :param timings: {span name: total duration in seconds}
+    :return: a `Server-Timing` header value
+    """
+    return ', '.join('{0};dur={1:.2f}'.format(name, duration * 1000) for name, duration in timings.items())
+
+
+def trace_view(dispatch):
+    """
+    Decorates the `dispatch` of an endpoint view to run the request in a `request` span
+    (rendering included) if a tracer is installed or `Server-Timing` is on.
+    The `DJANGO_ALT_SERVER_TIMING` setting (`DEBUG` by default) adds the total duration
+    of the spans by name to the response as a `Server-Timing` header.
+    """
+
+    @wraps(dispatch)
+    def wrapper(view_self, request, *args, **kwargs):
+        timing = getattr(settings, 'DJANGO_ALT_SERVER_TIMING', settings.DEBUG)
+        if not timing and not _tracer.enabled:
+            return dispatch(view_self, request, *args, **kwargs)
+
+        timings = {}
+        token = _request_timings.set(timings)
+        try:
+            with span(SPAN_REQUEST, endpoint=view_self.endpoint_class.__name__, method=request.method) as s:
+                response = dispatch(view_self, request, *args, **kwargs)
+                s.set_attribute('status', response.status_code)
+                if hasattr(response, 'render') and not response.is_rendered:
+                    with span(SPAN_RENDER):
+                        response.render()
+        finally:
+            _request_timings.reset(token)
+        if timing:
+            response[HEADER_SERVER_TIMING] = server_timing(timings)
+        return response
+
+    return wrapper
@@ -0,0 +1,33 @@
+import os
+import sys
+import timeit
+
+
+def setup():
+    """
+    Configures Django with the test settings and an in-memory test database,
+    so that benchmarks can be run as plain scripts:
+        python -m django_alt_tests.benchmarks.<module>
+    """
+    tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if tests_dir not in sys.path:
+        sys.path.insert(0, tests_dir)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conf.settings')
+
+    import django
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def measure(name, func, number=100, repeat=5):
+    """
+    Prints the best time per call of `func` in microseconds.
+    :return: best time per call in seconds
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    print('{:<48} {:>12.1f} us'.format(name, best * 1e6))
+    return best
@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+from django_alt_tests.benchmarks import setup, measure
+
+
+def run(rows=1000):
+    from rest_framework.renderers import JSONRenderer
+
+    from django_alt.readers import CompiledReader
+    from django_alt_tests.conf.endpoints import ModelBSerializer, ModelBCustomSerializer
+    from django_alt_tests.conf.models import ModelA, ModelB
+
+    a = ModelA.objects.create(field_1='aaa', field_2=1)
+    ModelB.objects.bulk_create(ModelB(name='row {}'.format(i), count=i, ratio=i / 3, price=Decimal(i) / 7,
+                                      model_a=a if i % 2 else None) for i in range(rows))
+    queryset = ModelB.objects.all()
+
+    for serializer_class in (ModelBSerializer, ModelBCustomSerializer):
+        assert JSONRenderer().render(serializer_class(queryset, many=True).data) == \
+               JSONRenderer().render(CompiledReader(serializer_class()).represent(queryset))
+        print('{} ({} rows)'.format(serializer_class.__name__, rows))
+        normal = measure('  serializer(queryset, many=True).data',
+                         lambda: serializer_class(queryset, many=True).data, number=5)
+        compiled = measure('  CompiledReader(serializer()).represent(queryset)',
+                           lambda: CompiledReader(serializer_class()).represent(queryset), number=5)
+        print('  speedup: {:.2f}x'.format(normal / compiled))
+
+
+if __name__ == '__main__':
+    setup()
+    run()
@@ -0,0 +1,54 @@
+from itertools import chain
+
+from django_alt_tests.benchmarks import measure
+
+
+class LegacyDdict(dict):
+    """
+    The previous `ddict` implementation, kept for comparison
+    """
+
+    def __init__(self, iterable=None, **kwargs):
+        if iterable is not None:
+            if isinstance(iterable, dict):
+                iterable.update(kwargs)
+            else:
+                iterable = chain(iterable, kwargs.items())
+            super().__init__(iterable)
+        else:
+            super().__init__(**kwargs)
+
+    def __getattr__(self, item):
+        try:
+            return self.__getitem__(item)
+        except KeyError:
+            from django_alt.dotdict import undefined
+            return undefined
+
+
+def run(number=100000):
+    from django_alt.dotdict import ddict, frozenddict
+
+    source = {'name': 'tiny', 'count': 1, 'price': '1.00', 'active': True, 'ratio': 0.5}
+    print('construction from a dict of {0} items'.format(len(source)))
+    measure('  dict', lambda: dict(source), number)
+    measure('  legacy ddict', lambda: LegacyDdict(source), number)
+    measure('  ddict', lambda: ddict(source), number)
+    measure('  frozenddict', lambda: frozenddict(source), number)
+
+    plain, legacy, current, frozen = dict(source), LegacyDdict(source), ddict(source), frozenddict(source)
+    print('item hit')
+    measure('  dict.get', lambda: plain.get('count'), number)
+    measure('  legacy ddict attribute', lambda: legacy.count, number)
+    measure('  ddict attribute', lambda: current.count, number)
+    print('item miss')
+    measure('  dict.get', lambda: plain.get('missing'), number)
+    measure('  legacy ddict attribute', lambda: legacy.missing, number)
+    measure('  ddict attribute', lambda: current.missing, number)
+    print('hashing')
+    measure('  frozenset(dict.items())', lambda: hash(frozenset(plain.items())), number)
+    measure('  frozenddict (cached)', lambda: hash(frozen), number)
+
+
+if __name__ == '__main__':
+    run()
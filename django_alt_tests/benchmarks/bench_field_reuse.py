@@ -0,0 +1,55 @@
+from django_alt_tests.benchmarks import setup, measure
+
+
+def run():
+    from rest_framework.test import APIRequestFactory
+
+    from django_alt.abstract.validators import Validator
+    from django_alt.endpoints import Endpoint
+    from django_alt.serializers import ValidatedModelSerializer
+    from django_alt_tests.conf.models import ModelA, ModelB
+
+    class ModelBValidator(Validator):
+        def clean_name(self, name):
+            return name.strip()
+
+        def check_count(self, attrs):
+            pass
+
+    def make_endpoint(reuse_fields):
+        class ModelBSerializer(ValidatedModelSerializer):
+            class Meta:
+                model = ModelB
+                validator_class = ModelBValidator
+                fields = '__all__'
+
+        ModelBSerializer.Meta.reuse_fields = reuse_fields
+
+        class ModelBEndpoint(Endpoint):
+            serializer = ModelBSerializer
+            config = {'get': dict(query=lambda model, **url: model.objects.get(id=url['pk']))}
+
+        return ModelBEndpoint
+
+    ModelB.objects.create(name='tiny', model_a=ModelA.objects.create(field_1='a', field_2=1))
+    factory = APIRequestFactory()
+    data = {'name': ' tiny ', 'count': 1, 'price': '1.00'}
+
+    timings = {}
+    for reuse_fields in (False, True):
+        endpoint = make_endpoint(reuse_fields)
+        view = endpoint.as_view()
+        assert view(factory.get('/'), pk=1).status_code == 200
+        print('reuse_fields = {}'.format(reuse_fields))
+        timings[reuse_fields] = (
+            measure('  tiny GET (one row)', lambda: view(factory.get('/'), pk=1).render(), 200),
+            measure('  serializer validation (one item)',
+                    lambda: endpoint.serializer(data=data).is_valid(raise_exception=True), 200)
+        )
+    print('speedup: GET {:.2f}x, validation {:.2f}x'.format(timings[False][0] / timings[True][0],
+                                                          timings[False][1] / timings[True][1]))
+
+
+if __name__ == '__main__':
+    setup()
+    run()
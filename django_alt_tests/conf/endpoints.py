@@ -1,8 +1,12 @@
+from django.http import Http404
+from django.db.models import Q
+from rest_framework import serializers
+
 from django_alt.abstract.validators import Validator
 from django_alt.endpoints import Endpoint
 from django_alt.serializers import ValidatedModelSerializer
 from django_alt.utils.shortcuts import invalid_if
-from django_alt_tests.conf.models import ModelA
+from django_alt_tests.conf.models import ModelA, ModelB, ModelC, ModelD
 
 
 class ModelAValidator(Validator):
@@ -119,4 +123,291 @@ class ModelAEndpoint10(Endpoint):
         'post': {
             'fields_from_url': ('field_1', 'field_2', 'nonexistent_field')
         }
-    }
\ No newline at end of file
+    }
+
+
+class ModelBValidator(Validator):
+    def to_representation(self, repr_attrs, validated_attrs: dict = None):
+        repr_attrs['is_cheap'] = repr_attrs['price'] is not None and float(repr_attrs['price']) < 10
+
+
+class ModelBSerializer(ValidatedModelSerializer):
+    class Meta:
+        model = ModelB
+        validator_class = ModelBValidator
+        fields = '__all__'
+
+
+class ModelBCustomSerializer(ValidatedModelSerializer):
+    label = serializers.SerializerMethodField()
+    model_a_field_1 = serializers.CharField(source='model_a.field_1', read_only=True, allow_null=True)
+
+    class Meta:
+        model = ModelB
+        validator_class = ModelBValidator
+        fields = ('id', 'name', 'count', 'ratio', 'price', 'active', 'created', 'model_a', 'label', 'model_a_field_1')
+
+    def get_label(self, instance):
+        return '{}#{}'.format(instance.name, instance.count)
+
+
+class ModelBSparseValidator(Validator):
+    allows_partial_representation = True
+
+    def to_representation(self, repr_attrs, validated_attrs: dict = None):
+        if 'price' in repr_attrs:
+            repr_attrs['is_cheap'] = repr_attrs['price'] is not None and float(repr_attrs['price']) < 10
+
+
+class ModelBSparseSerializer(ModelBCustomSerializer):
+    class Meta(ModelBCustomSerializer.Meta):
+        validator_class = ModelBSparseValidator
+
+
+class ModelBEndpoint1(Endpoint):
+    serializer = ModelBSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all())}
+
+
+class ModelBEndpoint2(Endpoint):
+    serializer = ModelBSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all(), compiled_read=True)}
+
+
+class ModelBEndpoint3(Endpoint):
+    serializer = ModelBCustomSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all())}
+
+
+class ModelBEndpoint4(Endpoint):
+    serializer = ModelBCustomSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all(), compiled_read=True)}
+
+
+class ModelBEndpoint5(Endpoint):
+    serializer = ModelBSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.get(id=url['pk']), compiled_read=True)}
+
+
+class ModelBNestedSerializer(ValidatedModelSerializer):
+    model_a = ModelASerializer(read_only=True)
+
+    class Meta:
+        model = ModelB
+        validator_class = ModelAValidator
+        fields = ('id', 'name', 'model_a')
+
+
+class ModelAWithBsSerializer(ValidatedModelSerializer):
+    model_bs = ModelBNestedSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ModelA
+        validator_class = ModelAValidator
+        fields = ('id', 'field_1', 'model_bs')
+
+
+class ModelBEndpoint6(Endpoint):
+    serializer = ModelBNestedSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all())}
+
+
+class ModelBEndpoint7(Endpoint):
+    serializer = ModelBNestedSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all(), no_query_inference=True)}
+
+
+class ModelBEndpoint12(Endpoint):
+    serializer = ModelBNestedSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all(), no_query_inference=True, query_budget=2)}
+
+
+class ModelBEndpoint13(Endpoint):
+    serializer = ModelBNestedSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.filter(name__startswith='b').union(
+        model.objects.filter(name__startswith='c')).order_by('name'))}
+
+
+class ModelAEndpoint11(Endpoint):
+    serializer = ModelAWithBsSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all())}
+
+
+class ModelBEndpoint8(Endpoint):
+    serializer = ModelBSparseSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all(),
+                          sparse_fields=('name', 'count', 'price', 'label', 'model_a_field_1'))}
+
+
+class ModelBEndpoint14(Endpoint):
+    serializer = ModelBSparseSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all(), no_query_inference=True,
+                          sparse_fields='__all__')}
+
+
+class ModelBEndpoint9(Endpoint):
+    serializer = ModelBSerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all(), sparse_fields='__all__', compiled_read=True)}
+
+
+class ModelBEndpoint10(Endpoint):
+    serializer = ModelBSerializer
+    config = {'get': {
+        'query': lambda model, **url: model.objects.all(),
+        'filters': {'active': lambda queryset, param: queryset.filter(active=param == 'true')},
+        'count': True
+    }}
+
+
+class ModelAEndpoint12(Endpoint):
+    serializer = ModelASerializer
+    config = {'delete': {
+        'query': lambda model_a, **url: model_a.objects.filter(field_2__gte=url['min']),
+        'response': 'ids',
+        'chunk_size': 2
+    }}
+
+
+class ModelAEndpoint13(Endpoint):
+    serializer = ModelASerializer
+    config = {'delete': {
+        'query': lambda model_a, **url: model_a.objects.filter(field_2__gte=url['min']),
+        'response': 'count'
+    }}
+
+
+class ModelAEndpoint14(Endpoint):
+    serializer = ModelASerializer
+    config = {'delete': {
+        'query': lambda model_a, **url: model_a.objects.get(field_2=url['min']),
+        'response': 'none'
+    }}
+
+
+class ModelAEndpoint15(Endpoint):
+    serializer = ModelASerializer
+    config = {'post': {'response': 'summary'}}
+
+
+class ModelAEndpoint16(Endpoint):
+    serializer = ModelASerializer
+    config = {
+        'post': {'response': 'ids'},
+        'patch': {
+            'query': lambda model_a, **url: model_a.objects.get(id=url['pk']),
+            'response': 'changed'
+        }
+    }
+
+
+class ModelAEndpoint17(Endpoint):
+    serializer = ModelASerializer
+    config = {'post': {
+        'fields_from_url': ('field_1',),
+        'stream': True,
+        'chunk_size': 2,
+        'max_body_size': 1024,
+        'max_items': 5
+    }}
+
+
+class ModelAEndpoint21(Endpoint):
+    serializer = ModelASerializer
+    config = {'get': dict(query=lambda model, **url: model.objects.all())}
+
+    @classmethod
+    def on_get(cls, request, queryset, permission_test=None, **url):
+        if not queryset.exists():
+            raise Http404()
+        return {'count': queryset.count()}, 202
+
+
+class ModelAEndpoint20(Endpoint):
+    serializer = ModelASerializer
+    config = {'post': {'stream': True, 'chunk_size': 2, 'response': 'ids'}}
+
+
+class ModelBEndpoint11(Endpoint):
+    serializer = ModelBSerializer
+    config = {'get': {
+        'query': lambda model, **url: model.objects.filter(count__gte=url.get('min', 0)).order_by('id'),
+        'export': True,
+        'chunk_size': 2,
+        'sparse_fields': '__all__'
+    }}
+
+
+class ModelAEndpoint18(Endpoint):
+    serializer = ModelASerializer
+    config = {
+        'get': {
+            'query': lambda model, **url: model.objects.order_by('id'),
+            'permission_filter': lambda request, **url: None if request.user.is_staff else Q(field_2__lt=2)
+        },
+        'patch': {
+            'query': lambda model, **url: model.objects.get(pk=url['pk']),
+            'permission_filter': lambda request, **url: Q(field_2__lt=2)
+        }
+    }
+
+
+class ModelATagsValidator(Validator):
+    def will_create(self, attrs: dict):
+        attrs['field_2'] = len(attrs.pop('tags'))
+
+
+class ModelATagsSerializer(ValidatedModelSerializer):
+    tags = serializers.ListField(child=serializers.CharField(), write_only=True)
+
+    class Meta:
+        model = ModelA
+        validator_class = ModelATagsValidator
+        fields = '__all__'
+        extra_kwargs = {'field_2': {'required': False}}
+
+
+class ModelAEndpoint19(Endpoint):
+    serializer = ModelATagsSerializer
+    config = {'post': {'fields_from_url': ('field_1',)}}
+
+
+class ModelCValidator(Validator):
+    def will_create(self, attrs: dict):
+        attrs['revision'] = 1
+
+    def will_update(self, instance, attrs: dict):
+        attrs['revision'] = instance.revision + 1
+
+
+class ModelCSerializer(ValidatedModelSerializer):
+    class Meta:
+        model = ModelC
+        validator_class = ModelCValidator
+        fields = '__all__'
+        read_only_fields = ('revision',)
+        # conflicts on `key` are resolved by the upsert statement
+        extra_kwargs = {'key': {'validators': []}}
+
+
+class ModelCEndpoint1(Endpoint):
+    serializer = ModelCSerializer
+    config = {'put': {
+        'query': lambda model_c, **url: model_c.objects.get(key=url['key']),
+        'fields_from_url': ('key',),
+        'upsert': ('key',)
+    }}
+
+
+class ModelDSerializer(ValidatedModelSerializer):
+    class Meta:
+        model = ModelD
+        validator_class = Validator
+        fields = '__all__'
+
+
+class ModelDEndpoint1(Endpoint):
+    serializer = ModelDSerializer
+    config = {'patch': {
+        'query': lambda model_d, **url: model_d.objects.get(id=url['pk']),
+        'response': 'changed'
+    }}
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conf', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelB',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+                ('ratio', models.FloatField(null=True)),
+                ('price', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('active', models.BooleanField(default=True)),
+                ('created', models.DateTimeField(null=True)),
+                ('model_a', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE,
+                                              related_name='model_bs', to='conf.ModelA')),
+            ],
+        ),
+    ]
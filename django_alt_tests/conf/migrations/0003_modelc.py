@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conf', '0002_modelb'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelC',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('value', models.IntegerField(default=0)),
+                ('revision', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
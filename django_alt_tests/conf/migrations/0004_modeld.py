@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conf', '0003_modelc'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelD',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('model_as', models.ManyToManyField(related_name='model_ds', to='conf.ModelA')),
+            ],
+        ),
+    ]
@@ -7,3 +7,33 @@ class ModelA(models.Model):
 
     class Meta:
         app_label = 'conf'
+
+
+class ModelB(models.Model):
+    name = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+    ratio = models.FloatField(null=True)
+    price = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    active = models.BooleanField(default=True)
+    created = models.DateTimeField(null=True)
+    model_a = models.ForeignKey(ModelA, null=True, on_delete=models.CASCADE, related_name='model_bs')
+
+    class Meta:
+        app_label = 'conf'
+
+
+class ModelC(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    value = models.IntegerField(default=0)
+    revision = models.IntegerField(default=0)
+
+    class Meta:
+        app_label = 'conf'
+
+
+class ModelD(models.Model):
+    name = models.CharField(max_length=255)
+    model_as = models.ManyToManyField(ModelA, related_name='model_ds')
+
+    class Meta:
+        app_label = 'conf'
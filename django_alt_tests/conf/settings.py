@@ -12,6 +12,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django_alt',
     'django_alt_tests.conf'
 ]
 
@@ -78,3 +79,5 @@ USE_L10N = True
 USE_TZ = True
 
 STATIC_URL = '/static/'
+
+DJANGO_ALT_ENFORCE_QUERY_BUDGETS = True
@@ -12,4 +12,33 @@ urlpatterns = [
     url(r'^8$', e.ModelAEndpoint8.as_view(), name='e8'),
     url(r'^9/(?P<field_1>\w+)/(?P<field_2>[0-9]+)/$', e.ModelAEndpoint9.as_view(), name='e9'),
     url(r'^10/(?P<field_1>\w+)/(?P<field_2>[0-9]+)/$', e.ModelAEndpoint10.as_view(), name='e10'),
+    url(r'^b1$', e.ModelBEndpoint1.as_view(), name='b1'),
+    url(r'^b2$', e.ModelBEndpoint2.as_view(), name='b2'),
+    url(r'^b3$', e.ModelBEndpoint3.as_view(), name='b3'),
+    url(r'^b4$', e.ModelBEndpoint4.as_view(), name='b4'),
+    url(r'^b6$', e.ModelBEndpoint6.as_view(), name='b6'),
+    url(r'^b7$', e.ModelBEndpoint7.as_view(), name='b7'),
+    url(r'^b8$', e.ModelBEndpoint8.as_view(), name='b8'),
+    url(r'^b14$', e.ModelBEndpoint14.as_view(), name='b14'),
+    url(r'^b9$', e.ModelBEndpoint9.as_view(), name='b9'),
+    url(r'^b12$', e.ModelBEndpoint12.as_view(), name='b12'),
+    url(r'^b11$', e.ModelBEndpoint11.as_view(), name='b11'),
+    url(r'^b13$', e.ModelBEndpoint13.as_view(), name='b13'),
+    url(r'^b10$', e.ModelBEndpoint10.as_view(), name='b10'),
+    url(r'^12/(?P<min>[0-9]+)$', e.ModelAEndpoint12.as_view(), name='e12'),
+    url(r'^13/(?P<min>[0-9]+)$', e.ModelAEndpoint13.as_view(), name='e13'),
+    url(r'^14/(?P<min>[0-9]+)$', e.ModelAEndpoint14.as_view(), name='e14'),
+    url(r'^15$', e.ModelAEndpoint15.as_view(), name='e15'),
+    url(r'^16$', e.ModelAEndpoint16.as_view(), name='e16'),
+    url(r'^16/(?P<pk>[0-9]+)$', e.ModelAEndpoint16.as_view(), name='e16_detail'),
+    url(r'^17/(?P<field_1>\w+)$', e.ModelAEndpoint17.as_view(), name='e17'),
+    url(r'^18$', e.ModelAEndpoint18.as_view(), name='e18'),
+    url(r'^18/(?P<pk>[0-9]+)$', e.ModelAEndpoint18.as_view(), name='e18_detail'),
+    url(r'^19/(?P<field_1>\w+)$', e.ModelAEndpoint19.as_view(), name='e19'),
+    url(r'^20$', e.ModelAEndpoint20.as_view(), name='e20'),
+    url(r'^21$', e.ModelAEndpoint21.as_view(), name='e21'),
+    url(r'^11$', e.ModelAEndpoint11.as_view(), name='e11'),
+    url(r'^b5/(?P<pk>[0-9]+)$', e.ModelBEndpoint5.as_view(), name='b5'),
+    url(r'^c1/(?P<key>\w+)$', e.ModelCEndpoint1.as_view(), name='c1'),
+    url(r'^d1/(?P<pk>[0-9]+)$', e.ModelDEndpoint1.as_view(), name='d1'),
 ]
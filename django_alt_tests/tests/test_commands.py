@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from django_alt.abstract.validators import Validator
+from django_alt.utils.shortcuts import invalid_if
+from django_alt_tests.conf.models import ModelA
+
+VALIDATOR = 'django_alt_tests.tests.test_commands.ImportValidator'
+
+
+class ImportValidator(Validator):
+    def clean_field_2(self, field_2):
+        return int(field_2)
+
+    def field_field_2(self, value):
+        invalid_if(value < 0, 'field_2', 'Must be positive')
+
+
+class FailingHookValidator(ImportValidator):
+    def did_create(self, instance, validated_attrs):
+        if instance.field_1 == 'b':
+            raise ValueError('Hook failed')
+
+
+class AltImportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name, content=None):
+        path = os.path.join(self.directory.name, name)
+        if content is not None:
+            with open(path, 'w') as file:
+                file.write(content)
+        return path
+
+    def run_import(self, *args, validator=VALIDATOR, **options):
+        out = StringIO()
+        call_command('alt_import', 'conf.ModelA', validator, *args, stdout=out, **options)
+        return out.getvalue()
+
+    def test_csv(self):
+        out = self.run_import(self.path('a.csv', 'field_1,field_2\na,1\nb,-2\nc,3\n'),
+                              chunk_size=2, errors=self.path('errors.jsonl'))
+        self.assertIn('Done: 2 created, 1 failed.', out)
+        self.assertListEqual(list(ModelA.objects.values_list('field_1', 'field_2')), [('a', 1), ('c', 3)])
+        with open(self.path('errors.jsonl')) as file:
+            self.assertListEqual([json.loads(line)['row'] for line in file], [2])
+
+    def test_jsonl_dry_run(self):
+        out = self.run_import(self.path('a.jsonl', '{"field_1": "a", "field_2": 1}\n\n{"field_1": "b", "field_2": -1}\n'),
+                              dry_run=True, errors=self.path('errors.jsonl'))
+        self.assertIn('Done: 1 valid, 1 failed.', out)
+        self.assertFalse(ModelA.objects.exists())
+        with open(self.path('errors.jsonl')) as file:
+            self.assertEqual(json.loads(file.read()), {'row': 3, 'errors': {'field_2': ['Must be positive.']}})
+
+    def test_failing_rows(self):
+        out = self.run_import(self.path('a.csv', 'field_1,field_2\na,1\nb,2,extra\nc,3\nd,-1\ne,5\n'),
+                              chunk_size=4, errors=self.path('errors.jsonl'))
+        self.assertIn('Done: 3 created, 2 failed.', out)
+        self.assertListEqual(list(ModelA.objects.values_list('field_1', flat=True)), ['a', 'c', 'e'])
+        with open(self.path('errors.jsonl')) as file:
+            self.assertListEqual([json.loads(line)['row'] for line in file], [2, 4])
+
+        ModelA.objects.all().delete()
+        out = self.run_import(self.path('a.jsonl', '{"field_1": "a", "field_2": 1}\n{"field_1": "b"}\n'))
+        self.assertIn('Done: 1 created, 1 failed.', out)
+        self.assertListEqual(list(ModelA.objects.values_list('field_1', flat=True)), ['a'])
+
+    def test_failing_hook(self):
+        out = self.run_import(self.path('a.csv', 'field_1,field_2\na,1\nb,2\nc,3\n'),
+                              errors=self.path('errors.jsonl'),
+                              validator='django_alt_tests.tests.test_commands.FailingHookValidator')
+        self.assertIn('Done: 2 created, 1 failed.', out)
+        self.assertListEqual(list(ModelA.objects.values_list('field_1', flat=True)), ['a', 'c'])
+        with open(self.path('errors.jsonl')) as file:
+            self.assertEqual(json.loads(file.read()), {'row': 2, 'errors': {'non_field_errors': ['Hook failed']}})
+
+    def test_resume_from_checkpoint(self):
+        checkpoint = self.path('checkpoint.json', json.dumps({'rows': 2, 'created': 2, 'failed': 0}))
+        out = self.run_import(self.path('a.csv', 'field_1,field_2\na,1\nb,2\nc,3\n'), checkpoint=checkpoint)
+        self.assertIn('Resuming after row 2.', out)
+        self.assertListEqual(list(ModelA.objects.values_list('field_1', flat=True)), ['c'])
+        with open(checkpoint) as file:
+            self.assertDictEqual(json.load(file), {'rows': 3, 'created': 3, 'failed': 0})
+
+    def test_bad_arguments(self):
+        with self.assertRaises(CommandError):
+            self.run_import(self.path('a.txt', ''))
+        with self.assertRaises(CommandError):
+            call_command('alt_import', 'conf.Missing', VALIDATOR, self.path('a.csv', ''))
@@ -1,6 +1,9 @@
+import json
+import pickle
+
 from django.test import TestCase
 
-from django_alt.dotdict import ddict, undefined
+from django_alt.dotdict import ddict, dchain, frozenddict, undefined, dview, path_get
 
 
 class DdictTests(TestCase):
@@ -115,6 +118,144 @@ class DdictTests(TestCase):
         self.assertDictEqual(a, dict(a=1, b=2, c=3))
         self.assertDictEqual(b2, dict(z=4))
         self.assertDictEqual(c, dict(a=1, b=2, c=3, z=4))
+        self.assertIsInstance(c, ddict)
+        self.assertListEqual(sorted(c), [('a', 1), ('b', 2), ('c', 3), ('z', 4)])
+        self.assertEqual(json.loads(json.dumps(c)), dict(a=1, b=2, c=3, z=4))
+
+    def test_construction_does_not_mutate_input(self):
+        source = {'c': 3}
+        d = ddict(source, a=1)
+        self.assertDictEqual(source, {'c': 3})
+        self.assertDictEqual(d, {'a': 1, 'c': 3})
+        self.assertDictEqual(ddict(None), {})
+
+    def test_methods_are_not_shadowed(self):
+        d = ddict(items=1)
+        self.assertTrue(callable(d.items))
+        self.assertEqual(d['items'], 1)
+
+
+class FrozenDdictTests(TestCase):
+    def test_access(self):
+        d = frozenddict({'a': 1}, b=2)
+        self.assertEqual(d.a, 1)
+        self.assertEqual(d['b'], 2)
+        self.assertTrue(d.c is undefined)
+        self.assertEqual(d, {'a': 1, 'b': 2})
+
+    def test_hashable(self):
+        self.assertEqual(hash(frozenddict(a=1, b=(1, 2))), hash(frozenddict(b=(1, 2), a=1)))
+        cache = {frozenddict(a=1): 'x'}
+        self.assertEqual(cache[frozenddict(a=1)], 'x')
+        with self.assertRaises(TypeError):
+            hash(frozenddict(a=[1]))
+
+    def test_immutable(self):
+        d = frozenddict(a=1)
+        for mutate in (lambda: d.__setitem__('a', 2), lambda: setattr(d, 'a', 2), lambda: d.update(a=2),
+                       lambda: d.pop('a'), lambda: d.clear(), lambda: d.setdefault('b', 1)):
+            with self.assertRaises(TypeError):
+                mutate()
+        with self.assertRaises(TypeError):
+            del d.a
+        self.assertEqual(d, {'a': 1})
+        self.assertEqual(d + {'b': 2}, {'a': 1, 'b': 2})
+
+    def test_pickle(self):
+        d = pickle.loads(pickle.dumps(frozenddict(a=1)))
+        self.assertIsInstance(d, frozenddict)
+        self.assertEqual(d, {'a': 1})
+        self.assertEqual(hash(d), hash(frozenddict(a=1)))
+
+
+class DchainTests(TestCase):
+    def test_overlay_is_lazy(self):
+        a, b = ddict(a=1, b=2), {'b': 3}
+        c = a.overlay(b)
+        self.assertIsInstance(c, dchain)
+        self.assertIs(c.maps[0], b)
+        self.assertIs(c.maps[1], a)
+        self.assertEqual(c.b, 3)
+        self.assertEqual(c.a, 1)
+        self.assertTrue(c.missing is undefined)
+        self.assertEqual(len(c), 2)
+        self.assertListEqual(sorted(c), ['a', 'b'])
+        a['d'] = 4
+        self.assertEqual(c.d, 4)
+
+    def test_chained_overlay(self):
+        c = ddict(a=1).overlay({'b': 2}).overlay({'a': 3})
+        self.assertEqual(len(c.maps), 3)
+        self.assertEqual(c, {'a': 3, 'b': 2})
+        with self.assertRaises(TypeError):
+            c.overlay(1)
+
+    def test_write_materializes(self):
+        a, b = ddict(a=1, b=2), {'b': 3}
+        c = a.overlay(b)
+        c.z = 5
+        c['a'] = 9
+        del c['b']
+        self.assertEqual(len(c.maps), 1)
+        self.assertIsInstance(c.maps[0], ddict)
+        self.assertEqual(c, {'a': 9, 'z': 5})
+        self.assertDictEqual(a, {'a': 1, 'b': 2})
+        self.assertDictEqual(b, {'b': 3})
+
+    def test_materialize(self):
+        c = ddict(a=1).overlay({'b': 2})
+        merged = c.materialize()
+        self.assertIsInstance(merged, ddict)
+        self.assertDictEqual(merged, {'a': 1, 'b': 2})
+        self.assertIs(c.materialize(), merged)
+        self.assertIsInstance(c.copy(), ddict)
+        self.assertIsNot(c.copy(), merged)
+
+
+class DviewTests(TestCase):
+    def setUp(self):
+        self.data = {'address': {'city': 'Vilnius', 'lines': ['a', {'no': 1}]}, 'empty': None}
+
+    def test_nested_access(self):
+        view = dview(self.data)
+        self.assertEqual(view.address.city, 'Vilnius')
+        self.assertEqual(view['address']['lines'][1].no, 1)
+        self.assertEqual(len(view.address.lines), 2)
+        self.assertIsNone(view.empty)
+        self.assertEqual(view, self.data)
+
+    def test_no_copies(self):
+        view = dview(self.data)
+        self.assertIs(view.address.unwrap(), self.data['address'])
+        self.data['address']['city'] = 'Kaunas'
+        self.assertEqual(view.address.city, 'Kaunas')
+
+    def test_missing_paths(self):
+        view = dview(self.data)
+        self.assertTrue(view.missing is undefined)
+        self.assertTrue(view.address.missing is undefined)
+        self.assertTrue(view.address.lines[1].missing is undefined)
+        self.assertTrue(dview({'a': {}}).a.b is undefined)
+        with self.assertRaises(AttributeError):
+            view.missing.deeper
+        with self.assertRaises(KeyError):
+            view['missing']
+        self.assertNotIn('missing', view)
+        self.assertTrue(path_get(view, 'missing.deeper') is undefined)
+        self.assertTrue(path_get(view, 'address.missing.deeper') is undefined)
+
+    def test_read_only(self):
+        view = dview(self.data)
+        with self.assertRaises(TypeError):
+            view.address = 1
+
+    def test_path_get(self):
+        self.assertEqual(path_get(self.data, 'address.city'), 'Vilnius')
+        self.assertEqual(path_get(self.data, 'address.lines.1.no'), 1)
+        self.assertEqual(path_get(dview(self.data), ('address', 'lines', 0)), 'a')
+        self.assertTrue(path_get(self.data, 'address.lines.5') is undefined)
+        self.assertTrue(path_get(self.data, 'address.city.x') is undefined)
+        self.assertEqual(path_get(self.data, 'empty.x', default=0), 0)
 
 
 class UndefinedTests(TestCase):
@@ -131,6 +272,12 @@ class UndefinedTests(TestCase):
         with self.assertRaises(TypeError):
             undefined()
 
+    def test_undefined_does_not_chain(self):
+        with self.assertRaises(AttributeError):
+            undefined.a
+        with self.assertRaises(TypeError):
+            undefined['a']
+
     def test_undefined_casts_to_false(self):
         self.assertFalse(bool(undefined))
         self.assertFalse(undefined)
@@ -1,11 +1,16 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
-from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, resolve
 from rest_framework.test import APIClient
 
 from django_alt.abstract.endpoints import MetaEndpoint
 from django_alt.endpoints import Endpoint
 from django_alt_tests.conf.endpoints import ModelASerializer, ModelAEndpoint1
-from django_alt_tests.conf.models import ModelA
+from django_alt_tests.conf.models import ModelA, ModelB, ModelC, ModelD
 
 
 class MetaEndpointTests(TestCase):
@@ -282,6 +287,424 @@ class EndpointTests(TestCase):
         self.assertEqual(ModelA.objects.first().field_1, 'abc')
         self.assertEqual(ModelA.objects.first().field_2, 123)
 
+    def test_fields_from_url_form_data(self):
+        resp = self.client.post(reverse('e19', kwargs={'field_1': 'abc'}), {'tags': ['a', 'b', 'c']},
+                                format='multipart')
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(ModelA.objects.get().field_1, 'abc')
+        self.assertEqual(ModelA.objects.get().field_2, 3)
+
+    def test_fields_from_url_json_body_is_not_copied(self):
+        resp = self.client.post(reverse('e19', kwargs={'field_1': 'abc'}), {'field_1': 'def', 'tags': ['a', 'b']},
+                                format='json')
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(ModelA.objects.get().field_1, 'abc')
+        self.assertEqual(ModelA.objects.get().field_2, 2)
+
     def test_fields_from_url_nonexistent_args(self):
         with self.assertRaises(AssertionError) as e:
             self.client.post(reverse('e10', kwargs={'field_1': 'abc', 'field_2': 123}), )
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        a = ModelA.objects.create(field_1='aaa', field_2=1)
+        ModelB.objects.create(name='b1', count=3, price=5, model_a=a)
+        ModelB.objects.create(name='b2', count=4, price=50)
+
+    def test_sparse_fields_config(self):
+        with self.assertRaises(AssertionError):
+            class MyEndpoint1(Endpoint):
+                serializer = ModelASerializer
+                config = {'post': {'sparse_fields': ('field_1',)}}
+
+        with self.assertRaises(AssertionError):
+            class MyEndpoint2(Endpoint):
+                serializer = ModelASerializer
+                config = {'get': {'query': lambda model, **url: model.objects.all(), 'sparse_fields': 'field_1'}}
+
+    def test_all_fields_by_default(self):
+        resp = self.client.get(reverse('b8'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data[0]), 11)
+
+    def test_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('b8') + '?fields=name,count')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, [{'name': 'b1', 'count': 3}, {'name': 'b2', 'count': 4}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('price', queries[0]['sql'])
+        self.assertNotIn('conf_modela', queries[0]['sql'])
+
+    def test_fields_with_related_path(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse('b8') + '?fields=name,model_a_field_1')
+        self.assertEqual(resp.data, [{'name': 'b1', 'model_a_field_1': 'aaa'},
+                                     {'name': 'b2', 'model_a_field_1': None}])
+
+    def test_exclude(self):
+        resp = self.client.get(reverse('b8') + '?exclude=label,model_a_field_1,price')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(set(resp.data[0]), {'id', 'name', 'count', 'ratio', 'active', 'created', 'model_a'})
+
+    def test_not_allowlisted(self):
+        resp = self.client.get(reverse('b8') + '?fields=name,ratio')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data, {'fields': ['Unknown or unsupported field(s): ratio.']})
+
+        resp = self.client.get(reverse('b8') + '?exclude=id')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_unknown_fields_with_all_allowed(self):
+        resp = self.client.get(reverse('b14') + '?fields=name,nonexistent')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data, {'fields': ['Unknown or unsupported field(s): nonexistent.']})
+
+        resp = self.client.get(reverse('b9') + '?exclude=nonexistent')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_empty_fields(self):
+        for url in (reverse('b8'), reverse('b14')):
+            resp = self.client.get(url + '?fields=')
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(resp.data, {'fields': ['At least one field is required.']})
+
+    def test_compiled_read(self):
+        resp = self.client.get(reverse('b9') + '?fields=id,price')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, [{'id': 1, 'price': '5.00', 'is_cheap': True},
+                                     {'id': 2, 'price': '50.00', 'is_cheap': False}])
+
+    def test_validator_reading_left_out_fields(self):
+        resp = self.client.get(reverse('b9') + '?fields=id,name')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, [{'id': 1, 'name': 'b1', 'is_cheap': True},
+                                     {'id': 2, 'name': 'b2', 'is_cheap': False}])
+
+    def test_fields_without_query_inference(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('b14') + '?fields=name,count')
+        self.assertEqual(resp.data, [{'name': 'b1', 'count': 3}, {'name': 'b2', 'count': 4}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('price', queries[0]['sql'])
+
+
+class HeadAndCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        ModelB.objects.create(name='b1', active=True)
+        ModelB.objects.create(name='b2', active=False)
+        ModelB.objects.create(name='b3', active=True)
+
+    def test_count_config(self):
+        with self.assertRaises(AssertionError):
+            class MyEndpoint(Endpoint):
+                serializer = ModelASerializer
+                config = {'delete': {'query': lambda model, **url: model.objects.all(), 'count': True}}
+
+    def test_head_skips_serialization(self):
+        with self.assertNumQueries(0):
+            resp = self.client.head(reverse('b1'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, b'')
+        self.assertNotIn('X-Total-Count', resp)
+
+    def test_head_total_count(self):
+        with self.assertNumQueries(1):
+            resp = self.client.head(reverse('b10'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['X-Total-Count'], '3')
+        self.assertEqual(self.client.head(reverse('b10') + '?active=false')['X-Total-Count'], '1')
+
+    def test_head_permissions_and_not_found(self):
+        self.assertEqual(self.client.head(reverse('e4')).status_code, 401)
+        self.assertEqual(self.client.head(reverse('e5')).status_code, 401)
+        self.assertEqual(self.client.head(reverse('b5', kwargs={'pk': 1})).status_code, 200)
+        self.assertEqual(self.client.head(reverse('b5', kwargs={'pk': 100})).status_code, 404)
+
+    def test_head_with_overridden_on_get(self):
+        self.assertEqual(self.client.get(reverse('e21')).status_code, 404)
+        self.assertEqual(self.client.head(reverse('e21')).status_code, 404)
+        ModelA.objects.create(field_1='a', field_2=1)
+        resp = self.client.head(reverse('e21'))
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.content, b'')
+        self.assertEqual(self.client.get(reverse('e21')).data, {'count': 1})
+
+    def test_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('b10') + '?count&active=true')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, {'count': 2})
+        self.assertEqual(len(queries), 1)
+        self.assertIn('COUNT', queries[0]['sql'])
+
+    def test_count_not_enabled(self):
+        resp = self.client.get(reverse('b1') + '?count')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 3)
+
+
+class DeleteResponseTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(5):
+            ModelA.objects.create(field_1='a{}'.format(i), field_2=i)
+
+    def test_response_config(self):
+        with self.assertRaises(AssertionError):
+            class MyEndpoint1(Endpoint):
+                serializer = ModelASerializer
+                config = {'delete': {'query': lambda model, **url: model.objects.all(), 'response': 'foo'}}
+
+        with self.assertRaises(AssertionError):
+            class MyEndpoint2(Endpoint):
+                serializer = ModelASerializer
+                config = {'delete': {'query': lambda model, **url: model.objects.all(), 'chunk_size': 0}}
+
+    def test_chunked_ids(self):
+        resp = self.client.delete(reverse('e12', kwargs={'min': 1}))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, {'ids': [2, 3, 4, 5]})
+        self.assertListEqual(list(ModelA.objects.values_list('field_2', flat=True)), [0])
+
+    def test_count(self):
+        resp = self.client.delete(reverse('e13', kwargs={'min': 2}))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, {'count': 3})
+        self.assertEqual(ModelA.objects.count(), 2)
+
+    def test_hook_order(self):
+        calls = []
+        url = reverse('e13', kwargs={'min': 2})
+        serializer_class = resolve(url).func.cls.endpoint_class.serializer
+        validator_class = serializer_class.Meta.validator_class
+        with patch.object(validator_class, 'will_delete', lambda validator, queryset: calls.append('will_delete')), \
+                patch.object(validator_class, 'did_delete', lambda validator: calls.append('did_delete')), \
+                patch.object(serializer_class, '_check_permissions',
+                             lambda permission_test, attrs: calls.append('permissions')):
+            self.assertEqual(self.client.delete(url).status_code, 200)
+        self.assertListEqual(calls, ['will_delete', 'permissions', 'did_delete'])
+
+    def test_none(self):
+        resp = self.client.delete(reverse('e14', kwargs={'min': 3}))
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(resp.content, b'')
+        self.assertEqual(ModelA.objects.count(), 4)
+        self.assertEqual(self.client.delete(reverse('e14', kwargs={'min': 3})).status_code, 404)
+
+
+class UpsertTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_upsert_config(self):
+        with self.assertRaises(AssertionError):
+            class MyEndpoint1(Endpoint):
+                serializer = ModelASerializer
+                config = {'post': {'upsert': ('field_1',)}}
+
+        with self.assertRaises(AssertionError):
+            class MyEndpoint2(Endpoint):
+                serializer = ModelASerializer
+                config = {'put': {'query': lambda model, **url: model.objects.get(), 'upsert': 'field_1'}}
+
+        with self.assertRaises(AssertionError):
+            class MyEndpoint3(Endpoint):
+                serializer = ModelASerializer
+                config = {'put': {'upsert': ('field_1',)}}
+
+        with self.assertRaises(AssertionError):
+            class MyEndpoint4(Endpoint):
+                serializer = ModelASerializer
+                config = {'put': {'query': lambda model, **url: model.objects.get(), 'upsert': ('field_1',)}}
+
+    def test_create_then_update(self):
+        resp = self.client.put(reverse('c1', kwargs={'key': 'abc'}), {'value': 1}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual((resp.data['key'], resp.data['value'], resp.data['revision']), ('abc', 1, 1))
+
+        resp = self.client.put(reverse('c1', kwargs={'key': 'abc'}), {'value': 5}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data['key'], resp.data['value'], resp.data['revision']), ('abc', 5, 2))
+        self.assertEqual(ModelC.objects.count(), 1)
+        self.assertEqual(ModelC.objects.get(key='abc').revision, 2)
+
+    def test_concurrent_create(self):
+        def will_create(validator, attrs):
+            # the row is created by another request after the endpoint `query` ran
+            ModelC.objects.create(key='abc')
+
+        url = reverse('c1', kwargs={'key': 'abc'})
+        validator_class = resolve(url).func.cls.endpoint_class.serializer.Meta.validator_class
+        with patch.object(validator_class, 'will_create', will_create):
+            resp = self.client.put(url, {'value': 3}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(ModelC.objects.get().value, 3)
+
+    def test_validation_error(self):
+        resp = self.client.put(reverse('c1', kwargs={'key': 'abc'}), {'value': 'x'}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(ModelC.objects.exists())
+
+
+class PermissionFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.items = [ModelA.objects.create(field_1='a{}'.format(i), field_2=i) for i in range(4)]
+
+    def test_permission_filter_config(self):
+        with self.assertRaises(AssertionError):
+            class MyEndpoint1(Endpoint):
+                serializer = ModelASerializer
+                config = {'post': {'permission_filter': lambda request, **url: None}}
+
+        with self.assertRaises(AssertionError):
+            class MyEndpoint2(Endpoint):
+                serializer = ModelASerializer
+                config = {'get': {'query': lambda model, **url: model.objects.all(), 'permission_filter': 'x'}}
+
+    def test_list_is_filtered_in_the_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('e18'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertListEqual([item['field_2'] for item in resp.data], [0, 1])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"field_2" < 2', queries[0]['sql'])
+
+        self.client.force_authenticate(User.objects.create(username='staff', is_staff=True))
+        resp = self.client.get(reverse('e18'))
+        self.assertListEqual([item['field_2'] for item in resp.data], [0, 1, 2, 3])
+
+    def test_single_instance(self):
+        resp = self.client.patch(reverse('e18_detail', kwargs={'pk': self.items[1].pk}), {'field_1': 'b'}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.patch(reverse('e18_detail', kwargs={'pk': self.items[3].pk}), {'field_1': 'b'},
+                                     format='json')
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(ModelA.objects.get(pk=self.items[3].pk).field_1, 'a3')
+
+
+class WriteResponseTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_response_config(self):
+        with self.assertRaises(AssertionError):
+            class MyEndpoint1(Endpoint):
+                serializer = ModelASerializer
+                config = {'post': {'response': 'changed'}}
+
+        with self.assertRaises(AssertionError):
+            class MyEndpoint2(Endpoint):
+                serializer = ModelASerializer
+                config = {'patch': {'query': lambda model, **url: model.objects.get(), 'response': 'count'}}
+
+    def test_post_summary(self):
+        resp = self.client.post(reverse('e15'), [
+            {'field_1': 'a', 'field_2': 1},
+            {'field_1': 'b', 'field_2': 'x'},
+            {'field_1': 'c', 'field_2': 3},
+        ], format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data['count'], 2)
+        self.assertListEqual(list(resp.data['errors']), [1])
+        self.assertIn('field_2', resp.data['errors'][1])
+        self.assertListEqual(list(ModelA.objects.order_by('id').values_list('field_1', flat=True)), ['a', 'c'])
+
+    def test_post_summary_all_invalid(self):
+        resp = self.client.post(reverse('e15'), {'field_1': 'a'}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data['count'], 0)
+        self.assertListEqual(list(resp.data['errors']), [0])
+
+    def test_post_ids(self):
+        resp = self.client.post(reverse('e16'), [{'field_1': 'a', 'field_2': 1}, {'field_1': 'b', 'field_2': 2}],
+                                format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data, {'ids': list(ModelA.objects.order_by('id').values_list('id', flat=True))})
+
+        resp = self.client.post(reverse('e16'), {'field_1': 'c', 'field_2': 3}, format='json')
+        self.assertEqual(resp.data, {'ids': [ModelA.objects.get(field_1='c').id]})
+
+    def test_patch_changed(self):
+        instance = ModelA.objects.create(field_1='a', field_2=1)
+        resp = self.client.patch(reverse('e16_detail', kwargs={'pk': instance.id}),
+                                 {'field_1': 'a', 'field_2': 5}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, {'field_2': 5})
+        self.assertEqual(ModelA.objects.get(id=instance.id).field_2, 5)
+
+    def test_patch_changed_many_to_many(self):
+        a1, a2 = ModelA.objects.create(field_1='a', field_2=1), ModelA.objects.create(field_1='b', field_2=2)
+        instance = ModelD.objects.create(name='d')
+        instance.model_as.set([a1])
+        resp = self.client.patch(reverse('d1', kwargs={'pk': instance.id}),
+                                 {'name': 'e', 'model_as': [a1.id]}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, {'name': 'e'})
+
+        resp = self.client.patch(reverse('d1', kwargs={'pk': instance.id}),
+                                 {'name': 'e', 'model_as': [a2.id, a1.id]}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(set(resp.data), {'model_as'})
+        self.assertEqual(sorted(resp.data['model_as']), [a1.id, a2.id])
+
+
+class StreamedPostTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def post(self, body, content_type='application/json'):
+        return self.client.generic('POST', reverse('e17', kwargs={'field_1': 'abc'}), body, content_type)
+
+    def test_stream_config(self):
+        with self.assertRaises(AssertionError):
+            class MyEndpoint1(Endpoint):
+                serializer = ModelASerializer
+                config = {'post': {'max_items': 5}}
+
+        with self.assertRaises(AssertionError):
+            class MyEndpoint2(Endpoint):
+                serializer = ModelASerializer
+                config = {'post': {'stream': True, 'response': 'full'}}
+
+        class MyEndpoint3(Endpoint):
+            serializer = ModelASerializer
+            config = {'post': {'stream': True, 'response': 'count'}}
+
+    def test_json_array(self):
+        resp = self.post('[{"field_2": 1}, {"field_2": 2}, {"field_2": 3}]')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data, {'count': 3})
+        self.assertListEqual(list(ModelA.objects.values_list('field_1', 'field_2')),
+                             [('abc', 1), ('abc', 2), ('abc', 3)])
+
+    def test_ids(self):
+        resp = self.client.post(reverse('e20'), [{'field_1': 'x', 'field_2': i} for i in range(3)], format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertListEqual(resp.data['ids'], list(ModelA.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(len(resp.data['ids']), 3)
+
+    def test_ndjson(self):
+        resp = self.post('{"field_2": 1}\n{"field_2": 2}\n', 'application/x-ndjson')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(ModelA.objects.count(), 2)
+
+    def test_validation_error_rolls_back(self):
+        resp = self.post('[{"field_2": 1}, {"field_2": 2}, {"field_2": "x"}]')
+        self.assertEqual(resp.status_code, 400)
+        self.assertListEqual(list(resp.data), [2])
+        self.assertEqual(ModelA.objects.count(), 0)
+
+    def test_limits(self):
+        self.assertEqual(self.post('[' + ','.join(['{"field_2": 1}'] * 6) + ']').status_code, 413)
+        self.assertEqual(self.post('[{"field_2": 1}' + ' ' * 1024 + ']').status_code, 413)
+        self.assertEqual(self.post('{"field_2": 1}').status_code, 400)
+        self.assertEqual(ModelA.objects.count(), 0)
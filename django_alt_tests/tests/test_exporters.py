@@ -0,0 +1,101 @@
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from django_alt.exporters import pk_ranges, endpoint_queryset, iter_export, iter_chunks
+from django_alt_tests.conf.endpoints import ModelBSerializer, ModelAEndpoint11, ModelAWithBsSerializer
+from django_alt_tests.conf.models import ModelA, ModelB
+
+ENDPOINT = 'django_alt_tests.conf.endpoints.ModelBEndpoint11'
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        a = ModelA.objects.create(field_1='aaa', field_2=1)
+        for i in range(5):
+            ModelB.objects.create(name='b{}'.format(i), count=i, price=Decimal(i * 5), model_a=a if i % 2 else None)
+
+    def expected(self, queryset):
+        return [JSONRenderer().render(ModelBSerializer(b).data).decode() for b in queryset]
+
+    def test_ndjson_endpoint(self):
+        resp = self.client.get(reverse('b11'), {'export': ''})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertListEqual(lines, self.expected(ModelB.objects.order_by('id')))
+        self.assertIn('"is_cheap":true', lines[0])
+
+    def test_csv_endpoint_with_sparse_fields(self):
+        resp = self.client.get(reverse('b11'), {'export': 'csv', 'fields': 'name,model_a'})
+        self.assertEqual(resp['Content-Type'], 'text/csv')
+        content = b''.join(resp.streaming_content).decode()
+        self.assertListEqual(content.splitlines(), ['name,model_a,is_cheap', 'b0,,True', 'b1,1,True', 'b2,,False',
+                                                     'b3,1,False', 'b4,,False'])
+
+    def test_unsupported_format(self):
+        self.assertEqual(self.client.get(reverse('b11'), {'export': 'xml'}).status_code, 400)
+        self.assertIsInstance(self.client.get(reverse('b11')).data, list)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.ndjson')
+            out = StringIO()
+            call_command('alt_export', ENDPOINT, path, url=['min=2'], chunk_size=1, stdout=out)
+            self.assertIn('Exported 3 items', out.getvalue())
+            with open(path) as file:
+                self.assertListEqual(file.read().splitlines(),
+                                     self.expected(ModelB.objects.filter(count__gte=2).order_by('id')))
+
+            path = os.path.join(directory, 'export.csv')
+            call_command('alt_export', ENDPOINT, path, stdout=StringIO())
+            with open(path) as file:
+                self.assertEqual(len(file.read().splitlines()), 6)
+
+    def test_chunks_by_key_set(self):
+        ModelB.objects.create(name='x', count=2)
+        for queryset in (ModelB.objects.all(), ModelB.objects.order_by('-count'), ModelB.objects.order_by('active')):
+            with CaptureQueriesContext(connection) as queries:
+                chunks = list(iter_chunks(queryset, 2))
+            self.assertListEqual([b.pk for chunk in chunks for b in chunk], [b.pk for b in queryset.order_by(
+                *queryset.query.order_by, 'pk')])
+            self.assertEqual(len(chunks), 3)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+
+    def test_chunks_by_offset_and_sliced(self):
+        queryset = ModelB.objects.order_by('ratio', 'id')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertListEqual([len(chunk) for chunk in iter_chunks(queryset, 2)], [2, 2, 1])
+        self.assertIn('OFFSET', queries[1]['sql'])
+        with self.assertNumQueries(1):
+            chunks = list(iter_chunks(ModelB.objects.order_by('-id')[1:4], 2))
+        self.assertListEqual([b.name for chunk in chunks for b in chunk], ['b3', 'b2', 'b1'])
+
+    def test_pk_ranges(self):
+        ids = list(ModelB.objects.order_by('id').values_list('id', flat=True))
+        self.assertListEqual(pk_ranges(ModelB.objects.all(), 2), [(ids[0], ids[2]), (ids[3], ids[4])])
+        self.assertListEqual(pk_ranges(ModelB.objects.all(), 10), [(pk, pk) for pk in ids])
+        self.assertListEqual(pk_ranges(ModelB.objects.none(), 2), [])
+
+    def test_query_plan_is_kept(self):
+        for i in range(19):
+            ModelB.objects.create(name='c{}'.format(i), model_a=ModelA.objects.create(field_1='a', field_2=i))
+        queryset = endpoint_queryset(ModelAEndpoint11)
+        expected = [JSONRenderer().render(ModelAWithBsSerializer(a).data).decode()
+                    for a in ModelA.objects.order_by('id')]
+        # a chunk query and a prefetch query for each chunk of 8 (out of 20 rows)
+        with self.assertNumQueries(6):
+            lines = ''.join(iter_export(ModelAWithBsSerializer(), queryset, 'ndjson', chunk_size=8)).splitlines()
+        self.assertListEqual(lines, expected)
+        with self.assertNumQueries(2):
+            list(iter_export(ModelAWithBsSerializer(), queryset.order_by('-id'), 'csv', chunk_size=50))
@@ -0,0 +1,115 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from django_alt.abstract.validators import Validator
+from django_alt.serializers import ValidatedModelSerializer
+from django_alt.utils.inference import QueryPlan, infer_query_plan
+from django_alt_tests.conf.endpoints import ModelASerializer, ModelBSerializer, ModelBCustomSerializer, \
+    ModelBNestedSerializer, ModelAWithBsSerializer, ModelAEndpoint1, ModelBEndpoint6, ModelBEndpoint7
+from django_alt_tests.conf.models import ModelA, ModelB
+
+
+class QueryPlanInferenceTests(TestCase):
+    def test_plain_serializer(self):
+        plan = infer_query_plan(ModelASerializer())
+        self.assertDictEqual(plan.describe(), {
+            'select_related': [],
+            'prefetch_related': [],
+            'only': ['id', 'field_2', 'field_1']
+        })
+
+    def test_pk_related_field(self):
+        plan = infer_query_plan(ModelBSerializer())
+        self.assertEqual(plan.select_related, ())
+        self.assertIn('model_a', plan.only)
+
+    def test_nested_serializer(self):
+        plan = infer_query_plan(ModelBNestedSerializer())
+        self.assertEqual(plan.select_related, ('model_a',))
+        self.assertEqual(plan.prefetch_related, ())
+        self.assertEqual(plan.only, ('id', 'name', 'model_a', 'model_a__id', 'model_a__field_2', 'model_a__field_1'))
+
+    def test_nested_many_serializer(self):
+        plan = infer_query_plan(ModelAWithBsSerializer())
+        self.assertEqual(plan.select_related, ())
+        self.assertEqual(plan.prefetch_related, ('model_bs', 'model_bs__model_a'))
+        self.assertIsNone(plan.only)
+
+    def test_dotted_source_and_method_field(self):
+        plan = infer_query_plan(ModelBCustomSerializer())
+        self.assertEqual(plan.select_related, ('model_a',))
+        self.assertIsNone(plan.only)
+
+    def test_dotted_source(self):
+        class ModelBDottedSerializer(ValidatedModelSerializer):
+            a_field = serializers.CharField(source='model_a.field_1')
+
+            class Meta:
+                model = ModelB
+                validator_class = Validator
+                fields = ('name', 'a_field')
+
+        plan = infer_query_plan(ModelBDottedSerializer())
+        self.assertEqual(plan.select_related, ('model_a',))
+        self.assertEqual(plan.only, ('name', 'model_a', 'model_a__field_1'))
+
+    def test_non_model_serializer(self):
+        class ConcreteSerializer(serializers.Serializer):
+            somestring = serializers.CharField()
+
+        self.assertFalse(infer_query_plan(ConcreteSerializer()))
+
+    def test_apply(self):
+        plan = QueryPlan(select_related=('model_a',), only=('name', 'model_a'))
+        self.assertEqual(plan.apply(ModelB.objects.all()).query.deferred_loading, ({'name', 'model_a'}, False))
+        self.assertEqual(plan.apply(ModelB.objects.only('count')).query.deferred_loading, ({'count'}, False))
+        values = ModelB.objects.values('name')
+        self.assertIs(plan.apply(values), values)
+        self.assertIsNone(plan.apply(None))
+
+    def test_apply_combined_and_sliced(self):
+        plan = QueryPlan(select_related=('model_a',), only=('name', 'model_a'))
+        combined = ModelB.objects.filter(name='b').union(ModelB.objects.filter(name='c'))
+        self.assertIs(plan.apply(combined), combined)
+        sliced = ModelB.objects.all()[:2]
+        self.assertIs(plan.apply(sliced), sliced)
+
+
+class QueryPlanEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(5):
+            a = ModelA.objects.create(field_1='a{}'.format(i), field_2=i)
+            ModelB.objects.create(name='b{}'.format(i), model_a=a)
+            ModelB.objects.create(name='c{}'.format(i), model_a=a)
+
+    def test_inferred_at_class_creation(self):
+        self.assertEqual(ModelBEndpoint6.query_plan.select_related, ('model_a',))
+        self.assertIsNone(ModelBEndpoint7.query_plan)
+        self.assertIsNotNone(ModelAEndpoint1.query_plan)
+
+    def test_select_related_applied(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse('b6'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 10)
+        self.assertEqual(resp.data[0]['model_a']['field_1'], 'a0')
+
+    def test_opt_out(self):
+        with self.assertNumQueries(11):
+            resp = self.client.get(reverse('b7'))
+        self.assertEqual(resp.content, self.client.get(reverse('b6')).content)
+
+    def test_combined_query(self):
+        resp = self.client.get(reverse('b13'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([b['name'] for b in resp.data], ['b0', 'b1', 'b2', 'b3', 'b4', 'c0', 'c1', 'c2', 'c3', 'c4'])
+
+    def test_prefetch_related_applied(self):
+        with self.assertNumQueries(2):
+            resp = self.client.get(reverse('e11'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 5)
+        self.assertEqual([b['name'] for b in resp.data[0]['model_bs']], ['b0', 'c0'])
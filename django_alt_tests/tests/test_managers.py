@@ -0,0 +1,453 @@
+import os
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+
+from django_alt.abstract.validators import Validator
+from django_alt.managers import ValidatedManager, BulkSummary, ATOMIC_ALL, upsert, is_unique_together
+from django_alt.utils.functional import chunked
+from django_alt.utils.shortcuts import collect_errors, invalid_if, required
+from django_alt_tests.conf.models import ModelA, ModelC
+
+
+class ModelAValidator(Validator):
+    def clean_field_1(self, field_1):
+        return field_1.strip()
+
+    def field_field_2(self, value):
+        invalid_if(value < 0, 'field_2', 'Must be positive')
+
+    def will_create(self, attrs: dict):
+        attrs['field_1'] = attrs['field_1'].upper()
+
+
+class ProcessValidator(ModelAValidator):
+    def clean_field_1(self, field_1):
+        return '{0}:{1}'.format(field_1.strip(), os.getpid())
+
+    def will_create(self, attrs: dict):
+        attrs['field_1'] = attrs['field_1'].split(':')[0].upper() + ':' + attrs['field_1'].split(':')[1]
+
+
+class ValueValidator(ModelAValidator):
+    def field_field_2(self, value):
+        invalid_if(value < 0, 'field_2', '{0} must be positive'.format(value))
+
+
+class ChunkedTests(TestCase):
+    def test_chunked(self):
+        self.assertListEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertListEqual(list(chunked((i for i in range(4)), 2)), [[0, 1], [2, 3]])
+        self.assertListEqual(list(chunked([], 2)), [])
+
+
+class CreateManyTests(TestCase):
+    def test_create_many_from_generator(self):
+        chunks = []
+
+        class ConcreteValidator(ModelAValidator):
+            def did_create_many(self, instances, list_of_validated_attrs):
+                chunks.append(len(instances))
+                super().did_create_many(instances, list_of_validated_attrs)
+
+        summary = ValidatedManager(ModelA, ConcreteValidator).create_many(
+            ({'field_1': ' a{} '.format(i), 'field_2': i} for i in range(7)), chunk_size=3)
+
+        self.assertIsInstance(summary, BulkSummary)
+        self.assertEqual(summary.count, 7)
+        self.assertEqual(summary.chunks, 3)
+        self.assertListEqual(chunks, [3, 3, 1])
+        self.assertEqual(ModelA.objects.count(), 7)
+        self.assertListEqual(list(ModelA.objects.order_by('field_2').values_list('field_1', flat=True)[:2]),
+                             ['A0', 'A1'])
+
+    def test_did_create_per_instance(self):
+        created = []
+
+        class ConcreteValidator(ModelAValidator):
+            def did_create(self, instance, validated_attrs):
+                created.append((instance.field_1, validated_attrs['field_1']))
+
+        ValidatedManager(ModelA, ConcreteValidator).create_many([{'field_1': 'x', 'field_2': 1}])
+        self.assertListEqual(created, [('X', 'X')])
+
+    def test_no_save(self):
+        summary = ValidatedManager(ModelA, ModelAValidator, no_save=True).create_many(
+            [{'field_1': 'x', 'field_2': 1}, {'field_1': 'y', 'field_2': 2}])
+        self.assertEqual(summary.count, 2)
+        self.assertEqual(ModelA.objects.count(), 0)
+
+
+class ParallelCreateManyTests(TestCase):
+    def items(self, count):
+        return ({'field_1': ' a{} '.format(i), 'field_2': i} for i in range(count))
+
+    def test_parallel(self):
+        summary = ValidatedManager(ModelA, ProcessValidator).create_many(self.items(7), chunk_size=4, parallel=2)
+        self.assertEqual(summary.count, 7)
+        self.assertEqual(summary.chunks, 2)
+        rows = [row.split(':') for row in ModelA.objects.order_by('field_2').values_list('field_1', flat=True)]
+        self.assertListEqual([name for name, _ in rows], ['A{}'.format(i) for i in range(7)])
+        self.assertNotIn(str(os.getpid()), {pid for _, pid in rows})
+
+    def test_parallel_error_in_order(self):
+        items = list(self.items(6))
+        items[1]['field_2'], items[4]['field_2'] = -1, -2
+        with self.assertRaises(serializers.ValidationError) as e:
+            ValidatedManager(ModelA, ValueValidator).create_many(items, chunk_size=6, parallel=3)
+        self.assertEqual(e.exception.detail, {'field_2': ['-1 must be positive.']})
+        self.assertEqual(ModelA.objects.count(), 0)
+
+
+class CollectErrorsTests(TestCase):
+    def test_all_errors_of_an_item(self):
+        class ConcreteValidator(ModelAValidator):
+            collects_errors = True
+
+            def check_name(self, attrs):
+                invalid_if(attrs['field_1'] == 'x', 'field_1', 'Must not be x')
+
+        manager = ValidatedManager(ModelA, ConcreteValidator)
+        with self.assertRaises(serializers.ValidationError) as e:
+            manager.create(field_1=' x ', field_2=-1)
+        self.assertEqual(e.exception.detail, {'field_1': ['Must not be x.'], 'field_2': ['Must be positive.']})
+
+        summary = manager.create_many([{'field_1': 'x', 'field_2': -1}, {'field_1': 'y', 'field_2': 1}],
+                                      on_error=lambda index, detail: None)
+        self.assertEqual(summary.count, 1)
+        self.assertEqual(summary.failed, 1)
+
+    def test_hook_using_missing_required_value(self):
+        class ConcreteValidator(Validator):
+            collects_errors = True
+
+            def check_name(self, attrs):
+                invalid_if(required('field_1', attrs).strip() == 'x', 'field_1', 'Must not be x')
+
+        with self.assertRaises(serializers.ValidationError) as e:
+            ValidatedManager(ModelA, ConcreteValidator).create(field_2=1)
+        self.assertEqual(e.exception.detail, {'field_1': ['This field is required.']})
+
+        with self.assertRaises(AttributeError):
+            with collect_errors():
+                None.strip()
+
+
+class CreateManyTransactionTests(TransactionTestCase):
+    def items(self):
+        yield {'field_1': 'a', 'field_2': 1}
+        yield {'field_1': 'b', 'field_2': 2}
+        yield {'field_1': 'c', 'field_2': -1}
+
+    def test_chunk_transactions(self):
+        with self.assertRaises(serializers.ValidationError):
+            ValidatedManager(ModelA, ModelAValidator).create_many(self.items(), chunk_size=2)
+        self.assertEqual(ModelA.objects.count(), 2)
+
+    def test_global_transaction(self):
+        with self.assertRaises(serializers.ValidationError):
+            ValidatedManager(ModelA, ModelAValidator).create_many(self.items(), chunk_size=2, atomic=ATOMIC_ALL)
+        self.assertEqual(ModelA.objects.count(), 0)
+
+
+class UpdateManyTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            ModelA.objects.create(field_1='a{}'.format(i), field_2=i)
+
+    def test_update_queryset_with_attrs(self):
+        updated = []
+
+        class ConcreteValidator(ModelAValidator):
+            def will_update(self, instance, attrs):
+                attrs['field_1'] = attrs['field_1'] + str(instance.field_2)
+
+            def did_update_many(self, instances, list_of_validated_attrs):
+                updated.append([i.field_1 for i in instances])
+
+        with CaptureQueriesContext(connection) as queries:
+            summary = ValidatedManager(ModelA, ConcreteValidator).update_many(
+                ModelA.objects.order_by('id'), {'field_1': ' b '}, chunk_size=3)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertNotIn('field_2', updates[0])
+        self.assertEqual(summary.count, 5)
+        self.assertEqual(summary.chunks, 2)
+        self.assertListEqual(updated, [['b0', 'b1', 'b2'], ['b3', 'b4']])
+        self.assertListEqual(list(ModelA.objects.order_by('id').values_list('field_1', flat=True)),
+                             ['b0', 'b1', 'b2', 'b3', 'b4'])
+
+    def test_update_pairs_writes_changed_columns_only(self):
+        instances = list(ModelA.objects.order_by('id'))
+        ModelA.objects.filter(id=instances[0].id).update(field_2=100)
+        summary = ValidatedManager(ModelA, Validator).update_many([
+            (instances[0], {'field_1': 'changed', 'field_2': 0}),
+            (instances[1], {'field_1': 'a1', 'field_2': 1}),
+        ])
+        self.assertEqual(summary.count, 1)
+        self.assertEqual(ModelA.objects.get(id=instances[0].id).field_1, 'changed')
+        # field_2 was unchanged on the instance, so it was not written
+        self.assertEqual(ModelA.objects.get(id=instances[0].id).field_2, 100)
+
+    def test_update_list_of_attrs(self):
+        updated = []
+
+        class ConcreteValidator(Validator):
+            def did_update(self, instance, validated_attrs):
+                updated.append((instance.id, validated_attrs))
+
+        instances = list(ModelA.objects.order_by('id')[:2])
+        ValidatedManager(ModelA, ConcreteValidator).update_many(instances, [{'field_2': 10}, {'field_2': 20}])
+        self.assertListEqual(updated, [(instances[0].id, {'field_2': 10}), (instances[1].id, {'field_2': 20})])
+        self.assertListEqual(list(ModelA.objects.order_by('id').values_list('field_2', flat=True)[:2]), [10, 20])
+
+    def test_update_validation_error(self):
+        with self.assertRaises(serializers.ValidationError):
+            ValidatedManager(ModelA, ModelAValidator).update_many(ModelA.objects.all(), {'field_2': -1})
+        self.assertFalse(ModelA.objects.filter(field_2=-1).exists())
+
+    def test_update_all_or_nothing(self):
+        updated = []
+
+        class ConcreteValidator(ModelAValidator):
+            def did_update_many(self, instances, list_of_validated_attrs):
+                updated.append([i.field_2 for i in instances])
+
+        manager = ValidatedManager(ModelA, ConcreteValidator)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(serializers.ValidationError):
+                manager.update_many(ModelA.objects.order_by('id'), [{'field_2': 10}] * 4 + [{'field_2': -1}],
+                                    chunk_size=2, atomic=ATOMIC_ALL)
+        self.assertListEqual(updated, [])
+        self.assertFalse(ModelA.objects.filter(field_2=10).exists())
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            manager.update_many(ModelA.objects.order_by('id'), {'field_2': 10}, chunk_size=2, atomic=ATOMIC_ALL)
+            self.assertListEqual(updated, [])
+        self.assertEqual(len(callbacks), 3)
+        self.assertListEqual(updated, [[10, 10], [10, 10], [10]])
+
+
+class UpdateQuerysetTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            ModelA.objects.create(field_1='a{}'.format(i), field_2=i)
+
+    def test_requires_opt_in(self):
+        with self.assertRaises(AssertionError):
+            ValidatedManager(ModelA, ModelAValidator).update_queryset(ModelA.objects.all(), field_1='x')
+
+    def test_update_queryset(self):
+        calls = []
+
+        class ConcreteValidator(ModelAValidator):
+            allows_queryset_update = True
+
+            def will_update_queryset(self, queryset, attrs):
+                calls.append(('will', queryset.count()))
+                attrs['field_1'] = attrs['field_1'].upper()
+
+            def did_update_queryset(self, queryset, validated_attrs, count):
+                calls.append(('did', count))
+
+        with CaptureQueriesContext(connection) as queries:
+            count = ValidatedManager(ModelA, ConcreteValidator).update_queryset(
+                ModelA.objects.filter(field_2__gte=3), field_1=' archived ')
+        self.assertEqual(count, 2)
+        self.assertListEqual(calls, [('will', 2), ('did', 2)])
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+        self.assertListEqual(list(ModelA.objects.order_by('id').values_list('field_1', flat=True)),
+                             ['a0', 'a1', 'a2', 'ARCHIVED', 'ARCHIVED'])
+
+    def test_update_queryset_validation_error(self):
+        class ConcreteValidator(ModelAValidator):
+            allows_queryset_update = True
+
+        with self.assertRaises(serializers.ValidationError):
+            ValidatedManager(ModelA, ConcreteValidator).update_queryset(ModelA.objects.all(), field_2=-5)
+        self.assertFalse(ModelA.objects.filter(field_2=-5).exists())
+
+
+class DeleteTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            ModelA.objects.create(field_1='a{}'.format(i), field_2=i)
+
+    def test_delete(self):
+        calls = []
+
+        class ConcreteValidator(Validator):
+            def will_delete(self, queryset):
+                calls.append(('will', queryset.count()))
+
+            def did_delete(self):
+                calls.append(('did',))
+
+        summary = ValidatedManager(ModelA, ConcreteValidator).delete(ModelA.objects.filter(field_2__lt=2),
+                                                                     before_delete=lambda: calls.append(('before',)))
+        self.assertEqual(summary.count, 2)
+        self.assertListEqual(calls, [('will', 2), ('before',), ('did',)])
+        self.assertEqual(ModelA.objects.count(), 3)
+
+    def test_delete_in_chunks(self):
+        batches = []
+
+        class ConcreteValidator(Validator):
+            def will_delete(self, queryset):
+                batches.append(sorted(queryset.values_list('field_2', flat=True)))
+
+            def did_delete_many(self, pks):
+                batches.append(pks)
+
+        summary = ValidatedManager(ModelA, ConcreteValidator).delete(
+            ModelA.objects.all(), chunk_size=2, before_delete=lambda: batches.append('before'))
+        self.assertEqual(summary.count, 5)
+        self.assertEqual(summary.chunks, 3)
+        self.assertListEqual(summary.pks, [1, 2, 3, 4, 5])
+        self.assertListEqual(batches, [[0, 1], 'before', [1, 2], [2, 3], [3, 4], [4], [5]])
+        self.assertEqual(ModelA.objects.count(), 0)
+
+        batches.clear()
+        summary = ValidatedManager(ModelA, ConcreteValidator).delete(
+            ModelA.objects.all(), chunk_size=2, before_delete=lambda: batches.append('before'))
+        self.assertEqual(summary.count, 0)
+        self.assertListEqual(batches, ['before'])
+
+    def test_delete_in_chunks_without_model(self):
+        # the batch queryset is passed to the hook, so validators without a model work too
+        querysets = []
+
+        class ConcreteValidator(Validator):
+            def will_delete(self, queryset):
+                querysets.append(queryset.count())
+
+        manager = ValidatedManager(ModelA, ConcreteValidator)
+        manager.validator.model = None
+        summary = manager.delete(ModelA.objects.all(), chunk_size=3)
+        self.assertEqual(summary.count, 5)
+        self.assertListEqual(querysets, [3, 2])
+
+    def test_delete_sliced_in_chunks(self):
+        summary = ValidatedManager(ModelA, Validator).delete(ModelA.objects.order_by('-field_2')[:3], chunk_size=2)
+        self.assertEqual(summary.count, 3)
+        self.assertEqual(summary.chunks, 2)
+        self.assertListEqual(list(ModelA.objects.values_list('field_2', flat=True)), [0, 1])
+
+
+class UpsertTests(TestCase):
+    def test_upsert(self):
+        calls = []
+
+        class ConcreteValidator(Validator):
+            def will_create(self, attrs):
+                calls.append('will_create')
+
+            def will_update(self, instance, attrs):
+                calls.append('will_update')
+
+            def did_create(self, instance, validated_attrs):
+                calls.append('did_create')
+
+            def did_update(self, instance, validated_attrs):
+                calls.append('did_update')
+
+        manager = ValidatedManager(ModelC, ConcreteValidator)
+        instance, created = manager.upsert(('key',), key='k', value=1)
+        self.assertTrue(created)
+        instance, created = manager.upsert(('key',), key='k', value=2)
+        self.assertFalse(created)
+        self.assertListEqual(calls, ['will_create', 'did_create', 'will_update', 'did_update'])
+        self.assertListEqual(list(ModelC.objects.values_list('key', 'value')), [('k', 2)])
+        self.assertEqual(instance.value, 2)
+
+    def test_upsert_function(self):
+        instance, created = upsert(ModelC(), {'key': 'k', 'value': 1}, ('key',))
+        self.assertTrue(created)
+        self.assertIsNotNone(instance.pk)
+        other, created = upsert(ModelC(), {'key': 'k', 'value': 3}, ('key',))
+        self.assertFalse(created)
+        self.assertEqual(other.pk, instance.pk)
+        self.assertEqual(ModelC.objects.get().value, 3)
+        _, created = upsert(ModelC(), {'key': 'k'}, ('key',))
+        self.assertFalse(created)
+
+    def test_upsert_reloads_updated_row(self):
+        ModelC.objects.create(key='k', value=1, revision=5)
+        instance, created = upsert(ModelC(), {'key': 'k', 'value': 2}, ('key',))
+        self.assertFalse(created)
+        self.assertEqual((instance.value, instance.revision), (2, 5))
+        instance, created = ValidatedManager(ModelC, Validator).upsert(('key',), key='k', value=3)
+        self.assertEqual((instance.value, instance.revision), (3, 5))
+
+    def test_upsert_missing_key(self):
+        with self.assertRaises(serializers.ValidationError) as context:
+            ValidatedManager(ModelC, Validator).upsert(('key',), value=1)
+        self.assertEqual(context.exception.detail, {'key': ['This field is required.']})
+
+    def test_upsert_looks_up_cleaned_key(self):
+        calls = []
+
+        class ConcreteValidator(Validator):
+            def clean_key(self, key):
+                return key.strip().lower()
+
+            def will_create(self, attrs):
+                calls.append('will_create')
+
+            def will_update(self, instance, attrs):
+                calls.append('will_update')
+
+        ModelC.objects.create(key='k', value=1, revision=5)
+        instance, created = ValidatedManager(ModelC, ConcreteValidator).upsert(('key',), key=' K ', value=2)
+        self.assertFalse(created)
+        self.assertListEqual(calls, ['will_update'])
+        self.assertListEqual(list(ModelC.objects.values_list('key', 'value', 'revision')), [('k', 2, 5)])
+
+    def test_unique_fields(self):
+        self.assertTrue(is_unique_together(ModelC, ('key',)))
+        self.assertTrue(is_unique_together(ModelC, ('id',)))
+        self.assertFalse(is_unique_together(ModelC, ('value',)))
+        self.assertFalse(is_unique_together(ModelC, ('key', 'value')))
+        self.assertFalse(is_unique_together(ModelC, ('missing',)))
+        with self.assertRaises(AssertionError):
+            ValidatedManager(ModelC, Validator).upsert(('value',), key='k', value=1)
+
+    def test_upsert_existing_with_taken_key(self):
+        ModelC.objects.create(key='taken')
+        instance = ModelC.objects.create(key='k')
+        with self.assertRaises(serializers.ValidationError) as context:
+            upsert(instance, {'key': 'taken', 'value': 2}, ('key',))
+        self.assertEqual(context.exception.detail, {'key': ['An item with this value already exists.']})
+        self.assertListEqual(list(ModelC.objects.values_list('key', 'value')), [('taken', 0), ('k', 0)])
+
+    def test_upsert_race(self):
+        calls = []
+
+        class ConcreteValidator(Validator):
+            def will_create(self, attrs):
+                # another request creates the row between the read and the write
+                ModelC.objects.create(key=attrs['key'], value=0)
+
+            def did_create(self, instance, validated_attrs):
+                calls.append('did_create')
+
+            def did_update(self, instance, validated_attrs):
+                calls.append('did_update')
+
+        instance, created = ValidatedManager(ModelC, ConcreteValidator).upsert(('key',), key='k', value=1)
+        self.assertFalse(created)
+        self.assertListEqual(calls, ['did_update'])
+        self.assertListEqual(list(ModelC.objects.values_list('pk', 'value')), [(instance.pk, 1)])
+
+    @skipUnless(connection.vendor == 'postgresql', 'single statement upsert requires PostgreSQL')
+    def test_upsert_statement(self):
+        with self.assertNumQueries(1):
+            instance, created = upsert(ModelC(), {'key': 'k', 'value': 1}, ('key',))
+        self.assertTrue(created)
+        with self.assertNumQueries(1):
+            other, created = upsert(ModelC(), {'key': 'k', 'value': 2, 'revision': 1}, ('key',))
+        self.assertFalse(created)
+        self.assertEqual(other.pk, instance.pk)
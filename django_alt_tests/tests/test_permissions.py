@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+
+from django_alt.utils.permissions import Check, check, all_of, any_of, not_, permission_trace, pre_logged_in
+
+
+class PermissionCombinatorTests(TestCase):
+    def setUp(self):
+        self.request = SimpleNamespace(user=AnonymousUser())
+        self.calls = []
+
+    def make(self, name, result, cost=1):
+        def func(request, **url):
+            self.calls.append(name)
+            return result
+        return Check(func, cost=cost, name=name)
+
+    def test_cost_order_and_short_circuit(self):
+        expensive, cheap, denied = self.make('expensive', True, 10), self.make('cheap', True, 0), self.make('no', False, 5)
+        permission = expensive & cheap & denied
+        self.assertFalse(permission(self.request, pk=1))
+        self.assertListEqual(self.calls, ['cheap', 'no'])
+        self.assertEqual(permission_trace(self.request).denied_by, 'no')
+
+        self.calls.clear()
+        self.assertTrue(any_of(expensive, cheap)(self.request, pk=1))
+        self.assertListEqual(self.calls, [])  # `cheap` was memoized above
+
+    def test_memoization_per_arguments_and_user(self):
+        owner = self.make('owner', True)
+        self.assertTrue(owner(self.request, pk=1))
+        self.assertTrue(owner(self.request, pk=1))
+        self.assertTrue(owner(self.request, pk=2))
+        self.assertListEqual(self.calls, ['owner', 'owner'])
+        self.assertTrue(owner(SimpleNamespace(user=AnonymousUser()), pk=1))
+        self.assertEqual(len(self.calls), 3)
+
+        cached = [entry.cached for entry in permission_trace(self.request).entries]
+        self.assertListEqual(cached, [False, True, False])
+
+    def test_not_and_any(self):
+        permission = any_of(self.make('a', False), not_(self.make('b', True)))
+        self.assertFalse(permission(self.request))
+        self.assertEqual(permission_trace(self.request).denied_by, '(a | ~b)')
+        self.assertTrue((~self.make('c', False))(self.request))
+        self.assertIsNone(permission_trace(self.request).denied_by)
+
+    def test_trace(self):
+        @check(cost=0)
+        def is_staff(request, **url):
+            return request.user.is_staff
+
+        permission = all_of(pre_logged_in, is_staff)
+        self.assertFalse(permission(self.request))
+        trace = permission_trace(self.request)
+        self.assertEqual(trace.denied_by, 'is_staff')
+        self.assertListEqual([(e.name, e.result) for e in trace.entries],
+                             [('is_staff', False), ('(pre_logged_in & is_staff)', False)])
+        self.assertTrue(all(e.duration >= 0 for e in trace.entries))
@@ -0,0 +1,105 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from django_alt.endpoints import Endpoint
+from django_alt.testing import registered_endpoints, query_counts, assert_queries_do_not_scale
+from django_alt.utils.queries import QueryLog, QueryBudgetExceeded, capture_request_queries, query_phase, \
+    HEADER_COUNT, HEADER_N_PLUS_ONE, HEADER_PHASES, PHASE_SERIALIZATION, PHASE_WRITE
+from django_alt_tests.conf.endpoints import ModelASerializer
+from django_alt_tests.conf.models import ModelA, ModelB
+
+
+class QueryLogTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(4):
+            ModelB.objects.create(name='b{}'.format(i), model_a=ModelA.objects.create(field_1='a', field_2=i))
+
+    def test_phases(self):
+        log = QueryLog()
+        with log.capture():
+            with query_phase('first'):
+                ModelA.objects.count()
+                with query_phase('second'):
+                    list(ModelA.objects.all())
+            ModelA.objects.exists()
+        self.assertListEqual([q.phase for q in log.queries], ['first', 'second', 'url'])
+        self.assertEqual(log.count, 3)
+        self.assertListEqual(list(log.phases()), ['first', 'second', 'url'])
+        self.assertFalse(log.n_plus_one())
+
+    def test_n_plus_one(self):
+        with capture_request_queries() as logs:
+            self.client.get(reverse('b6'))
+            self.client.get(reverse('b7'))
+        self.assertEqual(len(logs), 2)
+        inferred, not_inferred = logs
+        self.assertEqual(inferred.endpoint, 'ModelBEndpoint6')
+        self.assertEqual(inferred.count, 1)
+        self.assertFalse(inferred.n_plus_one())
+        self.assertEqual(not_inferred.count, 5)
+        ((phase, sql, count),) = not_inferred.n_plus_one()
+        self.assertEqual((phase, count), (PHASE_SERIALIZATION, 4))
+        self.assertIn('conf_modela', sql)
+
+    def test_write_phases(self):
+        with capture_request_queries() as logs:
+            self.client.post(reverse('e15'), {'field_1': 'x', 'field_2': 1}, format='json')
+        self.assertIn(PHASE_WRITE, logs[0].phases())
+
+    def test_not_tracked_by_default(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get(reverse('b6'))
+        self.assertNotIn(HEADER_COUNT, resp)
+        self.assertFalse(connection.execute_wrappers)
+
+    @override_settings(DJANGO_ALT_QUERY_LOG=True, DEBUG=True)
+    def test_debug_headers(self):
+        resp = self.client.get(reverse('b7'))
+        self.assertEqual(resp[HEADER_COUNT], '5')
+        self.assertEqual(resp[HEADER_PHASES], 'handler=1, serialization=4')
+        self.assertEqual(resp[HEADER_N_PLUS_ONE], '1')
+
+
+def model_b_fixture(size):
+    for i in range(size):
+        ModelB.objects.create(name='b{}'.format(i), model_a=ModelA.objects.create(field_1='a', field_2=i))
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_query_budget_config(self):
+        for budget in (-1, '2', True):
+            with self.assertRaises(AssertionError):
+                class MyEndpoint(Endpoint):
+                    serializer = ModelASerializer
+                    config = {'get': {'query': lambda model, **url: model.objects.all(), 'query_budget': budget}}
+
+    def test_budget_is_enforced(self):
+        model_b_fixture(1)
+        self.assertEqual(self.client.get(reverse('b12')).status_code, 200)
+        model_b_fixture(2)
+        with self.assertRaises(QueryBudgetExceeded) as e:
+            self.client.get(reverse('b12'))
+        self.assertIn('ran 4 queries', str(e.exception))
+        with override_settings(DJANGO_ALT_ENFORCE_QUERY_BUDGETS=False):
+            self.assertEqual(self.client.get(reverse('b12')).status_code, 200)
+
+    def test_registered_endpoints(self):
+        endpoints = {name: endpoint.__name__ for name, endpoint in registered_endpoints()}
+        self.assertEqual(endpoints['b12'], 'ModelBEndpoint12')
+        self.assertEqual(endpoints['c1'], 'ModelCEndpoint1')
+
+    def test_query_scaling(self):
+        self.assertListEqual(query_counts(self.client, reverse('b7'), model_b_fixture, sizes=(1, 3)), [2, 4])
+        self.assertFalse(ModelB.objects.exists())
+
+        results = assert_queries_do_not_scale(self.client, model_b_fixture, sizes=(1, 3), url_names=['b6', 'e11'])
+        self.assertDictEqual(results, {'b6': [1, 1], 'e11': [2, 2]})
+        with self.assertRaises(AssertionError) as e:
+            assert_queries_do_not_scale(self.client, model_b_fixture, sizes=(1, 3), url_names=['b6', 'b7'])
+        self.assertIn('`b7`: [2, 4]', str(e.exception))
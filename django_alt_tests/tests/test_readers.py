@@ -0,0 +1,151 @@
+import gc
+import weakref
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from django_alt.abstract.validators import Validator
+from django_alt.readers import CompiledReader, READ_CONVERTED, READ_CUSTOM, READ_PASSTHROUGH
+from django_alt.serializers import ValidatedModelSerializer
+from django_alt_tests.conf.endpoints import ModelASerializer, ModelASerializer2, ModelBSerializer, \
+    ModelBCustomSerializer
+from django_alt_tests.conf.models import ModelA, ModelB
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class CompiledReaderParityTests(TestCase):
+    def setUp(self):
+        a1 = ModelA.objects.create(field_1='aaa', field_2=1)
+        a2 = ModelA.objects.create(field_1='bbb', field_2=2)
+        ModelB.objects.create(name='b1', count=3, ratio=0.25, price=Decimal('9.99'), active=True,
+                              created=datetime(2017, 1, 9, 8, 32, tzinfo=timezone.utc), model_a=a1)
+        ModelB.objects.create(name='b2', count=0, ratio=None, price=Decimal('100'), active=False,
+                              created=None, model_a=None)
+        ModelB.objects.create(name='ąčę', count=-5, ratio=1.0, price=Decimal('0.10'), active=True,
+                              created=datetime(2020, 2, 29, 23, 59, 59, 123456, tzinfo=timezone.utc), model_a=a2)
+
+    def assertParity(self, serializer_class, data):
+        many = not isinstance(data, (ModelA, ModelB))
+        expected = render(serializer_class(data, many=many).data)
+        actual = render(CompiledReader(serializer_class()).represent(data))
+        self.assertEqual(expected, actual)
+
+    def test_simple_serializer(self):
+        self.assertParity(ModelASerializer, ModelA.objects.all())
+        self.assertParity(ModelASerializer, ModelA.objects.first())
+
+    def test_all_field_types(self):
+        self.assertParity(ModelBSerializer, ModelB.objects.all())
+        self.assertParity(ModelBSerializer, ModelB.objects.order_by('-id'))
+        self.assertParity(ModelBSerializer, ModelB.objects.filter(model_a__isnull=True))
+        self.assertParity(ModelBSerializer, ModelB.objects.none())
+        for instance in ModelB.objects.all():
+            self.assertParity(ModelBSerializer, instance)
+
+    def test_custom_fields(self):
+        self.assertParity(ModelBCustomSerializer, ModelB.objects.all())
+        self.assertParity(ModelBCustomSerializer, list(ModelB.objects.all()))
+        self.assertParity(ModelBCustomSerializer, ModelB.objects.last())
+
+    def test_validator_to_representation(self):
+        ModelA.objects.filter(id=2).delete()
+        self.assertParity(ModelASerializer2, ModelA.objects.all())
+
+    def test_validator_to_representation_raises(self):
+        with self.assertRaises(serializers.ValidationError):
+            CompiledReader(ModelASerializer2()).represent(ModelA.objects.all())
+
+    def test_overridden_to_representation(self):
+        class ModelBExtraSerializer(ModelBSerializer):
+            def to_representation(self, instance):
+                representation = super().to_representation(instance)
+                representation['extra'] = instance.name.upper()
+                return representation
+
+        self.assertFalse(CompiledReader(ModelBExtraSerializer()).compilable)
+        self.assertTrue(CompiledReader(ModelBSerializer()).compilable)
+        self.assertParity(ModelBExtraSerializer, ModelB.objects.all())
+        self.assertParity(ModelBExtraSerializer, ModelB.objects.first())
+        self.assertEqual(CompiledReader(ModelBExtraSerializer()).represent(ModelB.objects.first())['extra'], 'B1')
+
+    def test_write_only_and_choice_fields(self):
+        class ModelAChoiceSerializer(ValidatedModelSerializer):
+            field_1 = serializers.ChoiceField(choices=(('aaa', 'A'), ('bbb', 'B')))
+            field_2 = serializers.IntegerField(write_only=True)
+
+            class Meta:
+                model = ModelA
+                validator_class = Validator
+                fields = '__all__'
+
+        self.assertParity(ModelAChoiceSerializer, ModelA.objects.all())
+        plan = dict((name, kind) for name, kind, _ in CompiledReader.compile(ModelAChoiceSerializer()))
+        self.assertDictEqual(plan, {'id': READ_PASSTHROUGH, 'field_1': READ_CONVERTED})
+
+    def test_plan(self):
+        plan = dict((name, kind) for name, kind, _ in CompiledReader.compile(ModelBCustomSerializer()))
+        self.assertEqual(plan['name'], READ_PASSTHROUGH)
+        self.assertEqual(plan['model_a'], READ_PASSTHROUGH)
+        self.assertEqual(plan['price'], READ_CONVERTED)
+        self.assertEqual(plan['created'], READ_CONVERTED)
+        self.assertEqual(plan['label'], READ_CUSTOM)
+        self.assertEqual(plan['model_a_field_1'], READ_CUSTOM)
+
+    def test_serializers_are_not_kept_alive(self):
+        class ModelBPlainSerializer(ValidatedModelSerializer):
+            class Meta:
+                model = ModelB
+                validator_class = Validator
+                fields = '__all__'
+
+        CompiledReader(ModelBPlainSerializer()).represent(ModelB.objects.all())
+        self.assertIn(ModelBPlainSerializer, CompiledReader._plans)
+        ref = weakref.ref(ModelBPlainSerializer)
+        del ModelBPlainSerializer
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_projection_builds_no_instances(self):
+        reader = CompiledReader(ModelBSerializer())
+        self.assertTrue(reader.projectable)
+        self.assertFalse(CompiledReader(ModelBCustomSerializer()).projectable)
+        with self.assertNumQueries(1):
+            result = reader.represent(ModelB.objects.all())
+        self.assertEqual(len(result), 3)
+
+
+class CompiledReadEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        a = ModelA.objects.create(field_1='aaa', field_2=1)
+        ModelB.objects.create(name='b1', count=3, ratio=0.5, price=Decimal('1.5'), model_a=a,
+                              created=datetime(2017, 1, 9, 8, 32, tzinfo=timezone.utc))
+        ModelB.objects.create(name='b2', price=Decimal('20'))
+
+    def test_compiled_read_config(self):
+        with self.assertRaises(AssertionError):
+            from django_alt.endpoints import Endpoint
+
+            class MyEndpoint(Endpoint):
+                serializer = ModelBSerializer
+                config = {'post': {'compiled_read': True}}
+
+    def test_compiled_list_is_byte_identical(self):
+        self.assertEqual(self.client.get(reverse('b1')).content, self.client.get(reverse('b2')).content)
+        self.assertEqual(self.client.get(reverse('b3')).content, self.client.get(reverse('b4')).content)
+
+    def test_compiled_detail(self):
+        resp = self.client.get(reverse('b5', kwargs={'pk': 2}))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, render(ModelBSerializer(ModelB.objects.get(id=2)).data))
+
+        resp = self.client.get(reverse('b5', kwargs={'pk': 25}))
+        self.assertEqual(resp.status_code, 404)
@@ -1,3 +1,5 @@
+import gc
+import weakref
 from unittest.mock import patch
 
 from django.test import TestCase
@@ -7,7 +9,8 @@ from django_alt.abstract.serializers import BaseValidatedSerializer
 from django_alt.abstract.validators import Validator
 from django_alt.serializers import ValidatedModelSerializer
 from django_alt.utils.shortcuts import invalid, invalid_if, if_in
-from django_alt_tests.conf.models import ModelA
+from django_alt_tests.conf.endpoints import ModelBNestedSerializer, ModelAWithBsSerializer
+from django_alt_tests.conf.models import ModelA, ModelB
 
 
 def generate_serializer(validator_class):
@@ -219,4 +222,85 @@ class ValidatedModelSerializerTests(TestCase):
         serializer = self.ModelASerializer(instance, data={'field_1': 'zzz', 'field_2': 15})
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        self.assertEqual(ModelA.objects.first().field_1, 'aaworks')
\ No newline at end of file
+        self.assertEqual(ModelA.objects.first().field_1, 'aaworks')
+
+
+class FieldPrototypeTests(TestCase):
+    def setUp(self):
+        class ModelASerializer(ValidatedModelSerializer):
+            class Meta:
+                validator_class = Validator
+                model = ModelA
+                fields = '__all__'
+
+        self.ModelASerializer = ModelASerializer
+
+    def test_fields_are_not_shared(self):
+        s1, s2 = self.ModelASerializer(), self.ModelASerializer()
+        self.assertListEqual(list(s1.fields), ['id', 'field_2', 'field_1'])
+        self.assertListEqual(list(s1.fields), list(s2.fields))
+        for name in s1.fields:
+            self.assertIsNot(s1.fields[name], s2.fields[name])
+            self.assertIs(s1.fields[name].parent, s1)
+            self.assertIs(s2.fields[name].parent, s2)
+        self.assertIn(self.ModelASerializer, BaseValidatedSerializer._fields_prototypes)
+
+    def test_restricted_fields_do_not_leak(self):
+        self.ModelASerializer().restrict_fields(('id',))
+        self.assertListEqual(list(self.ModelASerializer().fields), ['id', 'field_2', 'field_1'])
+
+    def test_field_containers_are_not_shared(self):
+        s1 = self.ModelASerializer()
+        s1.fields['field_1'].validators.append(lambda value: None)
+        s1.fields['field_1'].error_messages['blank'] = 'changed'
+        field = self.ModelASerializer().fields['field_1']
+        self.assertEqual(len(field.validators), len(s1.fields['field_1'].validators) - 1)
+        self.assertNotEqual(field.error_messages['blank'], 'changed')
+
+    def test_classes_are_not_kept_alive(self):
+        class ModelASerializer(ValidatedModelSerializer):
+            class Meta:
+                validator_class = Validator
+                model = ModelA
+                fields = '__all__'
+
+        ModelASerializer().get_validation_field_names()
+        self.assertIn(ModelASerializer, BaseValidatedSerializer._fields_prototypes)
+        ref = weakref.ref(ModelASerializer)
+        del ModelASerializer
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_nested_fields_are_bound(self):
+        a = ModelA.objects.create(field_1='aaa', field_2=1)
+        ModelB.objects.create(name='b', model_a=a)
+        for _ in range(2):
+            serializer = ModelAWithBsSerializer(a, context={'foo': 'bar'})
+            nested = serializer.fields['model_bs'].child.fields['model_a']
+            self.assertIs(nested.root, serializer)
+            self.assertEqual(nested.context, {'foo': 'bar'})
+            self.assertEqual(serializer.data['model_bs'][0]['model_a']['field_1'], 'aaa')
+        self.assertEqual(ModelBNestedSerializer(ModelB.objects.first()).data['model_a']['id'], a.id)
+
+    def test_reuse_fields_opt_out(self):
+        class ModelASerializer(ValidatedModelSerializer):
+            class Meta:
+                validator_class = Validator
+                model = ModelA
+                fields = '__all__'
+                reuse_fields = False
+
+        self.assertListEqual(list(ModelASerializer().fields), ['id', 'field_2', 'field_1'])
+        self.assertNotIn(ModelASerializer, BaseValidatedSerializer._fields_prototypes)
+
+    def test_warm_up(self):
+        self.ModelASerializer.warm_up()
+        self.assertIn(self.ModelASerializer, BaseValidatedSerializer._fields_prototypes)
+        self.assertIn(Validator, Validator._validation_plans)
+
+    def test_validation_with_reused_fields(self):
+        for i in range(2):
+            serializer = self.ModelASerializer(data={'field_1': 'a{}'.format(i), 'field_2': i})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        self.assertListEqual(list(ModelA.objects.values_list('field_1', flat=True)), ['a0', 'a1'])
@@ -84,4 +84,49 @@ class UtilsShortcutsTests(TestCase):
     def test_try_cast(self):
         self.assertEqual(try_cast(int, '5'), 5)
         self.assertEqual(try_cast(float, '5.15'), 5.15)
-        self.assertEqual(try_cast(float, '5.A15'), None)
\ No newline at end of file
+        self.assertEqual(try_cast(float, '5.A15'), None)
+
+    def test_collect_errors(self):
+        with self.assertRaises(validation_error_class) as ex:
+            with collect_errors() as errors:
+                invalid_if(True, 'k1', 'v1')
+                valid_if(False, ['k1', 'k2'], 'v2')
+                invalid_if(False, 'k3', 'v3')
+                self.assertIsNone(required('k4', {'k': 1}))
+                self.assertTrue(errors)
+        self.assertEqual(ex.exception.detail, {'k1': ['v1.', 'v2.'], 'k2': ['v2.'], 'k4': ['This field is required.']})
+
+    def test_collect_errors_merges_raised_error(self):
+        with self.assertRaises(validation_error_class) as ex:
+            with collect_errors():
+                invalid('k', 'v1')
+                raise validation_error_class({'k': ['v2.']})
+        self.assertEqual(ex.exception.detail, {'k': ['v1.', 'v2.']})
+
+    def test_collect_errors_without_errors(self):
+        with collect_errors() as errors:
+            invalid_if(False, 'k', 'v')
+        self.assertFalse(errors)
+        # outside the block errors are raised again
+        with self.assertRaises(validation_error_class):
+            invalid('k', 'v')
+
+    def test_compiled_required_all(self):
+        check = required_all.compile(['a', 'b', 'c'])
+        check({'a': 1, 'b': 2, 'c': 3})
+        with self.assertRaises(validation_error_class) as ex:
+            check({'a': 1})
+        self.assertEqual(ex.exception.detail, {'b': ['This field is required.'], 'c': ['This field is required.']})
+        self.assertEqual(check.many([{'a': 1, 'b': 2, 'c': 3}, {'a': 1, 'b': 2}]),
+                         {1: {'c': ['This field is required.']}})
+        self.assertEqual(required_all_many(['a'], [{'b': 1}, {'a': 1}, {'b': 2}]),
+                         {0: {'a': ['This field is required.']}, 2: {'a': ['This field is required.']}})
+
+    def test_compiled_prohibited_any(self):
+        check = prohibited_any.compile(('a', 'b'))
+        check({'c': 1})
+        with self.assertRaises(validation_error_class) as ex:
+            check({'b': 1, 'c': 1})
+        self.assertEqual(ex.exception.detail, {'b': ['This field cannot be present.']})
+        self.assertEqual(prohibited_any_many(('a', 'b'), [{'c': 1}, {'a': 1, 'b': 2}]),
+                         {1: {'a': ['This field cannot be present.'], 'b': ['This field cannot be present.']}})
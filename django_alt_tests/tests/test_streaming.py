@@ -0,0 +1,31 @@
+import io
+
+from django.test import TestCase
+from rest_framework.exceptions import ParseError
+
+from django_alt.utils.streaming import iter_json_array, iter_ndjson, LimitedStream, PayloadTooLarge
+
+
+class StreamingTests(TestCase):
+    body = '  [ {"a": "ąč", "b": [1, 2]}, 123, 45.5e1, true, null, "x]" ]'.encode()
+
+    def test_json_array_any_read_size(self):
+        for read_size in (1, 2, 3, 7, 1024):
+            self.assertListEqual(list(iter_json_array(io.BytesIO(self.body), read_size)),
+                                 [{'a': 'ąč', 'b': [1, 2]}, 123, 455.0, True, None, 'x]'])
+        self.assertListEqual(list(iter_json_array(io.BytesIO(b'[]'))), [])
+
+    def test_malformed_json_array(self):
+        for body in (b'{}', b'[1 2]', b'[1,', b'[1,]', b'[1', b''):
+            with self.assertRaises(ParseError):
+                list(iter_json_array(io.BytesIO(body), 1))
+
+    def test_ndjson(self):
+        self.assertListEqual(list(iter_ndjson(io.BytesIO(b'{"a": 1}\n\n[2]\n3'), 2)), [{'a': 1}, [2], 3])
+        with self.assertRaises(ParseError):
+            list(iter_ndjson(io.BytesIO(b'{"a": 1}\n{')))
+
+    def test_limited_stream(self):
+        stream = LimitedStream(io.BytesIO(self.body), 10)
+        with self.assertRaises(PayloadTooLarge):
+            list(iter_json_array(stream, 4))
@@ -0,0 +1,72 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from django_alt.abstract.validators import Validator
+from django_alt.managers import ValidatedManager
+from django_alt.utils.tracing import InMemoryTracer, set_tracer, span, HEADER_SERVER_TIMING
+from django_alt_tests.conf.models import ModelA
+
+
+class TracingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.tracer = InMemoryTracer()
+        self.previous = set_tracer(self.tracer)
+
+    def tearDown(self):
+        set_tracer(self.previous)
+
+    def test_request_spans(self):
+        ModelA.objects.create(field_1='a', field_2=1)
+        self.client.get(reverse('e1'))
+        request = next(s for s in self.tracer.spans if s.name == 'request')
+        self.assertIsNone(request.parent)
+        self.assertEqual(request.attributes, {'endpoint': 'ModelAEndpoint1', 'method': 'GET', 'status': 200})
+        self.assertListEqual([s.name for s in self.tracer.children(request)],
+                             ['url', 'permissions', 'query', 'handler', 'render'])
+        handler = self.tracer.children(request)[3]
+        self.assertListEqual([s.name for s in self.tracer.children(handler)], ['serialization'])
+        self.assertTrue(all(s.duration >= 0 for s in self.tracer.spans))
+
+    def test_write_spans(self):
+        self.client.post(reverse('e15'), {'field_1': 'x', 'field_2': 1}, format='json')
+        names = self.tracer.names()
+        for name in ('validation', 'base_db', 'permissions', 'write', 'hooks'):
+            self.assertIn(name, names)
+        self.assertLess(names.index('validation'), names.index('write'))
+
+    def test_validation_phases_are_nested(self):
+        self.client.post(reverse('e15'), {'field_1': 'x', 'field_2': 1}, format='json')
+        validation = next(s for s in self.tracer.spans if s.name == 'validation')
+        self.assertListEqual([s.name for s in self.tracer.children(validation)],
+                             ['clean_fields', 'clean', 'base', 'validate_fields', 'validate_checks', 'base_db'])
+
+    def test_manager_spans(self):
+        ValidatedManager(ModelA, Validator).create(field_1='x', field_2=1)
+        self.assertListEqual(self.tracer.names(), ['validation', 'clean_fields', 'clean', 'base', 'validate_fields',
+                                                   'validate_checks', 'write', 'hooks'])
+        validation = next(s for s in self.tracer.spans if s.name == 'validation')
+        self.assertListEqual([s.name for s in self.tracer.children(validation)],
+                             ['clean_fields', 'clean', 'base', 'validate_fields', 'validate_checks'])
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(ValueError):
+            with span('failing'):
+                raise ValueError()
+        self.assertIsInstance(self.tracer.spans[0].error, ValueError)
+
+    @override_settings(DJANGO_ALT_SERVER_TIMING=True)
+    def test_server_timing(self):
+        set_tracer(None)
+        resp = self.client.get(reverse('e1'))
+        metrics = [metric.split(';')[0] for metric in resp[HEADER_SERVER_TIMING].split(', ')]
+        self.assertListEqual(metrics, ['url', 'permissions', 'query', 'handler', 'render', 'request'])
+        self.assertFalse(self.tracer.spans)
+
+    def test_disabled(self):
+        set_tracer(None)
+        with span('anything') as s:
+            self.assertIsNone(s)
+        resp = self.client.get(reverse('e1'))
+        self.assertNotIn(HEADER_SERVER_TIMING, resp)
@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from django_alt.abstract.validators import Validator
+
+
+class ValidationPlanTests(TestCase):
+    def setUp(self):
+        class ConcreteValidator(Validator):
+            def check_b(self, attrs):
+                attrs.setdefault('checks', []).append('b')
+
+            def check_a(self, attrs):
+                attrs.setdefault('checks', []).append('a')
+
+            def clean_name(self, name):
+                return name.strip()
+
+            def field_name(self, value):
+                pass
+
+            def field_count(self, value, attrs):
+                pass
+
+            check_not_callable = True
+
+        self.ConcreteValidator = ConcreteValidator
+
+    def test_plan(self):
+        plan = self.ConcreteValidator.validation_plan()
+        self.assertListEqual(plan['checks'], ['check_a', 'check_b'])
+        self.assertEqual(plan['clean']['name'], 'clean_name')
+        self.assertDictEqual(plan['field'], {'name': ('field_name', False), 'count': ('field_count', True)})
+        self.assertIs(self.ConcreteValidator.validation_plan(), plan)
+
+    def test_plan_is_per_class(self):
+        class OtherValidator(self.ConcreteValidator):
+            def check_c(self, attrs):
+                pass
+
+        self.assertListEqual(OtherValidator.validation_plan()['checks'], ['check_a', 'check_b', 'check_c'])
+        self.assertListEqual(self.ConcreteValidator.validation_plan()['checks'], ['check_a', 'check_b'])
+
+    def test_hooks_use_plan(self):
+        validator = self.ConcreteValidator()
+        attrs = {'name': ' x ', 'count': 1}
+        validator.clean_fields(attrs, ['name', 'count'])
+        validator.validate_fields(attrs, ['name', 'count'])
+        validator.validate_checks(attrs)
+        self.assertDictEqual(attrs, {'name': 'x', 'count': 1, 'checks': ['a', 'b']})